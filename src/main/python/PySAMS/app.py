@@ -1,11 +1,56 @@
 '''
 This the main app to run pySAMS as flask webapp
 template language is Jinja2
+
+the dashboard counters and the data of the predefined plots are served as JSON and CSV,
+the plots as PNG. Every response is built once and kept for a while (section web of the config file),
+all browsers get the same copy with an ETag and a Last-Modified header, gzip compressed if they accept it.
+In that way the whole lab shares one set of queries instead of every desktop client running them.
+
+    /                              dashboard page
+    /api/dashboard                 dashboard counters (json)
+    /api/plots                     list of the plots (json)
+    /api/plots/<name>.json         data of a plot (json), plots with parameters take them as query
+    /api/plots/<name>.csv          arguments, e.g. /api/plots/turnaround.csv?search_mag=MA21%25
+    /api/plots/<name>.arrow        data of a plot as Apache Arrow IPC stream (needs pyarrow), takes
+                                   columns=a,b (projection), magazine_from, magazine_to, date_from,
+                                   date_to, date_column (filters) and part (for plots with several DataFrames)
+    /plots/<name>.png              the plot, rendered once per data set and kept in the render cache
+    /api/qc/<table>.json           statistics of the QC standards (plots.qc.qcstats), table is
+    /api/qc/<table>.csv            overall, magazines or rolling
+
+read an arrow stream with:
+    pyarrow.ipc.open_stream(urllib.request.urlopen(url).read()).read_pandas()
 '''
 
+import os
+# the plots are drawn without windows, has to be set before the plot modules import matplotlib
+os.environ.setdefault('MPLBACKEND', 'Agg')
 
-from flask import Flask
+import glob
+import gzip
+import collections
+import hashlib
+import json
+import threading
+import time
+import datetime
+import urllib.parse
+import pandas
+from typing import Callable, NamedTuple
+from flask import Flask, Response, request, abort, render_template_string
 from database.pysamsdb import *  # this is the already instantiated MyDatabase object connecting the the AMS DB
+from config.config import myconfig  # myconfig calss will be loaded here
+import plots.registry as registry
+import plots.qc.qcstats as qcstats
+from plots.batchrender import render_pool, render_plot, data_hash
+
+try:
+    # pyarrow is only needed for the arrow endpoint
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
 
 __version__ = '2021-April-15'
 __author__ = 'Ronny Friedrich'
@@ -15,11 +60,480 @@ logger.name = __name__
 
 app = Flask(__name__)
 
+# seconds a response is served from the cache before it is built again
+TTL = myconfig.getfloat('web', 'ttl', fallback=300)
+DASHBOARD_TTL = myconfig.getfloat('web', 'dashboard_ttl', fallback=60)
+# most responses kept in memory, the least recently used ones are dropped first
+CACHE_ENTRIES = myconfig.getint('web', 'cache_entries', fallback=256)
+# the rendered PNGs are kept here, one file per plot and data hash
+RENDER_PATH = myconfig.get('web', 'render_path', fallback='cache/render')
+DPI = myconfig.getint('web', 'dpi', fallback=100)
+
+# mimetypes that are worth compressing
+COMPRESSIBLE = ('text/html', 'text/csv', 'application/json')
+
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+# query arguments of the arrow endpoint, all other query arguments are parameters of the plot
+ARROW_ARGS = ('columns', 'magazine_from', 'magazine_to', 'date_from', 'date_to', 'date_column')
+# rows per record batch of an arrow stream, clients can start reading after the first batch
+ARROW_BATCH_ROWS = 65536
+
+PAGE = '''<!doctype html>
+<html>
+<head><title>PySAMS</title></head>
+<body>
+<h1>PySAMS Dashboard</h1>
+<table>
+{% for name, value in counters.items() %}
+<tr><td>{{ name.replace('_', ' ') }}</td><td>{{ value }}</td></tr>
+{% endfor %}
+</table>
+<h2>QC standards</h2>
+<table>
+<tr><th>standard</th><th>n</th><th>weighted mean fm</th><th>chi^2 reduced</th><th>offset / sigma</th></tr>
+{% for row in qc %}
+<tr><td>{{ row.standard }}</td><td>{{ row.count }}</td><td>{{ '%.5f' % row.weighted_mean }}</td>
+<td>{{ '%.2f' % row.chi2_reduced }}</td><td>{{ '%.1f' % row.offset_sigma }}</td></tr>
+{% endfor %}
+</table>
+(<a href="/api/qc/overall.csv">overall</a>, <a href="/api/qc/magazines.csv">per magazine</a>, <a href="/api/qc/rolling.csv">rolling</a>)
+<h2>Plots</h2>
+<ul>
+{% for entry in plots %}
+<li>{% if entry.ask is none %}<a href="/plots/{{ entry.name }}.png">{{ entry.label }}</a>{% else %}{{ entry.label }}{% endif %}
+(<a href="/api/plots/{{ entry.name }}.json">json</a>, <a href="/api/plots/{{ entry.name }}.csv">csv</a>, <a href="/api/plots/{{ entry.name }}.arrow">arrow</a>)</li>
+{% endfor %}
+</ul>
+<p>generated {{ generated }}</p>
+</body>
+</html>
+'''
+
+
+class CachedResponse(NamedTuple):
+    """
+    a response body as it is kept in the ResponseCache
+
+    body: the body
+    gzipped: the gzip compressed body, None if the mimetype isn't worth compressing
+    mimetype: mimetype of the body
+    etag: hash of the body
+    last_modified: time (epoch) the body changed the last time
+    expires: time (epoch) the body has to be built again
+    """
+    body: bytes
+    gzipped: bytes
+    mimetype: str
+    etag: str
+    last_modified: float
+    expires: float
+
+
+class ResponseCache:
+    """
+    response bodies by key, built at most once per ttl
+
+    requests that ask for the same key at the same time wait for the first one,
+    so an expired entry is only built once and not by every waiting request.
+    The keys come from the requests, so the cache is limited: expired entries are dropped
+    and at most max_entries are kept (least recently used first out, like database.querycache)
+
+    Args:
+        max_entries: most entries kept
+
+    Returns:
+        None
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # key -> lock of the request that builds the entry, only while it's being built
+        self._key_locks = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _fresh(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires <= time.time():
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: str, entry: CachedResponse):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            now = time.time()
+            for old in [name for name, cached in self._entries.items() if cached.expires <= now]:
+                del self._entries[old]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str, ttl: float, build: Callable) -> CachedResponse:
+        """
+        Args:
+            key: key of the response (e.g. path and query arguments)
+            ttl: seconds the body is kept
+            build: function that returns (body as bytes or str, mimetype)
+
+        Returns:
+            CachedResponse: the cached or freshly built response
+        """
+        entry = self._fresh(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # another request may have built the body while this one was waiting
+                entry = self._fresh(key)
+                if entry is not None:
+                    return entry
+                body, mimetype = build()
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                etag = hashlib.sha1(body).hexdigest()
+                now = time.time()
+                old = self._entries.get(key)
+                # same body as before: keep Last-Modified, the browsers keep their copy
+                last_modified = old.last_modified if old is not None and old.etag == etag else now
+                gzipped = gzip.compress(body, 6) if mimetype in COMPRESSIBLE else None
+                entry = CachedResponse(body, gzipped, mimetype, etag, last_modified, now + ttl)
+                self._put(key, entry)
+            return entry
+        finally:
+            # requests that still wait for the lock find the entry when they get it,
+            # later requests of the key don't need the lock anymore
+            with self._lock:
+                if self._key_locks.get(key) is key_lock:
+                    del self._key_locks[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = ResponseCache(CACHE_ENTRIES)
+
+# the plots are rendered in other processes with the Agg backend, the pool is started with the first PNG
+_renderers = None
+_renderers_lock = threading.Lock()
+
+
+def renderers():
+    global _renderers
+    with _renderers_lock:
+        if _renderers is None:
+            _renderers = render_pool(myconfig.getint('web', 'processes', fallback=2))
+        return _renderers
+
+
+def respond(entry: CachedResponse) -> Response:
+    """
+    turn a cached body into a response, answers with 304 if the browser's copy is still valid
+
+    Args:
+        entry: the cached body
+
+    Returns:
+        Response: the response
+    """
+    use_gzip = entry.gzipped is not None and 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = Response(entry.gzipped if use_gzip else entry.body, mimetype=entry.mimetype)
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    if entry.gzipped is not None:
+        response.vary.add('Accept-Encoding')
+    # the compressed body is a different representation and gets its own etag
+    response.set_etag(entry.etag + ('-gz' if use_gzip else ''))
+    response.last_modified = datetime.datetime.fromtimestamp(entry.last_modified, datetime.timezone.utc)
+    response.cache_control.public = True
+    response.cache_control.max_age = max(0, int(entry.expires - time.time()))
+    return response.make_conditional(request.environ)
+
+
+def get_entry(name: str) -> registry.PlotEntry:
+    try:
+        return registry.get_plot(name)
+    except KeyError:
+        abort(404, 'unknown plot: ' + name)
+
+
+def plot_params(entry: registry.PlotEntry, args: dict) -> dict:
+    """
+    the parameters of a plot from the query arguments, only the ones its ask function returns in the GUI
+    (entry.params) are accepted
+
+    Args:
+        entry: the plot
+        args: query arguments that are left after the arguments of the endpoint were taken out
+
+    Returns:
+        dict: keyword arguments of the query and the plot function
+    """
+    unknown = sorted(set(args) - set(entry.params))
+    if unknown:
+        abort(400, 'plot ' + entry.name + ' has no parameters ' + ', '.join(unknown))
+    missing = [name for name in entry.params if name not in args]
+    if missing:
+        abort(400, 'plot ' + entry.name + ' needs the parameters ' + ', '.join(missing) +
+              ' as query arguments, e.g. ?' + missing[0] + '=...')
+    return args
+
+
+def part_arg(args: dict) -> int:
+    # number of the DataFrame of plots that return several (e.g. throughput)
+    try:
+        part = int(args.pop('part', 0))
+    except ValueError:
+        abort(400, 'part must be a number')
+    if part < 0:
+        abort(400, 'part must not be negative')
+    return part
+
+
+def query_data(entry: registry.PlotEntry, params: dict):
+    """
+    run the query function of a plot, parameters it doesn't know (e.g. an unknown standard) give a 400
+    """
+    try:
+        return entry.export_function()(**params)
+    except (KeyError, ValueError) as err:
+        if not params:
+            raise
+        abort(400, 'invalid parameters of plot ' + entry.name + ': ' + str(err).strip("'"))
+
+
+def dataframes(data) -> list:
+    # query functions return a DataFrame or a tuple of DataFrames (e.g. query_throughput)
+    return list(data) if isinstance(data, (tuple, list)) else [data]
+
+
+def build_dashboard() -> tuple:
+    counters = mydb.get_dashboard_snapshot()._asdict()
+    return json.dumps(counters), 'application/json'
+
+
+def build_page() -> tuple:
+    counters = json.loads(cache.get('/api/dashboard', DASHBOARD_TTL, build_dashboard).body)
+    try:
+        overall = qcstats.tables().overall
+        qc = list(overall[overall['value'] == 'fm'].itertuples())
+    except Exception as err:
+        # the dashboard is shown without the qc table
+        logger.warning('web: qc statistics failed: ' + str(err))
+        qc = []
+    return render_template_string(PAGE, counters=counters, qc=qc, plots=registry.PLOTS,
+                                  generated=time.strftime('%Y-%m-%d %H:%M:%S')), 'text/html'
+
+
+def build_plot_json(entry: registry.PlotEntry, params: dict) -> tuple:
+    data = query_data(entry, params)
+    parts = [frame.to_json(orient='split', date_format='iso') for frame in dataframes(data)]
+    body = parts[0] if len(parts) == 1 else '[' + ','.join(parts) + ']'
+    return body, 'application/json'
+
+
+def build_plot_csv(entry: registry.PlotEntry, params: dict, part: int) -> tuple:
+    frames = dataframes(query_data(entry, params))
+    if not 0 <= part < len(frames):
+        abort(404, 'plot ' + entry.name + ' has ' + str(len(frames)) + ' parts')
+    return frames[part].to_csv(index=False), 'text/csv'
+
+
+def get_qc_table(table: str) -> pandas.DataFrame:
+    if table not in qcstats.QCTables._fields:
+        abort(404, 'unknown qc table: ' + table)
+    return getattr(qcstats.tables(), table)
+
+
+def filter_frame(frame, args: dict):
+    """
+    filter and project a DataFrame by the query arguments of the arrow endpoint
+
+    Args:
+        frame: data of a plot
+        args: magazine_from (incl.), magazine_to (excl.), date_from (incl.), date_to (excl.),
+              date_column (default: the first datetime column), columns (comma separated)
+
+    Returns:
+        DataFrame: the selected rows and columns
+    """
+    mask = None
+
+    def add(condition):
+        nonlocal mask
+        mask = condition if mask is None else mask & condition
+
+    if 'magazine_from' in args or 'magazine_to' in args:
+        if 'magazine' not in frame.columns:
+            abort(400, 'the data has no magazine column')
+        # magazine names start with MAyymmdd, they sort by date
+        magazines = frame['magazine'].astype(object)
+        if 'magazine_from' in args:
+            add(magazines.notna() & (magazines.astype(str) >= args['magazine_from']))
+        if 'magazine_to' in args:
+            add(magazines.notna() & (magazines.astype(str) < args['magazine_to']))
+    if 'date_from' in args or 'date_to' in args:
+        column = args.get('date_column')
+        if column is None:
+            dates = [name for name in frame.columns if str(frame[name].dtype).startswith('datetime64')]
+            if not dates:
+                abort(400, 'the data has no date column')
+            column = dates[0]
+        elif column not in frame.columns:
+            abort(400, 'unknown column: ' + column)
+        try:
+            if 'date_from' in args:
+                add(frame[column] >= pandas.Timestamp(args['date_from']))
+            if 'date_to' in args:
+                add(frame[column] < pandas.Timestamp(args['date_to']))
+        except (TypeError, ValueError) as err:
+            abort(400, 'invalid date filter: ' + str(err))
+    if mask is not None:
+        frame = frame[mask]
+    if 'columns' in args:
+        columns = [name.strip() for name in args['columns'].split(',') if name.strip()]
+        unknown = [name for name in columns if name not in frame.columns]
+        if unknown:
+            abort(400, 'unknown columns: ' + ', '.join(unknown))
+        frame = frame[columns]
+    return frame
+
+
+def build_plot_arrow(entry: registry.PlotEntry, params: dict, part: int, args: dict) -> tuple:
+    frames = dataframes(query_data(entry, params))
+    if not 0 <= part < len(frames):
+        abort(404, 'plot ' + entry.name + ' has ' + str(len(frames)) + ' parts')
+    frame = filter_frame(frames[part], args)
+    # categorical columns become dictionary encoded arrays, numbers and dates are stored as they are in memory
+    table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=ARROW_BATCH_ROWS)
+    return sink.getvalue().to_pybytes(), ARROW_STREAM
+
+
+def build_plot_png(entry: registry.PlotEntry, params: dict) -> tuple:
+    data = query_data(entry, params)
+    # the render cache is keyed by the data, a plot is only rendered again if its data changed
+    path = os.path.join(RENDER_PATH, entry.name + '-' + data_hash(data) + '.png')
+    if not os.path.exists(path):
+        os.makedirs(RENDER_PATH, exist_ok=True)
+        logger.info('web: rendering ' + entry.name)
+        renderers().submit(render_plot, entry, data, params, path, DPI).result()
+        if not os.path.exists(path):
+            abort(404, 'plot ' + entry.name + ' has no data')
+        # renderings of older data aren't needed anymore
+        for old in glob.glob(os.path.join(RENDER_PATH, entry.name + '-*.png')):
+            if old != path:
+                os.remove(old)
+    with open(path, 'rb') as f:
+        return f.read(), 'image/png'
+
+
+def cache_key(*args: dict) -> str:
+    """
+    key of a response: the path and the checked arguments (in a fixed order), never the raw query string
+
+    Args:
+        args: dicts of query arguments that were checked
+
+    Returns:
+        str: the key
+    """
+    items = sorted((name, value) for arguments in args for name, value in arguments.items())
+    return request.path + ('?' + urllib.parse.urlencode(items) if items else '')
+
 
 @app.route('/')
-def hello_world():
-    return 'Hello World!'
+def dashboard_page():
+    return respond(cache.get(cache_key(), DASHBOARD_TTL, build_page))
+
+
+@app.route('/api/dashboard')
+def dashboard():
+    return respond(cache.get('/api/dashboard', DASHBOARD_TTL, build_dashboard))
+
+
+@app.route('/api/plots')
+def plot_list():
+    def build():
+        return json.dumps([{'name': entry.name, 'label': entry.label, 'parameters': entry.ask is not None}
+                           for entry in registry.PLOTS]), 'application/json'
+    return respond(cache.get(cache_key(), TTL, build))
+
+
+@app.route('/api/plots/<name>.json')
+def plot_json(name: str):
+    entry = get_entry(name)
+    params = plot_params(entry, request.args.to_dict())
+    return respond(cache.get(cache_key(params), TTL, lambda: build_plot_json(entry, params)))
+
+
+@app.route('/api/plots/<name>.csv')
+def plot_csv(name: str):
+    entry = get_entry(name)
+    args = request.args.to_dict()
+    part = part_arg(args)
+    params = plot_params(entry, args)
+    return respond(cache.get(cache_key(params, {'part': part}), TTL, lambda: build_plot_csv(entry, params, part)))
+
+
+@app.route('/api/plots/<name>.arrow')
+def plot_arrow(name: str):
+    if pyarrow is None:
+        abort(501, 'pyarrow is not installed on the server')
+    entry = get_entry(name)
+    args = request.args.to_dict()
+    part = part_arg(args)
+    filters = {key: args.pop(key) for key in ARROW_ARGS if key in args}
+    params = plot_params(entry, args)
+    return respond(cache.get(cache_key(params, filters, {'part': part}), TTL,
+                             lambda: build_plot_arrow(entry, params, part, filters)))
+
+
+@app.route('/api/qc/<table>.json')
+def qc_json(table: str):
+    return respond(cache.get(cache_key(), TTL, lambda: (
+        get_qc_table(table).to_json(orient='split', date_format='iso'), 'application/json')))
+
+
+@app.route('/api/qc/<table>.csv')
+def qc_csv(table: str):
+    return respond(cache.get(cache_key(), TTL, lambda: (get_qc_table(table).to_csv(index=False), 'text/csv')))
+
+
+@app.route('/plots/<name>.png')
+def plot_png(name: str):
+    entry = get_entry(name)
+    params = plot_params(entry, request.args.to_dict())
+    return respond(cache.get(cache_key(params), TTL, lambda: build_plot_png(entry, params)))
+
+
+def prerender():
+    """
+    render the PNGs of all plots without parameters in the background,
+    so that the first visitors don't have to wait for them
+    """
+    for entry in registry.PLOTS:
+        if entry.ask is not None:
+            continue
+        try:
+            cache.get('/plots/' + entry.name + '.png', TTL, lambda: build_plot_png(entry, {}))
+        except Exception as err:
+            logger.warning('web: prerender of ' + entry.name + ' failed: ' + str(err))
+    logger.info('web: prerender finished')
 
 
 if __name__ == '__main__':
-    app.run()
+    # the pages and plots share queries, keep their results for a while (the GUI doesn't cache)
+    mydb.cache_ttl = myconfig.getfloat('cache', 'service_ttl', fallback=300)
+    if myconfig.getboolean('web', 'prerender', fallback=True):
+        threading.Thread(target=prerender, name='prerender', daemon=True).start()
+    app.run(threaded=True)
@@ -0,0 +1,142 @@
+"""
+command line entry point to create the predefined plots without the GUI
+
+the plots are rendered offscreen by plots.batchrender and saved to pics/ (png and csv).
+Plots whose data didn't change since the last run are skipped, so a cron job can
+refresh all plots every night without rendering them again and again.
+With QC plots the statistics tables of the standards (plots.qc.qcstats) are exported too (config value qc/export)
+and the control charts of all standards are brought up to date (plots.qc.controlcharts).
+If the local mirror is enabled (config value mirror/enabled), it is updated before the plots are rendered.
+
+run from this directory:
+    python -m batch                      # all plots
+    python -m batch c1 c2 blanks         # some plots
+    python -m batch --qc --force         # all QC plots, also the unchanged ones
+    python -m batch turnaround --year 21
+    python -m batch --list
+"""
+
+import os
+# draw without windows, has to be set before the plot modules import matplotlib
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import sys
+import argparse
+import datetime
+from config.logging_conf import logger
+from config.config import myconfig  # myconfig calss will be loaded here
+from database.pysamsdb import mydb  # this is the already instantiated MyDatabase object connecting the the AMS DB
+import database.mirror as mirror
+import plots.registry as registry
+import plots.qc.standards as standards
+import plots.qc.qcstats as qcstats
+import plots.qc.controlcharts as controlcharts
+from plots.batchrender import BatchRenderer
+
+__version__ = '2022-July-06'
+__author__ = 'Ronny Friedrich'
+
+# set logger name to the name of the module
+logger.name = __name__
+
+
+def parse_params(values: list) -> dict:
+    """
+    parse the --param arguments
+
+    Args:
+        values: strings like 'plot.key=value'
+
+    Returns:
+        dict: plot name -> keyword arguments
+    """
+    params = {}
+    for value in values:
+        name, sep, assignment = value.partition('.')
+        key, sep2, argument = assignment.partition('=')
+        if not sep or not sep2 or not key:
+            raise ValueError('parameter must look like plot.key=value: ' + value)
+        params.setdefault(name, {})[key] = argument
+    return params
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m batch',
+                                     description='create the predefined PySAMS plots without the GUI')
+    parser.add_argument('plots', nargs='*', help='names of the plots (default: all plots), see --list')
+    parser.add_argument('--qc', action='store_true', help='create all QC plots')
+    parser.add_argument('--list', action='store_true', help='list the names of the plots and exit')
+    parser.add_argument('--year', type=int, default=datetime.datetime.now().year - 2000,
+                        help='year (2 digits) of the magazines of the turnaround plot, default is this year')
+    parser.add_argument('--param', action='append', default=[], metavar='PLOT.KEY=VALUE',
+                        help='keyword argument of a query and plot function, can be repeated')
+    parser.add_argument('--force', action='store_true', help='render also the plots whose data did not change')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of render processes (default: config value batch/processes)')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for entry in registry.PLOTS:
+            print('{0:20s} {1}'.format(entry.name, entry.label))
+        return 0
+
+    names = list(args.plots)
+    if args.qc:
+        names += [name for name in registry.QC_PLOTS if name not in names]
+    try:
+        entries = [registry.get_plot(name) for name in names] if names else list(registry.PLOTS)
+        params = parse_params(args.param)
+    except (KeyError, ValueError) as err:
+        parser.error(str(err).strip("'"))
+
+    # parameters that the GUI asks for in a dialog
+    params.setdefault('turnaround', {}).setdefault('search_mag', 'MA{0:02d}%'.format(args.year))
+    params.setdefault('control_chart', {}).setdefault('name', 'oxa2')
+    for entry in entries:
+        if entry.ask is not None and entry.name not in params:
+            parser.error('plot ' + entry.name + ' needs parameters, pass them with --param')
+        unknown = sorted(set(params.get(entry.name, {})) - set(entry.params))
+        if unknown:
+            parser.error('plot ' + entry.name + ' has no parameters ' + ', '.join(unknown))
+    params = {entry.name: params.get(entry.name, {}) for entry in entries}
+
+    # the plots of a batch share many queries (e.g. all qc plots), keep their results for a while
+    mydb.cache_ttl = myconfig.getfloat('cache', 'service_ttl', fallback=300)
+    if mirror.enabled():
+        # the plots read the copy, a table that fails to sync is queried from the database if its copy is too old
+        for name, rows in mirror.mymirror.sync().items():
+            print('mirror ' + name + ': ' + ('failed' if rows is None else str(rows) + ' rows'), flush=True)
+    state_path = myconfig.get('batch', 'state', fallback='pics/batch_state.json')
+    renderer = BatchRenderer(processes=args.processes, state_path=state_path, force=args.force)
+
+    def progress(done: int, total: int, result):
+        status = 'unchanged' if result.skipped else ('ok' if result.ok else 'FAILED: ' + result.message)
+        print('[{0}/{1}] {2}: {3}'.format(done, total, result.name, status), flush=True)
+
+    # the plots, the statistics and the control charts of the standards share one fetch of the standards
+    standards.start_run()
+    try:
+        results = renderer.run(entries, params, progress=progress)
+        failed = [result for result in results if not result.ok]
+        if any(entry.name in registry.QC_PLOTS for entry in entries):
+            # the tables with the statistics of the standards that the qc plots show
+            # and the control charts of all standards (also dc13 and oxa2)
+            try:
+                for file in qcstats.export(myconfig.get('qc', 'export', fallback='pics/qc_stats')):
+                    print('exported ' + file, flush=True)
+                charts = controlcharts.update_all()
+                print('control charts: ' + ', '.join(name + ' ' + value + ' ' + str(chart.signals)
+                                                      for (name, value), chart in charts.items()), flush=True)
+            except Exception as err:
+                logger.error('batch: export of the qc statistics failed: ' + str(err))
+                failed.append(err)
+    finally:
+        standards.end_run()
+    print('{0} rendered, {1} unchanged, {2} failed'.format(
+        sum(result.ok and not result.skipped for result in results),
+        sum(result.skipped for result in results), len(failed)))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,6 +7,7 @@ package that deals with:
 from config.logging_conf import logger
 import os.path
 import configparser
+import threading
 
 # set logger name to the name of the module
 logger.name = __name__
@@ -101,6 +102,56 @@ class MyConfig(configparser.ConfigParser):
             f.write('dbuser = mams\r')
             f.write('dbpasswd = Micadas.1\r')
             f.write('dbname = db_dmams\r')
+            f.write('poolsize = 5\r')
+            f.write('pool_ping_interval = 60\r')
+            f.write('chunksize = 10000\r')
+            f.write('stats_records = 1000\r')
+            f.write('stats_deep_memory = False\r')
+            f.write('stats_deep_rows = 100000\r')
+            f.write('use_pure = False\r')
+            f.write('[cache]\r')
+            f.write('path = cache\r')
+            f.write('ttl = 0\r')
+            f.write('service_ttl = 300\r')
+            f.write('history_ttl = 3600\r')
+            f.write('memory_entries = 32\r')
+            f.write('max_disk_mb = 500\r')
+            f.write('[mirror]\r')
+            f.write('path = mirror\r')
+            f.write('enabled = False\r')
+            f.write('max_age = 86400\r')
+            f.write('[batch]\r')
+            f.write('processes = 0\r')
+            f.write('state = pics/batch_state.json\r')
+            f.write('[web]\r')
+            f.write('ttl = 300\r')
+            f.write('dashboard_ttl = 60\r')
+            f.write('cache_entries = 256\r')
+            f.write('render_path = cache/render\r')
+            f.write('dpi = 100\r')
+            f.write('processes = 2\r')
+            f.write('prerender = True\r')
+            f.write('[plot]\r')
+            f.write('max_points = 50000\r')
+            f.write('large_mode = density\r')
+            f.write('density_bins = 200\r')
+            f.write('downsample = True\r')
+            f.write('max_points_per_axis = 2000\r')
+            f.write('lod = True\r')
+            f.write('lod_delay = 200\r')
+            f.write('[qc]\r')
+            f.write('window = 10\r')
+            f.write('dc13_sig = 0.003\r')
+            f.write('export = pics/qc_stats\r')
+            f.write('charts = cache/control_charts\r')
+            f.write('chart_baseline = 30\r')
+            f.write('ewma_lambda = 0.2\r')
+            f.write('ewma_l = 3\r')
+            f.write('cusum_k = 0.5\r')
+            f.write('cusum_h = 5\r')
+            f.write('[revisions]\r')
+            f.write('magazines = MA141204, MA150213, MA150507, MA150722, MA151007, MA151112, MA160310, MA160616, '
+                    'MA161004, MA170117, MA170327, MA170602, MA170727, MA170830, MA171026, MA180109, MA180405\r')
             f.write('[paths]\r')
             f.write('path_to_reports_on_server =\r')
             f.write('path_to_reports_templates =\r')
@@ -111,8 +162,53 @@ class MyConfig(configparser.ConfigParser):
             logger.debug('default values in config written')
 
 
-# already instantiate the MyConfig Object here
-# that allows sharing this single instance across modules
-logger.debug('Instantiate the myconfig object instance in the config module')
-myconfig = MyConfig()
+class LazyInstance:
+    """
+    placeholder for an object that is shared across modules (e.g. myconfig, mydb)
+
+    the object is only created when one of its attributes is used for the first time,
+    so importing a module doesn't read files or open connections.
+    All attributes are passed on to the object.
+    Special methods (dunder methods like __len__, __iter__, __getitem__ or __enter__) are not forwarded,
+    python looks them up on the type and not on the instance. Use instance() for them, e.g. len(myconfig.instance()).
+
+    Args:
+        factory: class or function that creates the object
+
+    Returns:
+        None
+    """
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.RLock())
+
+    def instance(self):
+        """
+        Returns:
+            the shared object, it is created on the first call
+        """
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    logger.debug('Instantiate the shared object: ' + getattr(self._factory, '__name__', 'object'))
+                    object.__setattr__(self, '_instance', self._factory())
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.instance(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.instance(), name, value)
+
+    def __repr__(self):
+        if self._instance is None:
+            return '<LazyInstance of ' + getattr(self._factory, '__name__', 'object') + ' (not created yet)>'
+        return repr(self._instance)
+
+
+# the MyConfig Object is shared across modules,
+# it is instantiated when it is used for the first time (not while importing the module)
+myconfig = LazyInstance(MyConfig)
 
@@ -0,0 +1,207 @@
+"""
+thread-safe connection pool for the AMS Database
+
+instead of opening a new mysql connection for every single query
+the connections are kept open and handed out again and again
+"""
+
+from config.logging_conf import logger
+import contextlib
+import queue
+import threading
+import time
+import mysql.connector
+from mysql.connector import errorcode
+
+# set logger name to the name of the module
+logger.name = __name__
+
+
+class MyConnectionPool:
+    """
+    Pool of open mysql connections that is shared by all threads
+
+    - a connection is checked out per thread, nested checkouts of the same thread
+      reuse the connection that thread already holds
+    - idle connections are pinged before they are handed out again and
+      reconnected or replaced if they went stale
+    - at most "size" connections are checked out at the same time
+
+    Args:
+        db_params: connection parameters passed to mysql.connector.connect
+        size: maximum number of connections
+        ping_interval: connections idle for longer than this (in seconds) are pinged before use
+        timeout: seconds to wait for a free connection
+
+    Returns:
+        None
+    """
+
+    def __init__(self, db_params: dict, size: int = 5, ping_interval: float = 60, timeout: float = 30):
+        logger.debug('MyConnectionPool -- init pool of size ' + str(size))
+        self.db_params = db_params
+        self.size = size
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        # idle connections as (connection, time of release), LIFO so that recently used connections are reused first
+        self._idle = queue.LifoQueue()
+        # limits the number of checked out connections
+        self._slots = threading.BoundedSemaphore(size)
+        # the connection (and nesting depth) the current thread holds
+        self._local = threading.local()
+        # thread ident -> connection, so that other threads can find out what a thread is running on
+        self._owners = {}
+        self._owners_lock = threading.Lock()
+
+    def _connect(self) -> mysql.connector.connection.MySQLConnection:
+        """
+        open a new connection to the database
+
+        Returns:
+            db: db connection
+        """
+        logger.debug('MyConnectionPool -- open new connection to ' + str(self.db_params.get('host')))
+        try:
+            db = mysql.connector.connect(**self.db_params)
+        except mysql.connector.Error as err:
+            if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
+                logger.error('Database Connection Error: Wrong with user name or password')
+            elif err.errno == errorcode.ER_BAD_DB_ERROR:
+                logger.error('Database Connection Error: Database does not exist')
+            else:
+                logger.error(err)
+            raise
+        # the pool only reads, with autocommit every query sees the current data
+        # instead of the snapshot of a transaction that was opened long ago
+        db.autocommit = True
+        return db
+
+    def _checkout(self) -> mysql.connector.connection.MySQLConnection:
+        """
+        take a connection from the idle queue (or open a new one) and make sure it is alive
+
+        Returns:
+            db: db connection
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            logger.error('MyConnectionPool -- no free connection after ' + str(self.timeout) + ' s')
+            raise mysql.connector.errors.PoolError('no free connection in the pool')
+        try:
+            try:
+                db, released = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - released > self.ping_interval:
+                try:
+                    # ping and reconnect once if the server closed the connection in the meantime
+                    db.ping(reconnect=True, attempts=2, delay=1)
+                except mysql.connector.Error as err:
+                    logger.warning('MyConnectionPool -- stale connection replaced: ' + str(err))
+                    self._close(db)
+                    return self._connect()
+            return db
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkin(self, db: mysql.connector.connection.MySQLConnection, discard: bool = False):
+        """
+        put a connection back into the idle queue
+
+        Args:
+            db: db connection that was checked out
+            discard: close the connection instead of reusing it
+        """
+        try:
+            if discard or db.unread_result:
+                # results that were not read would block the connection for the next user
+                logger.debug('MyConnectionPool -- discarding connection')
+                self._close(db)
+            else:
+                self._idle.put((db, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _close(db: mysql.connector.connection.MySQLConnection):
+        try:
+            db.close()
+        except mysql.connector.Error:
+            pass
+
+    @contextlib.contextmanager
+    def connection(self, exclusive: bool = False):
+        """
+        check out a connection for the current thread
+
+        use as: with pool.connection() as db: ...
+        the connection goes back to the pool when the with block is left.
+        Connections that raised a connection error are closed instead of reused.
+
+        Args:
+            exclusive: always check out a connection of its own instead of reusing the one
+                       the thread already holds (e.g. for streaming results while running other queries)
+
+        Returns:
+            db: db connection
+        """
+        held = getattr(self._local, 'db', None)
+        if held is not None and not exclusive:
+            # this thread already holds a connection, reuse it
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        db = self._checkout()
+        if not exclusive:
+            self._local.db = db
+            self._local.depth = 1
+        ident = threading.get_ident()
+        with self._owners_lock:
+            self._owners.setdefault(ident, db)
+        discard = False
+        try:
+            yield db
+        except (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError, GeneratorExit):
+            # GeneratorExit: a generator holding the connection was closed before all rows were read
+            discard = True
+            raise
+        finally:
+            with self._owners_lock:
+                if self._owners.get(ident) is db:
+                    del self._owners[ident]
+            if not exclusive:
+                self._local.db = None
+                self._local.depth = 0
+            self._checkin(db, discard)
+
+    def connection_id(self, thread_ident: int):
+        """
+        return the server side connection id of the connection a thread currently holds
+
+        Args:
+            thread_ident: ident of the thread (threading.get_ident())
+
+        Returns:
+            int: connection id or None if the thread doesn't hold a connection
+        """
+        with self._owners_lock:
+            db = self._owners.get(thread_ident)
+        if db is None:
+            return None
+        return db.connection_id
+
+    def close_all(self):
+        """
+        close all idle connections, connections that are checked out right now are not touched
+        """
+        logger.debug('MyConnectionPool -- closing idle connections')
+        while True:
+            try:
+                db, released = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(db)
@@ -0,0 +1,95 @@
+"""
+compact dtypes for query results
+
+mysql returns DECIMAL values (e.g. the results of STD() or of divisions) as Decimal objects
+and DATE columns as date objects, pandas keeps both in object columns. The columns are
+converted to native float and datetime64 columns, and the columns that repeat a few values
+over and over (magazine, type, ...) to categoricals, which needs a fraction of the memory.
+"""
+
+from __future__ import annotations  # the annotations don't need pandas to be imported
+from config.logging_conf import logger
+import datetime
+import decimal
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas
+
+# set logger name to the name of the module
+logger.name = __name__
+
+# dtypes of the columns of the AMS DB, columns that are not listed are converted by the type of their values
+COLUMN_DTYPES = {
+    'magazine': 'category',
+    'type': 'category',
+    'material': 'category',
+    'user_label': 'category',
+    'graphitized': 'datetime64[ns]',
+    'target_pressed': 'datetime64[ns]',
+    'prep_end': 'datetime64[ns]',
+    'in_date': 'datetime64[ns]',
+    'out_date': 'datetime64[ns]',
+    'date': 'datetime64[ns]',
+}
+
+# categoricals only pay off if the values repeat, columns with more unique values than this share stay strings
+MAX_CATEGORY_RATIO = 0.5
+
+
+def _convert(column: pandas.Series, dtype: str) -> pandas.Series:
+    import pandas
+    if dtype == 'category':
+        if len(column) > 0 and column.nunique() > MAX_CATEGORY_RATIO * len(column):
+            return column
+        return column.astype('category')
+    if dtype.startswith('datetime64'):
+        return pandas.to_datetime(column, errors='coerce')
+    if dtype.startswith('float'):
+        return pandas.to_numeric(column, errors='coerce').astype(dtype)
+    return column.astype(dtype)
+
+
+def normalize_dtypes(dataframe: pandas.DataFrame, dtypes: dict = None) -> pandas.DataFrame:
+    """
+    convert the columns of a query result to compact native dtypes (in place)
+
+    - columns listed in COLUMN_DTYPES (or dtypes) get that dtype
+    - other columns holding Decimal values become float64
+    - other columns holding date or datetime values become datetime64
+
+    Args:
+        dataframe: result of a query
+        dtypes: column name -> dtype, overrides COLUMN_DTYPES (e.g. {'fm': 'float32'})
+
+    Returns:
+        DataFrame: the same dataframe with converted columns
+    """
+    schema = dict(COLUMN_DTYPES, **(dtypes or {}))
+    for name in dataframe.columns:
+        column = dataframe[name]
+        if column.ndim != 1:
+            # duplicate column names, leave them alone
+            continue
+        dtype = schema.get(name)
+        if dtype is None:
+            if column.dtype != object:
+                continue
+            # the type of the first value decides, mysql returns one type per column
+            first = column.first_valid_index()
+            if first is None:
+                continue
+            value = column[first]
+            if isinstance(value, decimal.Decimal):
+                dtype = 'float64'
+            elif isinstance(value, (datetime.date, datetime.datetime)):
+                dtype = 'datetime64[ns]'
+            else:
+                continue
+        elif column.dtype == dtype:
+            continue
+        try:
+            dataframe[name] = _convert(column, dtype)
+        except (TypeError, ValueError) as err:
+            logger.warning('column ' + str(name) + ' kept as ' + str(column.dtype) + ': ' + str(err))
+    return dataframe
@@ -0,0 +1,200 @@
+"""
+fast conversion of raw query results to DataFrames
+
+a raw cursor returns the values as the bytes the server sent, without converting every single
+value to a python object (Decimal, datetime, ...) first. numpy copies all rows into one preallocated
+object array (no python loop over the rows) and casts the numeric columns from there into
+preallocated int64/float64 arrays in C, the DataFrame is built from these arrays without copying.
+This pays off for the numeric queries with many rows (MAG/AGE parameters).
+
+only numbers are converted this way, date and text columns are still decoded value by value,
+so queries with long text columns don't gain anything. The fast path needs the C extension of
+mysql-connector-python (see available), the pure python connector returns bytearrays that numpy
+can't cast, querydb falls back to the normal path then.
+
+compare both ways on a query with:
+    python -m database.fastfetch "SELECT fm, fm_sig, dc13 FROM target_v"
+or only the conversion, on generated rows and without a database:
+    python -m database.fastfetch --synthetic [rows]
+"""
+
+from __future__ import annotations  # the annotations don't need pandas to be imported
+from config.logging_conf import logger
+import sys
+import time
+from typing import TYPE_CHECKING
+import mysql.connector
+from mysql.connector import FieldType
+
+if TYPE_CHECKING:
+    import numpy
+    import pandas
+
+# set logger name to the name of the module
+logger.name = __name__
+
+INTEGER_TYPES = {FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24, FieldType.YEAR}
+FLOAT_TYPES = {FieldType.DECIMAL, FieldType.NEWDECIMAL, FieldType.FLOAT, FieldType.DOUBLE}
+DATE_TYPES = {FieldType.DATE, FieldType.NEWDATE, FieldType.DATETIME, FieldType.TIMESTAMP}
+BINARY_TYPES = {FieldType.BIT, FieldType.TINY_BLOB, FieldType.MEDIUM_BLOB, FieldType.LONG_BLOB, FieldType.BLOB}
+
+
+def available(use_pure: bool = False) -> bool:
+    """
+    Args:
+        use_pure: the connections use the pure python connector (config value database/use_pure)
+
+    Returns:
+        bool: True if raw cursors return bytes, i.e. the C extension of the connector is used
+    """
+    return not use_pure and getattr(mysql.connector, 'HAVE_CEXT', False)
+
+
+def _text(value) -> str:
+    # the pure python connector returns bytearrays, the C extension bytes or str
+    if value is None or isinstance(value, str):
+        return value
+    return value.decode('utf-8')
+
+
+def _numbers(column: numpy.ndarray, integer: bool) -> numpy.ndarray:
+    # cast a column of bytes (b'0.98765') in C, NULL becomes NaN
+    import numpy
+    nulls = numpy.equal(column, None)
+    if nulls.any():
+        column = column.copy()
+        column[nulls] = numpy.nan
+    elif integer:
+        return column.astype(numpy.int64)
+    return column.astype(numpy.float64)
+
+
+def raw_to_dataframe(rows: list, description: list) -> pandas.DataFrame:
+    """
+    build a DataFrame from the rows of a raw cursor
+
+    - integer columns become int64 (float64 if they hold NULLs)
+    - decimal and float columns become float64, NULL becomes NaN
+    - date columns become datetime64, invalid dates (0000-00-00) become NaT
+    - all other columns become strings
+
+    Args:
+        rows: rows as returned by fetchall() of a raw cursor
+        description: cursor.description of the query
+
+    Returns:
+        DataFrame: one column per column of the query
+    """
+    import numpy
+    import pandas
+
+    if rows and any(isinstance(value, bytearray) for value in rows[0]):
+        # pure python connector, numpy only casts bytes (slow, querydb doesn't use raw cursors then)
+        rows = [tuple(value if value is None else bytes(value) for value in row) for row in rows]
+    values = numpy.empty((len(rows), len(description)), dtype=object)
+    if rows:
+        values[:] = rows
+    arrays = {}
+    for i, field in enumerate(description):
+        column = values[:, i]
+        field_type = field[1]
+        if field_type in INTEGER_TYPES or field_type in FLOAT_TYPES:
+            array = _numbers(column, field_type in INTEGER_TYPES)
+        elif field_type in DATE_TYPES:
+            array = pandas.to_datetime(pandas.Series([_text(value) for value in column], dtype=object),
+                                       errors='coerce').values
+        elif field_type in BINARY_TYPES:
+            array = column.copy()
+        else:
+            array = numpy.array([_text(value) for value in column], dtype=object)
+        arrays[i] = array
+    # columns are added by position, query results may have duplicate column names
+    dataframe = pandas.DataFrame(arrays, copy=False)
+    dataframe.columns = [field[0] for field in description]
+    return dataframe
+
+
+def benchmark(query_str: str, repeat: int = 5) -> dict:
+    """
+    run a query with the normal and the raw fetch path and compare the time and the memory
+
+    Args:
+        query_str: MySql query string
+        repeat: number of runs of each path, the best run counts
+
+    Returns:
+        dict: path name -> (seconds of the best run, memory of the DataFrame in bytes)
+    """
+    from database.pysamsdb import mydb  # this is the already instantiated MyDatabase object to the AMS DB
+
+    results = {}
+    frames = {}
+    for name, raw in (('converted', False), ('raw', True)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            frames[name] = mydb.querydb(query_str, ttl=0, raw=raw)
+            duration = time.perf_counter() - start
+            best = duration if best is None else min(best, duration)
+        results[name] = (best, int(frames[name].memory_usage(deep=True).sum()))
+        logger.info('benchmark {0}: {1:.3f} s, {2} rows'.format(name, best, len(frames[name])))
+    if frames['converted'].shape != frames['raw'].shape:
+        logger.warning('benchmark: the results of both paths differ in shape')
+    return results
+
+
+
+def benchmark_conversion(count: int = 200000, repeat: int = 5) -> dict:
+    """
+    compare only the conversion of both paths on generated rows, no database needed
+
+    the rows look like the QC series: an integer and four decimal columns. The converted path gets
+    Decimals like querydb from a normal cursor (the time the connector needs to create them is not counted)
+
+    Args:
+        count: number of rows
+        repeat: number of runs of each path, the best run counts
+
+    Returns:
+        dict: path name -> (seconds of the best run, memory of the DataFrame in bytes)
+    """
+    from decimal import Decimal
+    import numpy
+    import pandas
+
+    names = ['sample_nr', 'fm', 'fm_sig', 'dc13', 'co2_final']
+    description = [(names[0], FieldType.LONG)] + [(name, FieldType.NEWDECIMAL) for name in names[1:]]
+    generator = numpy.random.default_rng(0)
+    numbers = numpy.column_stack([numpy.arange(count), generator.random((count, 4))])
+    raw_rows = [(b'%d' % row[0],) + tuple(b'%.6f' % value for value in row[1:]) for row in numbers.tolist()]
+    converted_rows = [(int(row[0]),) + tuple(Decimal(value.decode()) for value in row[1:]) for row in raw_rows]
+
+    paths = {'converted': lambda: pandas.DataFrame.from_records(converted_rows, columns=names, coerce_float=True),
+             'raw': lambda: raw_to_dataframe(raw_rows, description)}
+    results = {}
+    frames = {}
+    for name, convert in paths.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            frames[name] = convert()
+            duration = time.perf_counter() - start
+            best = duration if best is None else min(best, duration)
+        results[name] = (best, int(frames[name].memory_usage(deep=True).sum()))
+    if not numpy.allclose(frames['converted'].to_numpy(dtype=float), frames['raw'].to_numpy(dtype=float)):
+        logger.warning('benchmark: the results of both paths differ')
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('usage: python -m database.fastfetch "<query>" [repeat]')
+        print('       python -m database.fastfetch --synthetic [rows]')
+        sys.exit(1)
+    if sys.argv[1] == '--synthetic':
+        timings = benchmark_conversion(int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
+    else:
+        timings = benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 5)
+    for path_name, (seconds, memory) in timings.items():
+        print('{0:10s} {1:8.3f} s {2:12d} bytes'.format(path_name, seconds, memory))
+    print('speedup: {0:.1f}x'.format(timings['converted'][0] / timings['raw'][0]))
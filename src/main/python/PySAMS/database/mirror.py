@@ -0,0 +1,251 @@
+"""
+local mirror of the tables used by the QC plots
+
+the tables are copied to the local disk once and afterwards only the new rows are pulled,
+the QC plots (plots.qc.standards, plots.qc.qcplots) read target_v from the local copy so that
+they don't scan years of history on the server and keep working when the database host can't be reached.
+
+the mirror is off by default (config value mirror/enabled). When it is on, batch.py updates it before
+the plots are rendered, and the plots only use a copy that is younger than mirror/max_age seconds,
+otherwise they query the database.
+
+the mirror can also be updated from the command line (e.g. nightly by a cron job):
+    python -m database.mirror          new rows only
+    python -m database.mirror --full   copy all tables again
+"""
+
+from config.logging_conf import logger
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import NamedTuple
+import pandas
+from config.config import myconfig, LazyInstance  # myconfig calss will be loaded here
+from database.dtypes import normalize_dtypes
+from database.pysamsdb import mydb  # this is the already instantiated MyDatabase object to the AMS DB
+
+# set logger name to the name of the module
+logger.name = __name__
+
+
+class MirrorTable(NamedTuple):
+    """
+    one table of the mirror
+
+    name: name of the table (or view) in the database
+    key: increasing primary key, rows with a key above the largest local key are new
+    watermark: column that only grows when a row changes (e.g. the magazine a target is measured in),
+               rows with a value >= the largest local value are pulled again. None if the table has no such column
+    """
+    name: str
+    key: str
+    watermark: str = None
+
+
+# tables copied to the local disk, only the tables the plots read
+MIRROR_TABLES = [
+    MirrorTable('target_v', 'target_nr', 'magazine'),
+]
+
+
+def like(series: pandas.Series, pattern: str) -> pandas.Series:
+    """
+    filter a column like the MySql LIKE operator does (case insensitive, % and _ as wildcards)
+
+    Args:
+        series: column of a dataframe
+        pattern: LIKE pattern, e.g. '%IAEA%C1%'
+
+    Returns:
+        Series: True for all rows that match the pattern
+    """
+    regex = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in pattern)
+    return series.astype(str).str.fullmatch(regex, case=False) & series.notna()
+
+
+class MyMirror:
+    """
+    local copy of the database tables in MIRROR_TABLES
+
+    every table is stored as a pickled DataFrame, the largest key and watermark
+    of every table are stored in state.json next to them
+
+    Args:
+        path: directory of the mirror
+        tables: tables to copy
+
+    Returns:
+        None
+    """
+
+    def __init__(self, path: str = 'mirror', tables: list = None):
+        logger.debug('MyMirror -- init mirror in ' + path)
+        self.path = path
+        self.tables = {table.name: table for table in (tables or MIRROR_TABLES)}
+        # tables already read from disk
+        self._frames = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self.state = self._read_state()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name + '.pkl')
+
+    def _read_state(self) -> dict:
+        try:
+            with open(os.path.join(self.path, 'state.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_state(self):
+        file = os.path.join(self.path, 'state.json')
+        with open(file + '.tmp', 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(file + '.tmp', file)
+
+    def has(self, name: str) -> bool:
+        """
+        Returns:
+            bool: True if a local copy of the table exists
+        """
+        return name in self._frames or os.path.isfile(self._file(name))
+
+    def last_sync(self, name: str) -> float:
+        """
+        Returns:
+            float: time of the last sync of the table (seconds since the epoch), None if it was never synced
+        """
+        return self.state.get(name, {}).get('synced')
+
+    def table(self, name: str) -> pandas.DataFrame:
+        """
+        return the local copy of a table
+
+        Args:
+            name: name of the table
+
+        Returns:
+            DataFrame: a copy of the table, the plots may change it
+        """
+        with self._lock:
+            if name not in self._frames:
+                logger.debug('MyMirror -- reading ' + name)
+                self._frames[name] = pandas.read_pickle(self._file(name))
+            return self._frames[name].copy()
+
+    def sync_table(self, name: str, full: bool = False) -> int:
+        """
+        pull the new and changed rows of a table from the database and merge them into the local copy
+
+        Args:
+            name: name of the table
+            full: copy the whole table instead of the new rows only
+
+        Returns:
+            int: number of rows pulled from the database
+        """
+        table = self.tables[name]
+        state = self.state.get(name, {})
+        full = full or not self.has(name) or 'key' not in state
+        start = time.perf_counter()
+
+        if full:
+            # stream the table, the whole history doesn't have to fit into one result
+            chunks = list(mydb.querydb_chunks('SELECT * FROM ' + name))
+            dataframe = pandas.concat(chunks, ignore_index=True) if chunks else pandas.DataFrame()
+            dataframe = normalize_dtypes(dataframe)
+            pulled = len(dataframe)
+        else:
+            query = 'SELECT * FROM ' + name + ' WHERE ' + table.key + ' > %s'
+            params = [state['key']]
+            if table.watermark is not None and state.get('watermark') is not None:
+                # the last watermark is included, e.g. the newest magazine might not have been complete
+                query += ' OR ' + table.watermark + ' >= %s'
+                params.append(state['watermark'])
+            new_rows = mydb.querydb(query, params=params, ttl=0)
+            pulled = len(new_rows)
+            dataframe = self.table(name)
+            if pulled > 0:
+                # changed rows replace the local ones
+                dataframe = pandas.concat([dataframe, new_rows], ignore_index=True)
+                dataframe = dataframe.drop_duplicates(subset=table.key, keep='last')
+                # categoricals with different categories are merged into strings, convert them again
+                dataframe = normalize_dtypes(dataframe)
+
+        if pulled > 0 or full:
+            dataframe = dataframe.sort_values(table.key, ignore_index=True)
+            # write to a temporary file first, the old copy stays usable if anything fails
+            dataframe.to_pickle(self._file(name) + '.tmp')
+            os.replace(self._file(name) + '.tmp', self._file(name))
+            with self._lock:
+                self._frames[name] = dataframe
+            if len(dataframe) > 0:
+                state['key'] = int(dataframe[table.key].max())
+                if table.watermark is not None and dataframe[table.watermark].notna().any():
+                    # object values, categoricals have no max()
+                    state['watermark'] = str(dataframe[table.watermark].dropna().astype(object).max())
+        state['synced'] = time.time()
+        self.state[name] = state
+        self._write_state()
+        logger.info('MyMirror -- {0}: {1} rows pulled in {2:.1f} s'.format(name, pulled, time.perf_counter() - start))
+        return pulled
+
+    def sync(self, full: bool = False) -> dict:
+        """
+        update all tables of the mirror
+
+        a table that fails to sync keeps its old copy, the other tables are synced anyway
+
+        Args:
+            full: copy the whole tables instead of the new rows only
+
+        Returns:
+            dict: table name -> number of rows pulled (None if the sync of the table failed)
+        """
+        pulled = {}
+        for name in self.tables:
+            try:
+                pulled[name] = self.sync_table(name, full)
+            except Exception as err:
+                logger.error('MyMirror -- sync of ' + name + ' failed: ' + str(err))
+                pulled[name] = None
+        return pulled
+
+
+# the MyMirror Object is shared across modules, it is instantiated when it is used for the first time
+mymirror = LazyInstance(lambda: MyMirror(path=myconfig.get('mirror', 'path', fallback='mirror')))
+
+
+def enabled() -> bool:
+    """
+    Returns:
+        bool: True if the mirror is used (config value mirror/enabled)
+    """
+    return myconfig.getboolean('mirror', 'enabled', fallback=False)
+
+
+def use_mirror(name: str) -> bool:
+    """
+    Returns:
+        bool: True if the plots should read the table from the local mirror instead of the database,
+        False if the mirror is off, has no copy of the table or the copy is older than mirror/max_age seconds
+    """
+    if not enabled() or not mymirror.has(name):
+        return False
+    synced = mymirror.last_sync(name)
+    max_age = myconfig.getfloat('mirror', 'max_age', fallback=86400)
+    if synced is None or time.time() - synced > max_age:
+        logger.warning('MyMirror -- copy of ' + name + ' is outdated, querying the database')
+        return False
+    return True
+
+
+if __name__ == '__main__':
+    result = mymirror.sync(full='--full' in sys.argv)
+    for table_name, rows in result.items():
+        print(table_name + ': ' + ('failed' if rows is None else str(rows) + ' rows'))
+    sys.exit(1 if None in result.values() else 0)
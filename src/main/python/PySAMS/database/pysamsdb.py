@@ -2,14 +2,24 @@
 All the database stuff
 """
 
+from __future__ import annotations  # the annotations don't need pandas to be imported
 from config.logging_conf import logger
 import mysql.connector
 from mysql.connector import errorcode
-import pandas.io.sql as sql
-from pandas import DataFrame
+from typing import Iterator, NamedTuple, TYPE_CHECKING
 import PyQt5.QtSql as QtSql
 import PyQt5.QtWidgets as QtWidgets
-from config.config import myconfig  # myconfig calss will be loaded here
+import time
+from config.config import myconfig, LazyInstance  # myconfig calss will be loaded here
+from database.connectionpool import MyConnectionPool
+from database.querycache import MyQueryCache
+from database.querystats import MyQueryStats, QueryTiming
+from database.dtypes import normalize_dtypes
+import database.fastfetch as fastfetch
+
+if TYPE_CHECKING:
+    # pandas is imported when the first query runs, not while the app starts
+    from pandas import DataFrame
 
 # set logger name to the name of the module
 logger.name = __name__
@@ -71,19 +81,20 @@ def query_db(query):
             logger.error(err)
     else:
         logger.debug("connected to database: " + db_params['database'])
-        # create cursor that returns values are dictionaries
-        db_cursor = db_conn.cursor(dictionary=True)
-        # alternatively also use the pandas data frame
+        # run the query once and build the dataframe, the row count and the timing from that single fetch
+        db_cursor = db_conn.cursor()
         logger.info('run query:')
         logger.debug(query)
-        dataframe = sql.read_sql(query, db_conn)
-        # query the database (returns the number of records)
+        start = time.perf_counter()
         db_cursor.execute(query)
         # fetch all the data in order to copy the data into memory
         rows = db_cursor.fetchall()
+        duration = time.perf_counter() - start
+        from pandas import DataFrame
+        dataframe = DataFrame.from_records(rows, columns=db_cursor.column_names)
         # display number of records
-        row_count = db_cursor.rowcount
-        logger.info("Number of Records: " + str(row_count))
+        row_count = len(rows)
+        logger.info("Number of Records: " + str(row_count) + ' (' + str(round(duration, 3)) + ' s)')
         # cleaning up
         db_cursor.close()
         db_conn.close()
@@ -94,6 +105,18 @@ def query_db(query):
         # return the rows
         return dataframe
 
+class DashboardSnapshot(NamedTuple):
+    """
+    all counters shown on the dashboard, as returned by MyDatabase.get_dashboard_snapshot
+    """
+    available_oxas: int
+    available_blanks: int
+    unprepped_samples: int
+    samples_ready_for_graph: int
+    samples_ready_for_analysis: int
+    samples_express: int
+
+
 '''
 class MyDatabaseQt(QtSql.QSqlDatabase):
     """
@@ -350,8 +373,33 @@ class MyDatabase:
             'host': self.hostName,
             'database': self.dbName,
             'raise_on_warnings': True,
+            # use the C extension of the connector if it is installed
+            'use_pure': myconfig.getboolean('database', 'use_pure', fallback=False),
         }
 
+        # pool of open connections shared by all queries (and threads)
+        self.poolsize = myconfig.getint('database', 'poolsize', fallback=5)
+        logger.debug('pool size: ' + str(self.poolsize))
+        self.pool = MyConnectionPool(self.db_params, size=self.poolsize,
+                                     ping_interval=myconfig.getfloat('database', 'pool_ping_interval', fallback=60))
+        # number of rows per DataFrame when streaming query results
+        self.chunksize = myconfig.getint('database', 'chunksize', fallback=10000)
+
+        # cache of query results, results are valid for cache_ttl seconds unless the query sets its own ttl.
+        # 0 = off, the GUI always shows the current data, batch.py and the web app switch it on (cache/service_ttl)
+        self.cache_ttl = myconfig.getfloat('cache', 'ttl', fallback=0)
+        # queries over years of history (standards, throughput, ...) change rarely, they pass this ttl themselves
+        # so that they are cached in the GUI too. Ad hoc queries (SqlPlotWindow) are never cached
+        self.history_ttl = myconfig.getfloat('cache', 'history_ttl', fallback=3600)
+        self.cache = MyQueryCache(path=myconfig.get('cache', 'path', fallback='cache'),
+                                  memory_entries=myconfig.getint('cache', 'memory_entries', fallback=32),
+                                  max_disk_mb=myconfig.getfloat('cache', 'max_disk_mb', fallback=500))
+
+        # timings, rows and sizes of the last queries
+        self.stats = MyQueryStats(max_records=myconfig.getint('database', 'stats_records', fallback=1000),
+                                  deep_memory=myconfig.getboolean('database', 'stats_deep_memory', fallback=False),
+                                  deep_rows=myconfig.getint('database', 'stats_deep_rows', fallback=100000))
+
     def set_hostname(self, hostname):
         logger.debug('set_hostname = ' + hostname)
         self.hostName = hostname
@@ -397,6 +445,42 @@ class MyDatabase:
             logger.info('connection successful')
             return db
 
+    def connection(self):
+        """
+        check out a pooled connection for the current thread
+
+        use as: with mydb.connection() as db: ...
+
+        Returns:
+            db: db connection that goes back to the pool after the with block
+        """
+        return self.pool.connection()
+
+    def kill_query(self, connection_id: int):
+        """
+        abort the query that is currently running on a connection
+
+        KILL QUERY is sent over a separate connection, the killed connection itself stays usable
+
+        Args:
+            connection_id: server side id of the connection that runs the query
+        """
+        logger.info('kill query on connection ' + str(connection_id))
+        try:
+            db = mysql.connector.connect(**self.db_params)
+        except mysql.connector.Error as err:
+            logger.error('cant kill query: ' + str(err))
+            return
+        try:
+            cursor = db.cursor()
+            cursor.execute('KILL QUERY ' + str(int(connection_id)))
+            cursor.close()
+        except mysql.connector.Error as err:
+            # the query may have finished in the meantime
+            logger.warning('kill query failed: ' + str(err))
+        finally:
+            db.close()
+
     def get_dbversion(self) -> str:
         """
         returns the database version of the connected DB
@@ -406,39 +490,135 @@ class MyDatabase:
         """
         # create Query object connected to the database and execute
         try:
-            db = self.opendb()
+            with self.connection() as db:
+                server_version = str(db.get_server_version())
         except mysql.connector.Error as err:
             logger.error('cant get server version')
         else:
-            server_version = str(db.get_server_version())
             logger.info('Sever Version = ' + server_version)
-            logger.debug('closing db connection')
-            db.close()
             return server_version
 
-    def querydb(self, query_str: str) -> DataFrame:
+    def _fetchall(self, query_str: str, params=None, raw: bool = False) -> tuple:
+        """
+        run a query on a pooled connection and fetch all rows
+
+        Args:
+            query_str: MySql query string
+            params: parameters of the query (placeholders %s in the query string)
+            raw: return the values as sent by the server, without converting them to python objects
+
+        Returns:
+            tuple: rows, cursor description and the QueryTiming of the query
+        """
+        start = time.perf_counter()
+        with self.connection() as db:
+            connected = time.perf_counter()
+            cursor = db.cursor(raw=raw)
+            cursor.execute(query_str, params)
+            executed = time.perf_counter()
+            rows = cursor.fetchall()
+            description = cursor.description
+            cursor.close()
+        timing = QueryTiming(connect=connected - start, execute=executed - connected,
+                             fetch=time.perf_counter() - executed)
+        return rows, description, timing
+
+    def querydb(self, query_str: str, params=None, ttl: float = None, dtypes: dict = None,
+                raw: bool = False) -> DataFrame:
         """
         - query the database using the query-string
 
-        the function opens the database first
+        the result is taken from the cache if the same query was run before and the result is not expired.
+        Otherwise the function checks out a connection from the pool first,
         if there is no error the query is being processed
-        and the result returned
+        and the result returned (and stored in the cache)
 
         Args:
             query_str: MySql query string
+            params: parameters of the query (placeholders %s in the query string)
+            ttl: seconds the result stays in the cache, default is cache_ttl (config value cache/ttl, off unless
+                 the process switched it on), 0 bypasses the cache
+            dtypes: dtypes of single columns, in addition to the ones in database.dtypes.COLUMN_DTYPES
+            raw: fast path for large numeric results, the values are parsed into numpy arrays directly
+                 (see database.fastfetch), ignored without the C extension of the connector
 
         Returns:
-            DataFrame: returns a Pandas Dataframe
+            DataFrame: returns a Pandas Dataframe with compact dtypes (see normalize_dtypes)
         """
 
         logger.debug('query: ' + query_str)
-        # open database and query
-        db = self.opendb()
-        dataframe = sql.read_sql(query_str, db)
-        db.close()
+        if ttl is None:
+            ttl = self.cache_ttl
+        key = None
+        if ttl > 0:
+            # the same query with other dtypes or read raw gives another DataFrame
+            key = self.cache.key(query_str, params, (sorted((dtypes or {}).items()), raw))
+            dataframe = self.cache.get(key)
+            if dataframe is not None:
+                logger.debug('result taken from cache')
+                self.stats.record(query_str, dataframe=dataframe, cached=True)
+                return dataframe
+        # the pure python connector returns bytearrays, the normal path is faster for them
+        raw = raw and fastfetch.available(self.db_params['use_pure'])
+        # get a connection from the pool and query
+        rows, description, timing = self._fetchall(query_str, params, raw)
+        if raw:
+            dataframe = fastfetch.raw_to_dataframe(rows, description)
+        else:
+            from pandas import DataFrame
+            # coerce_float converts the decimals to floats like read_sql does
+            dataframe = DataFrame.from_records(rows, columns=[field[0] for field in description], coerce_float=True)
+        dataframe = normalize_dtypes(dataframe, dtypes)
+        self.stats.record(query_str, timing, rows, dataframe)
         logger.debug(dataframe.head(10))
+        if key is not None:
+            self.cache.put(key, dataframe, ttl)
         return dataframe
 
+    def querydb_chunks(self, query_str: str, chunksize: int = None) -> Iterator[DataFrame]:
+        """
+        - query the database and stream the result in chunks
+
+        the rows are read from an unbuffered cursor, so the server sends them while
+        they are consumed and only one chunk at a time is held in memory.
+        The connection stays checked out until the last chunk was read.
+
+        Args:
+            query_str: MySql query string
+            chunksize: number of rows per chunk, default is read from the config file
+
+        Returns:
+            Iterator[DataFrame]: yields Pandas Dataframes with up to chunksize rows
+        """
+
+        if chunksize is None:
+            chunksize = self.chunksize
+        logger.debug('query (chunks of ' + str(chunksize) + '): ' + query_str)
+        from pandas import DataFrame
+        # use a connection of its own so that other queries can run while the chunks are consumed
+        start = time.perf_counter()
+        with self.pool.connection(exclusive=True) as db:
+            connected = time.perf_counter()
+            cursor = db.cursor(buffered=False)
+            cursor.execute(query_str)
+            executed = time.perf_counter()
+            columns = cursor.column_names
+            row_count = 0
+            fetch_time = 0.0
+            while True:
+                fetch_start = time.perf_counter()
+                rows = cursor.fetchmany(chunksize)
+                # the time the consumer needs for a chunk is not part of the query
+                fetch_time += time.perf_counter() - fetch_start
+                if not rows:
+                    break
+                row_count += len(rows)
+                yield normalize_dtypes(DataFrame.from_records(rows, columns=columns, coerce_float=True))
+            cursor.close()
+            logger.debug('streamed rows: ' + str(row_count))
+        # only the row count is recorded, the chunks are gone already
+        self.stats.record(query_str, QueryTiming(connected - start, executed - connected, fetch_time),
+                          row_count=row_count)
 
     def querydb_single_string(self, query_str: str) -> str:
         """
@@ -452,13 +632,9 @@ class MyDatabase:
         """
 
         logger.debug('query: ' + query_str)
-        # open database and query
-        db = self.opendb()
-        cursor = db.cursor()
-        cursor.execute(query_str)
-        result = cursor.fetchall()
-        cursor.close()
-        db.close()
+        # get a connection from the pool and query
+        result, description, timing = self._fetchall(query_str)
+        self.stats.record(query_str, timing, result)
         return str(result[0][0])
 
     def get_number_of_unprepped_samples(self) -> str:
@@ -595,8 +771,95 @@ class MyDatabase:
 
         return self.querydb_single_string(query_str)
 
+    def get_dashboard_snapshot(self) -> DashboardSnapshot:
+        """
+        return all counters of the dashboard with one single query
+
+        the conditions are the same as in get_number_of_unprepped_samples, get_number_of_samples_ready_for_graph,
+        get_number_of_samples_ready_for_analysis, get_number_of_samples_express, get_number_available_oxas and
+        get_number_available_blanks. Instead of one query per counter every counter is a conditional sum over
+        the same join, so the tables are read once and there is only one round trip to the server.
+
+        Returns:
+            DashboardSnapshot: all counters as integers
+        """
+        query_str = """SELECT samples.unprepped, samples.ready_for_graph, samples.ready_for_analysis, samples.express,
+                    targets.oxas, targets.blanks
+                    FROM
+                    (SELECT
+                        SUM(CASE WHEN prep_end IS NULL
+                            AND sample_t.c14_age IS NULL
+                            AND target_t.fm IS NULL
+                            AND type not in ('blank', 'oxa1', 'oxa2')
+                            AND graphitized IS NULL
+                            AND last_name not in ('Levin', 'intern')
+                            AND year(in_date)>2010
+                            AND sample_t.sample_nr>9999
+                            AND preparation_t.stop=0
+                            AND sample_t.not_tobedated=0
+                            THEN 1 ELSE 0 END) AS unprepped,
+                        SUM(CASE WHEN preparation_t.prep_end IS NOT NULL and target_t.graphitized IS NULL
+                            AND target_t.target_pressed IS NULL
+                            AND target_t.calcset is NULL
+                            AND sample_t.not_tobedated=0
+                            AND preparation_t.stop=0
+                            AND target_t.stop=0
+                            AND project_t.out_date IS NULL
+                            AND sample_t.type NOT LIKE 'oxa%'
+                            AND NOT (user_t.last_name = 'intern' AND user_t.first_name ='intern')
+                            THEN 1 ELSE 0 END) AS ready_for_graph,
+                        SUM(CASE WHEN preparation_t.prep_end IS NOT NULL and target_t.graphitized IS NOT NULL
+                            and target_t.target_pressed IS NOT NULL and target_t.calcset is NULL and sample_t.not_tobedated=0
+                            and preparation_t.stop=0 and  target_t.stop=0
+                            and project_t.out_date IS NULL
+                            and target_t.fm is NULL
+                            and sample_t.type NOT LIKE 'blank%'
+                            and sample_t.type NOT LIKE 'oxa%'
+                            and user_label NOT LIKE 'HEI_%'
+                            THEN 1 ELSE 0 END) AS ready_for_analysis,
+                        SUM(CASE WHEN sample_t.user_label LIKE '%eil%'
+                            and target_t.calcset is NULL and sample_t.not_tobedated=0
+                            and preparation_t.stop=0 and  target_t.stop=0
+                            and (project_t.out_date < '1900-01-01' or project_t.out_date IS NULL)
+                            THEN 1 ELSE 0 END) AS express
+                    FROM sample_t
+                    INNER JOIN project_t ON project_t.project_nr=sample_t.project_nr
+                    INNER JOIN user_t ON user_t.user_nr=project_t.user_nr
+                    INNER JOIN preparation_t ON preparation_t.sample_nr=sample_t.sample_nr
+                    INNER JOIN target_t ON target_t.sample_nr=sample_t.sample_nr) AS samples
+                    CROSS JOIN
+                    (SELECT
+                        SUM(CASE WHEN magazine IS NULL
+                            AND graphitized IS NOT NULL
+                            AND stop=0
+                            AND sample_t.type like 'oxa%'
+                            AND sample_t.user_label like 'oxa%'
+                            THEN 1 ELSE 0 END) AS oxas,
+                        SUM(CASE WHEN magazine IS NULL
+                            AND graphitized IS NOT NULL
+                            AND stop=0
+                            AND sample_t.type like 'blank%'
+                            AND sample_t.user_label like 'Phthalic%'
+                            THEN 1 ELSE 0 END) AS blanks
+                    FROM target_t
+                    INNER JOIN sample_t ON target_t.sample_nr=sample_t.sample_nr) AS targets"""
 
-# already instantiate the MyDatabase Object here
-# that allows sharing this single instance across modules
-logger.debug('Instantiate the MyDatabase object instance while importing the module')
-mydb = MyDatabase()
+        logger.debug('query: ' + query_str)
+        # get a connection from the pool and query
+        rows, description, timing = self._fetchall(query_str)
+        self.stats.record(query_str, timing, rows)
+        unprepped, for_graph, for_analysis, express, oxas, blanks = rows[0]
+        # SUM() returns NULL for empty tables and a Decimal otherwise
+        snapshot = DashboardSnapshot(available_oxas=int(oxas or 0),
+                                     available_blanks=int(blanks or 0),
+                                     unprepped_samples=int(unprepped or 0),
+                                     samples_ready_for_graph=int(for_graph or 0),
+                                     samples_ready_for_analysis=int(for_analysis or 0),
+                                     samples_express=int(express or 0))
+        logger.debug('dashboard snapshot: ' + str(snapshot))
+        return snapshot
+
+
+# the MyDatabase Object is shared across modules,
+# it is instantiated when it is used for the first time (not while importing the module)
+mydb = LazyInstance(MyDatabase)
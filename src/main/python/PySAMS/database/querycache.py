@@ -0,0 +1,196 @@
+"""
+cache for the results of database queries
+
+- in memory: the most recently used results (LRU)
+- on disk: compressed pickles that survive a restart of the app
+
+every result has an expiry time (TTL), expired results are never returned
+"""
+
+from __future__ import annotations  # the annotations don't need pandas to be imported
+from config.logging_conf import logger
+import collections
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas
+
+# set logger name to the name of the module
+logger.name = __name__
+
+# quoted strings are kept as they are, whitespace outside of them is collapsed
+_SQL_TOKENS = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)|\s+""")
+
+
+def normalize_sql(query_str: str) -> str:
+    """
+    normalize a query string so that the same query with different formatting gets the same cache key
+
+    Args:
+        query_str: MySql query string
+
+    Returns:
+        str: query with collapsed whitespace and without trailing semicolon
+    """
+    normalized = _SQL_TOKENS.sub(lambda m: m.group(1) if m.group(1) else ' ', query_str)
+    return normalized.strip().rstrip(';').strip()
+
+
+class MyQueryCache:
+    """
+    two tier (memory + disk) cache of query results
+
+    Args:
+        path: directory of the disk cache
+        memory_entries: number of results kept in memory
+        max_disk_mb: size limit of the disk cache, the least recently used files are removed first
+
+    Returns:
+        None
+    """
+
+    def __init__(self, path: str = 'cache', memory_entries: int = 32, max_disk_mb: float = 500):
+        logger.debug('MyQueryCache -- init cache in ' + path)
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        # key -> (expires, dataframe), most recently used at the end
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(query_str: str, params=None, options=None) -> str:
+        """
+        cache key of a query
+
+        Args:
+            query_str: MySql query string
+            params: parameters of the query
+            options: anything else that changes the result of the query (e.g. dtypes), must have a stable repr
+
+        Returns:
+            str: hash of the normalized query, its parameters and options
+        """
+        text = normalize_sql(query_str) + '\n' + repr(params) + '\n' + repr(options)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _files(self, key: str) -> list:
+        # disk entries are named <key>.<expires>.pkl.gz
+        return glob.glob(os.path.join(self.path, key + '.*.pkl.gz'))
+
+    def get(self, key: str) -> pandas.DataFrame:
+        """
+        return a cached result
+
+        Args:
+            key: cache key (see MyQueryCache.key)
+
+        Returns:
+            DataFrame: a copy of the cached result or None if there is no valid result
+        """
+        now = time.time()
+        with self._lock:
+            if key in self._memory:
+                expires, dataframe = self._memory[key]
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    # return a copy, the plots change their dataframes in place
+                    return dataframe.copy()
+                del self._memory[key]
+
+            for file in self._files(key):
+                expires = float(os.path.basename(file).split('.')[1])
+                if expires <= now:
+                    self._remove(file)
+                    continue
+                try:
+                    import pandas
+                    dataframe = pandas.read_pickle(file, compression='gzip')
+                except Exception as err:
+                    logger.warning('MyQueryCache -- cant read ' + file + ': ' + str(err))
+                    self._remove(file)
+                    continue
+                # touch the file, the modification time is used as last access for the LRU of the disk
+                os.utime(file)
+                self._remember(key, expires, dataframe)
+                return dataframe.copy()
+        return None
+
+    def put(self, key: str, dataframe: pandas.DataFrame, ttl: float):
+        """
+        store a result in memory and on disk
+
+        Args:
+            key: cache key (see MyQueryCache.key)
+            dataframe: result of the query
+            ttl: seconds the result is valid
+        """
+        expires = int(time.time() + ttl)
+        with self._lock:
+            self._remember(key, expires, dataframe.copy())
+            for file in self._files(key):
+                self._remove(file)
+            file = os.path.join(self.path, key + '.' + str(expires) + '.pkl.gz')
+            # write to a temporary file first, so that nobody reads a half written file
+            tmpfile = file + '.' + str(os.getpid()) + '.tmp'
+            try:
+                dataframe.to_pickle(tmpfile, compression='gzip')
+                os.replace(tmpfile, file)
+            except Exception as err:
+                logger.warning('MyQueryCache -- cant write ' + file + ': ' + str(err))
+                self._remove(tmpfile)
+                return
+            self._evict()
+
+    def _remember(self, key: str, expires: float, dataframe: pandas.DataFrame):
+        self._memory[key] = (expires, dataframe)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        # remove expired files and the least recently used ones until the size limit is met
+        now = time.time()
+        entries = []
+        total = 0
+        for file in glob.glob(os.path.join(self.path, '*.pkl.gz')):
+            try:
+                stat = os.stat(file)
+                expires = float(os.path.basename(file).split('.')[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            if expires <= now:
+                self._remove(file)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file))
+            total += stat.st_size
+        entries.sort()
+        while total > self.max_disk_bytes and entries:
+            mtime, size, file = entries.pop(0)
+            logger.debug('MyQueryCache -- evict ' + file)
+            self._remove(file)
+            total -= size
+
+    @staticmethod
+    def _remove(file: str):
+        try:
+            os.remove(file)
+        except OSError:
+            pass
+
+    def clear(self):
+        """
+        remove all results from memory and disk
+        """
+        logger.debug('MyQueryCache -- clear')
+        with self._lock:
+            self._memory.clear()
+            for file in glob.glob(os.path.join(self.path, '*.pkl.gz')):
+                self._remove(file)
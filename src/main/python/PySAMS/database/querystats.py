@@ -0,0 +1,241 @@
+"""
+instrumentation of the database queries
+
+every query run by MyDatabase is recorded with the function that asked for it,
+the time spent for getting a connection, executing and fetching, the number of rows
+and the size of the result. The records can be looked at in the running app
+(mydb.stats.summary()) or exported to JSON or CSV to compare them over time.
+"""
+
+from __future__ import annotations  # the annotations don't need pandas to be imported
+from config.logging_conf import logger
+import collections
+import datetime
+import json
+import sys
+import threading
+import time
+from typing import NamedTuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas
+
+# set logger name to the name of the module
+logger.name = __name__
+
+
+class QueryTiming(NamedTuple):
+    """
+    seconds spent in the phases of a query
+
+    connect: waiting for a connection from the pool
+    execute: sending the query until the server answered
+    fetch: reading the rows
+    """
+    connect: float = 0.0
+    execute: float = 0.0
+    fetch: float = 0.0
+
+
+class QueryRecord(NamedTuple):
+    """
+    one recorded query
+
+    started: time the query was started (seconds since the epoch)
+    caller: module and function that asked for the query, e.g. plots.qc.qcplots.query_c1
+    query: MySql query string
+    connect_s, execute_s, fetch_s: see QueryTiming
+    rows: number of rows returned
+    bytes: approximate size of the rows sent by the server
+    memory: memory of the resulting DataFrame (0 if no DataFrame was created)
+    cached: True if the result came from the cache and the database wasn't asked at all
+    """
+    started: float
+    caller: str
+    query: str
+    connect_s: float
+    execute_s: float
+    fetch_s: float
+    rows: int
+    bytes: int
+    memory: int
+    cached: bool
+
+    @property
+    def total_s(self) -> float:
+        return self.connect_s + self.execute_s + self.fetch_s
+
+
+def find_caller() -> str:
+    """
+    return the first function on the call stack that is not part of the database package
+
+    Returns:
+        str: module.function of the caller
+    """
+    frame = sys._getframe(1)
+    caller = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        caller = module + '.' + frame.f_code.co_name
+        if not module.startswith('database.'):
+            break
+        frame = frame.f_back
+    return caller
+
+
+def approx_bytes(rows: list, sample_size: int = 100) -> int:
+    """
+    estimate the size of the rows sent by the server from a sample of the rows
+
+    Args:
+        rows: rows as returned by cursor.fetchall()
+        sample_size: number of rows looked at
+
+    Returns:
+        int: approximate number of bytes
+    """
+    if not rows:
+        return 0
+    step = max(1, len(rows) // sample_size)
+    sample = rows[::step]
+    size = 0
+    for row in sample:
+        for value in row:
+            if value is None:
+                continue
+            if isinstance(value, (str, bytes, bytearray)):
+                size += len(value)
+            else:
+                # numbers and dates are sent as short strings or 8 byte values
+                size += 8
+    return int(size * len(rows) / len(sample))
+
+
+class MyQueryStats:
+    """
+    in memory log of the last queries
+
+    Args:
+        max_records: number of queries kept, the oldest records are dropped first
+        deep_memory: measure the memory of every DataFrame including the strings in object columns
+        deep_rows: measure it including the strings for DataFrames with at least this many rows (0 = never)
+
+    Returns:
+        None
+    """
+
+    def __init__(self, max_records: int = 1000, deep_memory: bool = False, deep_rows: int = 100000):
+        self.enabled = True
+        # a deep memory_usage looks at every string of the object columns, that costs about as much as
+        # building the DataFrame, so it is only done if asked for or for the large results
+        self.deep_memory = deep_memory
+        self.deep_rows = deep_rows
+        self._records = collections.deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(self, query_str: str, timing: QueryTiming = QueryTiming(), rows: list = None,
+               dataframe: pandas.DataFrame = None, cached: bool = False, row_count: int = None):
+        """
+        add a query to the log
+
+        Args:
+            query_str: MySql query string
+            timing: time spent in the phases of the query
+            rows: rows fetched from the database, used for the number of rows and the size
+            dataframe: DataFrame created from the rows (or taken from the cache)
+            cached: the result was taken from the cache
+            row_count: number of rows if neither the rows nor the DataFrame are kept (e.g. streamed results)
+        """
+        if not self.enabled:
+            return
+        if row_count is None:
+            if rows is not None:
+                row_count = len(rows)
+            elif dataframe is not None:
+                row_count = len(dataframe)
+            else:
+                row_count = 0
+        memory = 0
+        if dataframe is not None:
+            deep = self.deep_memory or (0 < self.deep_rows <= row_count)
+            memory = int(dataframe.memory_usage(deep=deep).sum())
+        record = QueryRecord(started=time.time() - sum(timing), caller=find_caller(), query=query_str,
+                             connect_s=timing.connect, execute_s=timing.execute, fetch_s=timing.fetch,
+                             rows=row_count, bytes=approx_bytes(rows) if rows else 0, memory=memory,
+                             cached=cached)
+        logger.debug('{0}: {1} rows in {2:.3f} s (connect {3:.3f}, execute {4:.3f}, fetch {5:.3f}){6}'.format(
+            record.caller, record.rows, record.total_s, record.connect_s, record.execute_s, record.fetch_s,
+            ' from cache' if cached else ''))
+        with self._lock:
+            self._records.append(record)
+
+    def records(self, caller: str = None) -> list:
+        """
+        Args:
+            caller: only the queries of this caller (the end of the name is enough, e.g. 'query_c1')
+
+        Returns:
+            list: QueryRecords, oldest first
+        """
+        with self._lock:
+            records = list(self._records)
+        if caller is not None:
+            records = [record for record in records if record.caller.endswith(caller)]
+        return records
+
+    def to_dataframe(self) -> pandas.DataFrame:
+        """
+        Returns:
+            DataFrame: one row per recorded query
+        """
+        import pandas
+        dataframe = pandas.DataFrame(self.records(), columns=QueryRecord._fields)
+        dataframe['total_s'] = dataframe['connect_s'] + dataframe['execute_s'] + dataframe['fetch_s']
+        return dataframe
+
+    def summary(self) -> pandas.DataFrame:
+        """
+        Returns:
+            DataFrame: number of queries, mean and max time, rows and memory per caller, slowest first
+        """
+        dataframe = self.to_dataframe()
+        dataframe = dataframe[~dataframe['cached']]
+        summary = dataframe.groupby('caller').agg(count=('query', 'size'),
+                                                 mean_s=('total_s', 'mean'),
+                                                 max_s=('total_s', 'max'),
+                                                 rows=('rows', 'max'),
+                                                 bytes=('bytes', 'max'),
+                                                 memory=('memory', 'max'))
+        return summary.sort_values('mean_s', ascending=False)
+
+    def export_json(self, path: str):
+        """
+        write all records to a JSON file (a list of objects)
+
+        Args:
+            path: file name
+        """
+        records = [record._asdict() for record in self.records()]
+        for record in records:
+            record['started'] = datetime.datetime.fromtimestamp(record['started']).isoformat()
+        with open(path, 'w') as f:
+            json.dump(records, f, indent=2)
+        logger.info('query stats written to ' + path)
+
+    def export_csv(self, path: str):
+        """
+        write all records to a CSV file
+
+        Args:
+            path: file name
+        """
+        import pandas
+        dataframe = self.to_dataframe()
+        dataframe['started'] = pandas.to_datetime(dataframe['started'], unit='s')
+        dataframe.to_csv(path, index=False)
+        logger.info('query stats written to ' + path)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
@@ -0,0 +1,147 @@
+"""
+run database queries in the background
+
+the queries run in a QThreadPool so that the GUI keeps repainting while
+the database is busy. The results are sent back to the GUI thread with signals.
+"""
+
+from config.logging_conf import logger
+import threading
+import PyQt5.QtCore as QtCore
+from database.pysamsdb import mydb  # this is the already instantiated MyDatabase object to the AMS DB
+
+# set logger name to the name of the module
+logger.name = __name__
+
+
+class QueryWorkerSignals(QtCore.QObject):
+    """
+    signals of the QueryWorker (a QRunnable can't have signals itself)
+
+    finished: emitted with the result of the function
+    error: emitted with the error message if the function raised an exception
+    cancelled: emitted instead of finished or error if the worker was cancelled
+    chunk: emitted with every chunk of a streamed result (see ChunkWorker)
+    """
+    finished = QtCore.pyqtSignal(object)
+    error = QtCore.pyqtSignal(str)
+    cancelled = QtCore.pyqtSignal()
+    chunk = QtCore.pyqtSignal(object)
+
+
+class QueryWorker(QtCore.QRunnable):
+    """
+    runs a function that queries the database (e.g. mydb.querydb or a query function of a plot)
+    in a thread of the QThreadPool
+
+    connect to the signals before calling start():
+        worker = QueryWorker(mydb.querydb, query_str)
+        worker.signals.finished.connect(on_result)
+        worker.start()
+
+    Args:
+        fn: function to run
+        *args, **kwargs: arguments passed to fn
+
+    Returns:
+        None
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = QueryWorkerSignals()
+        # ident of the thread the worker runs in, needed to find the connection of the running query
+        self.thread_ident = None
+        self.is_cancelled = False
+        # the python object is kept by the caller, don't let Qt delete it after run()
+        self.setAutoDelete(False)
+
+    def start(self):
+        """
+        queue the worker in the global thread pool
+        """
+        QtCore.QThreadPool.globalInstance().start(self)
+
+    def run(self):
+        self.thread_ident = threading.get_ident()
+        if self.is_cancelled:
+            self.signals.cancelled.emit()
+            return
+        logger.debug('QueryWorker -- running ' + getattr(self.fn, '__name__', str(self.fn)))
+        try:
+            try:
+                result = self.execute()
+            finally:
+                # the thread goes back to the pool, cancel() must not kill queries of the next worker
+                self.thread_ident = None
+        except Exception as err:
+            if self.is_cancelled:
+                # the query was killed on the server
+                logger.info('QueryWorker -- cancelled')
+                self.signals.cancelled.emit()
+            else:
+                logger.error('QueryWorker -- ' + str(err))
+                self.signals.error.emit(str(err))
+        else:
+            if self.is_cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+
+    def execute(self):
+        # runs in the thread of the pool
+        return self.fn(*self.args, **self.kwargs)
+
+    def cancel(self):
+        """
+        cancel the worker
+
+        if a query is running right now it is aborted on the server with KILL QUERY,
+        the result of a function that finishes anyway is dropped
+        """
+        logger.debug('QueryWorker -- cancel')
+        self.is_cancelled = True
+        if self.thread_ident is not None:
+            connection_id = mydb.pool.connection_id(self.thread_ident)
+            if connection_id is not None:
+                mydb.kill_query(connection_id)
+
+
+class ChunkWorker(QueryWorker):
+    """
+    runs a function that streams a query result in chunks (e.g. mydb.querydb_chunks) in a thread of
+    the QThreadPool, every chunk is emitted with signals.chunk as soon as it was read,
+    finished is emitted with the number of rows when all chunks were read
+
+        worker = ChunkWorker(mydb.querydb_chunks, query_str)
+        worker.signals.chunk.connect(on_chunk)
+        worker.start()
+
+    after cancel() no more chunks are read and the connection goes back to the pool
+
+    Args:
+        fn: function that returns an iterator of DataFrames
+        *args, **kwargs: arguments passed to fn
+
+    Returns:
+        None
+    """
+
+    def execute(self) -> int:
+        rows = 0
+        chunks = self.fn(*self.args, **self.kwargs)
+        try:
+            for chunk in chunks:
+                if self.is_cancelled:
+                    break
+                rows += len(chunk)
+                self.signals.chunk.emit(chunk)
+        finally:
+            # stops the generator, which closes the cursor and checks in the connection
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+        return rows
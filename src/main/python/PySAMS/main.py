@@ -4,6 +4,7 @@ Main App of the PySAMS
 
 import sys
 import time
+import multiprocessing
 
 from fbs_runtime.application_context.PyQt5 import ApplicationContext
 from PyQt5.QtWidgets import QMainWindow
@@ -229,8 +230,11 @@ class PySAMS(QMainWindow):
         textzoom = 20  # increase text size by this for textedits
 
         # query DB here for values to be displayed for the first time
+        # all counters are fetched at once with a single query
+        snapshot = mydb.get_dashboard_snapshot()
+
         label_count_oxas = QtWidgets.QLabel('number of oxas')
-        textedit_count_oxas = QtWidgets.QTextEdit(mydb.get_number_available_oxas())
+        textedit_count_oxas = QtWidgets.QTextEdit(str(snapshot.available_oxas))
         textedit_count_oxas.setReadOnly(True)
         textedit_count_oxas.setAlignment(QtCore.Qt.AlignCenter)
         textedit_count_oxas.zoomIn(textzoom)
@@ -238,35 +242,35 @@ class PySAMS(QMainWindow):
         # textedit_count_oxas.setFrameShadow(QtWidgets.QFrame.Plain)
 
         label_count_blanks = QtWidgets.QLabel('number of blanks')
-        textedit_count_blanks = QtWidgets.QTextEdit(mydb.get_number_available_blanks())
+        textedit_count_blanks = QtWidgets.QTextEdit(str(snapshot.available_blanks))
         textedit_count_blanks.setReadOnly(True)
         textedit_count_blanks.setAlignment(QtCore.Qt.AlignCenter)
         textedit_count_blanks.zoomIn(textzoom)
         textedit_count_blanks.setFrameShape(QtWidgets.QFrame.NoFrame)
 
         label_unprepped_samples = QtWidgets.QLabel('ready for prep')
-        textedit_unprepped_samples = QtWidgets.QTextEdit(mydb.get_number_of_unprepped_samples())
+        textedit_unprepped_samples = QtWidgets.QTextEdit(str(snapshot.unprepped_samples))
         textedit_unprepped_samples.setReadOnly(True)
         textedit_unprepped_samples.setAlignment(QtCore.Qt.AlignCenter)
         textedit_unprepped_samples.zoomIn(textzoom)
         textedit_unprepped_samples.setFrameShape(QtWidgets.QFrame.NoFrame)
 
         label_count_samples_for_graph = QtWidgets.QLabel('ready for graph')
-        textedit_count_samples_for_graph = QtWidgets.QTextEdit(mydb.get_number_of_samples_ready_for_graph())
+        textedit_count_samples_for_graph = QtWidgets.QTextEdit(str(snapshot.samples_ready_for_graph))
         textedit_count_samples_for_graph.setReadOnly(True)
         textedit_count_samples_for_graph.setAlignment(QtCore.Qt.AlignCenter)
         textedit_count_samples_for_graph.zoomIn(textzoom)
         textedit_count_samples_for_graph.setFrameShape(QtWidgets.QFrame.NoFrame)
 
         label_count_samples_for_analysis = QtWidgets.QLabel('ready for AMS')
-        textedit_count_samples_for_analysis = QtWidgets.QTextEdit(mydb.get_number_of_samples_ready_for_analysis())
+        textedit_count_samples_for_analysis = QtWidgets.QTextEdit(str(snapshot.samples_ready_for_analysis))
         textedit_count_samples_for_analysis.setReadOnly(True)
         textedit_count_samples_for_analysis.setAlignment(QtCore.Qt.AlignCenter)
         textedit_count_samples_for_analysis.zoomIn(textzoom)
         textedit_count_samples_for_analysis.setFrameShape(QtWidgets.QFrame.NoFrame)
 
         label_count_samples_express = QtWidgets.QLabel('number of express')
-        textedit_count_samples_express = QtWidgets.QTextEdit(mydb.get_number_of_samples_express())
+        textedit_count_samples_express = QtWidgets.QTextEdit(str(snapshot.samples_express))
         textedit_count_samples_express.setReadOnly(True)
         textedit_count_samples_express.setAlignment(QtCore.Qt.AlignCenter)
         textedit_count_samples_express.zoomIn(textzoom)
@@ -384,7 +388,10 @@ class PySAMS(QMainWindow):
 # MAIN Routine
 # =======================================================================
 if __name__ == "__main__":
-    
+    # the batch renderer starts its render processes with spawn, in the frozen app (fbs/PyInstaller)
+    # they run this executable again, freeze_support lets them do their work instead of starting the GUI
+    multiprocessing.freeze_support()
+
     packaging = True  # when using fbs for packing 
 
     if packaging == False:
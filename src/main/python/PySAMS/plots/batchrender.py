@@ -0,0 +1,292 @@
+"""
+headless batch rendering of the predefined plots
+
+"-- do all plots --" used to query and draw one plot after the other in the GUI thread and showed every
+figure. Now "-- save all plots to pics/ (no windows) --" uses the batch renderer and the figures are not shown.
+The batch renderer runs the queries in a thread pool (every thread checks out its own pooled
+connection, see database.connectionpool) and draws the plots in a process pool with the Agg
+backend, so several figures are rendered and saved to pics/ at the same time without any window.
+
+    renderer = BatchRenderer()
+    results = renderer.run(registry.PLOTS, progress=lambda done, total, result: print(done, total))
+
+cancel() can be called from any thread, queries that are running are aborted on the server,
+plots that are being rendered right now are finished, all others are skipped.
+
+with a state file the renderer remembers a hash of the data of every plot it rendered,
+plots whose data didn't change since the last run are not rendered again (used by batch.py).
+"""
+
+from config.logging_conf import logger
+import os
+import json
+import hashlib
+import pickle
+import threading
+import warnings
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, NamedTuple
+from config.config import myconfig  # myconfig calss will be loaded here
+import plots.registry as registry
+
+# set logger name to the name of the module
+logger.name = __name__
+
+# the plot functions save their figures and data here
+OUTPUT_DIR = 'pics'
+
+
+class BatchResult(NamedTuple):
+    """
+    outcome of one plot of a batch
+
+    name: short name of the plot
+    ok: True if the plot was rendered and saved (or didn't need to be)
+    message: what went wrong if ok is False
+    skipped: True if the data didn't change since the last run and the plot was not rendered again
+    """
+    name: str
+    ok: bool
+    message: str = ''
+    skipped: bool = False
+
+
+def data_hash(data) -> str:
+    """
+    hash of the result of a query function, equal data give equal hashes
+
+    Args:
+        data: DataFrame, tuple or list of DataFrames (e.g. query_throughput) or any picklable value
+
+    Returns:
+        str: hex digest
+    """
+    import pandas
+    digest = hashlib.sha1()
+
+    def update(value):
+        if isinstance(value, pandas.DataFrame):
+            digest.update(repr(list(value.columns)).encode())
+            digest.update(repr([str(dtype) for dtype in value.dtypes]).encode())
+            digest.update(pandas.util.hash_pandas_object(value, index=True).values.tobytes())
+        elif isinstance(value, (tuple, list)):
+            digest.update(str(len(value)).encode())
+            for item in value:
+                update(item)
+        else:
+            digest.update(pickle.dumps(value))
+
+    update(data)
+    return digest.hexdigest()
+
+
+def _init_process():
+    # runs once in every render process before the plot modules are imported,
+    # the plot modules switch to the backend given in MPLBACKEND
+    os.environ['MPLBACKEND'] = 'Agg'
+    # the plot functions call plt.show(), which has nothing to show with Agg
+    warnings.filterwarnings('ignore', message='.*non-GUI backend.*')
+    warnings.filterwarnings('ignore', message='.*non-interactive.*')
+
+
+def render_pool(processes: int) -> ProcessPoolExecutor:
+    """
+    process pool that draws with the Agg backend, run render_plot in it
+
+    Args:
+        processes: number of processes
+
+    Returns:
+        ProcessPoolExecutor: the pool
+    """
+    # spawn: the render processes must not inherit the Qt state of the GUI process
+    context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_process)
+
+
+def render_plot(entry: registry.PlotEntry, data, params: dict, output: str = None, dpi: int = 100) -> str:
+    """
+    draw one plot in a render process, the plot function saves the figure to pics/
+
+    Args:
+        entry: registry entry of the plot
+        data: result of the query function of the plot
+        params: keyword arguments of the plot function
+        output: save the figure returned by the plot function to this file too (e.g. for the web app)
+        dpi: resolution of output
+
+    Returns:
+        str: name of the plot
+    """
+    import matplotlib.pyplot as plt
+    try:
+        fig = entry.plot_function()(data, **params)
+        if output is not None and fig is not None:
+            # write to a temporary file first, readers of output never see half written files
+            fig.savefig(output + '.tmp', dpi=dpi, format=os.path.splitext(output)[1][1:])
+            os.replace(output + '.tmp', output)
+    finally:
+        # the figures are on disk, free them before the process draws the next plot
+        plt.close('all')
+    return entry.name
+
+
+class BatchRenderer:
+    """
+    render a list of predefined plots without windows
+
+    Args:
+        processes: number of render processes, default is the config value batch/processes (0 = one per cpu)
+        query_threads: number of queries running at the same time, default is the size of the connection pool
+        state_path: json file with the data hashes of the last run, None = render every plot
+        force: render also the plots whose data didn't change (the hashes are still updated)
+
+    Returns:
+        None
+    """
+
+    def __init__(self, processes: int = None, query_threads: int = None, state_path: str = None,
+                 force: bool = False):
+        if processes is None:
+            processes = myconfig.getint('batch', 'processes', fallback=0)
+        if processes <= 0:
+            processes = os.cpu_count() or 1
+        if query_threads is None:
+            query_threads = myconfig.getint('database', 'poolsize', fallback=5)
+        self.processes = processes
+        self.query_threads = max(1, query_threads)
+        self._cancelled = threading.Event()
+        # plot name -> ident of the thread that runs its query, needed to kill the query
+        self._running = {}
+        self._running_lock = threading.Lock()
+        self.state_path = state_path
+        self.force = force
+        # plot key -> data hash of the last rendered plot
+        self.hashes = {}
+        if state_path is not None and os.path.exists(state_path):
+            try:
+                with open(state_path) as f:
+                    self.hashes = json.load(f)
+            except (OSError, ValueError) as err:
+                logger.warning('batch: cant read state file ' + state_path + ': ' + str(err))
+
+    @staticmethod
+    def key(entry: registry.PlotEntry, params: dict) -> str:
+        # the same plot with other parameters (e.g. turnaround of another year) has its own hash
+        if not params:
+            return entry.name
+        return entry.name + json.dumps(params, sort_keys=True, default=str)
+
+    def save_state(self):
+        """
+        write the data hashes to the state file
+        """
+        if self.state_path is None:
+            return
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.state_path, 'w') as f:
+            json.dump(self.hashes, f, indent=1, sort_keys=True)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        stop the batch, queries that are running right now are aborted on the server
+        """
+        logger.info('batch: cancel')
+        self._cancelled.set()
+        from database.pysamsdb import mydb  # this is the already instantiated MyDatabase object to the AMS DB
+        with self._running_lock:
+            idents = list(self._running.values())
+        for ident in idents:
+            connection_id = mydb.pool.connection_id(ident)
+            if connection_id is not None:
+                mydb.kill_query(connection_id)
+
+    def _query(self, entry: registry.PlotEntry, params: dict):
+        # runs in a query thread
+        if self.cancelled:
+            return None
+        with self._running_lock:
+            self._running[entry.name] = threading.get_ident()
+        try:
+            logger.debug('batch: querying ' + entry.name)
+            return entry.export_function()(**params)
+        finally:
+            with self._running_lock:
+                del self._running[entry.name]
+
+    def run(self, entries: list, params: dict = None, progress: Callable = None) -> list:
+        """
+        query and render the plots, returns when all plots are done or the batch was cancelled
+
+        Args:
+            entries: list of registry.PlotEntry
+            params: plot name -> keyword arguments of the query and the plot function (see PlotEntry.ask)
+            progress: called as progress(done, total, result) after every plot, result is a BatchResult
+
+        Returns:
+            list: BatchResult of every plot in the order the plots were finished
+        """
+        params = params or {}
+        self._cancelled.clear()
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        logger.info('batch: rendering ' + str(len(entries)) + ' plots in ' + str(self.processes) + ' processes')
+
+        results = []
+        # plot name -> data hash of the plots that are being rendered, stored when the rendering succeeded
+        new_hashes = {}
+
+        def finish(result: BatchResult):
+            if not result.ok:
+                logger.warning('batch: ' + result.name + ': ' + result.message)
+            results.append(result)
+            if progress is not None:
+                progress(len(results), len(entries), result)
+
+        with ThreadPoolExecutor(max_workers=self.query_threads) as query_pool, \
+                render_pool(self.processes) as renderers:
+            # future -> (stage, entry), stage is 'query' or 'render'
+            pending = {query_pool.submit(self._query, entry, params.get(entry.name, {})): ('query', entry)
+                       for entry in entries}
+            while pending:
+                if self.cancelled:
+                    # futures that didn't start yet are dropped, running ones are waited for
+                    for future in pending:
+                        future.cancel()
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, entry = pending.pop(future)
+                    if future.cancelled():
+                        finish(BatchResult(entry.name, False, 'cancelled'))
+                        continue
+                    try:
+                        value = future.result()
+                    except Exception as err:
+                        finish(BatchResult(entry.name, False, stage + ' failed: ' + str(err)))
+                        continue
+                    entry_params = params.get(entry.name, {})
+                    if stage == 'render':
+                        if entry.name in new_hashes:
+                            self.hashes[self.key(entry, entry_params)] = new_hashes.pop(entry.name)
+                        finish(BatchResult(entry.name, True))
+                    elif self.cancelled:
+                        finish(BatchResult(entry.name, False, 'cancelled'))
+                    else:
+                        if self.state_path is not None:
+                            new_hashes[entry.name] = data_hash(value)
+                            if not self.force and self.hashes.get(self.key(entry, entry_params)) == new_hashes[entry.name]:
+                                logger.info('batch: ' + entry.name + ': data unchanged, not rendered')
+                                finish(BatchResult(entry.name, True, skipped=True))
+                                continue
+                        render = renderers.submit(render_plot, entry, value, entry_params)
+                        pending[render] = ('render', entry)
+        self.save_state()
+        logger.info('batch: ' + str(sum(result.ok for result in results)) + ' of ' + str(len(entries))
+                    + ' plots saved to ' + OUTPUT_DIR)
+        return results
@@ -0,0 +1,360 @@
+"""
+control charts of the QC standards, the Oxa2 and the blanks
+
+every series (e.g. fm of IAEA-C2) keeps a running state on disk (config value qc/charts):
+
+- Welford moments (count, mean, sum of squared deviations) of all values
+- center line and sigma, taken from the first qc/chart_baseline values and fixed afterwards
+- Shewhart: values more than 3 sigma away from the center
+- EWMA: z = lambda * x + (1 - lambda) * z with the time varying limits center +- L * sigma * sqrt(...)
+- CUSUM: upper and lower sums of the standardized deviations minus k, signal above h
+
+the measurements are added magazine by magazine in the order of the magazine names (MAyymmdd sorts by
+date). A new magazine only runs the accumulators over its own rows and appends them to the chart table.
+If a magazine that was already added changed (new rows, corrected values, a magazine sorted in
+before the last one), the series is calculated again from the start.
+
+the charts are only written by update and update_all (run by batch.py), the plots and the web app
+read the saved state with read. Every update holds a lock file next to the state files, so two
+processes don't update the same series at once, and both files are replaced atomically.
+
+    update_all()  # batch.py
+    chart = read('c2')
+    chart.rows()  # one row per measurement
+"""
+
+from config.logging_conf import logger
+import os
+import json
+import math
+import time
+import shutil
+import hashlib
+import threading
+import contextlib
+import numpy as np
+import pandas
+import plots.qc.standards as standards
+import plots.qc.qcstats as qcstats
+from config.config import myconfig  # myconfig calss will be loaded here
+
+# set logger name to the name of the module
+logger.name = __name__
+
+# series in addition to the standards of plots.qc.standards
+OXA2 = 'oxa2'
+BLANKS = 'blanks'
+# columns of the chart table, one row per measurement
+COLUMNS = ['magazine', 'x', 'center', 'lcl', 'ucl', 'ewma', 'ewma_lower', 'ewma_upper', 'cusum_pos', 'cusum_neg',
+           'shewhart_signal', 'ewma_signal', 'cusum_signal']
+
+# updates from several threads are done one after the other, other processes are kept out by file_lock
+_lock = threading.Lock()
+# seconds to wait for the lock file of another process, and the age of a lock file that a crashed process left
+LOCK_TIMEOUT = 60
+LOCK_STALE = 600
+
+
+@contextlib.contextmanager
+def file_lock(path: str, timeout: float = LOCK_TIMEOUT, stale: float = LOCK_STALE):
+    """
+    lock shared by all processes: the lock file path is created exclusively and removed again
+
+    use as: with file_lock(path): ...
+
+    Args:
+        path: the lock file
+        timeout: seconds to wait for another process, TimeoutError after that
+        stale: lock files older than this are left from a crashed process and are removed
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > stale:
+                    logger.warning('removing stale lock ' + path)
+                    os.remove(path)
+                    continue
+            except OSError:
+                # the other process just removed it
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(path + ' is locked by another process')
+            time.sleep(0.05)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def chart_names() -> list:
+    """
+    Returns:
+        list: names of all series with control charts
+    """
+    return [standard.name for standard in standards.STANDARDS] + [OXA2, BLANKS]
+
+
+def query_series(name: str) -> pandas.DataFrame:
+    """
+    the measurements of a series
+
+    Args:
+        name: name of a standard, 'oxa2' or 'blanks'
+
+    Returns:
+        DataFrame: at least magazine, fm and dc13
+    """
+    if name == OXA2:
+        return standards.query_oxa2()
+    if name == BLANKS:
+        # imported here, qcplots imports this module
+        import plots.qc.qcplots as qcplots
+        return qcplots.query_blanks()
+    return standards.query_standard(name)
+
+
+class ControlChart:
+    """
+    running state of the control charts of one series and value
+
+    Args:
+        name: name of the series
+        value: column of the values (fm or dc13)
+        path: directory of the state files, default is qc/charts
+
+    Returns:
+        None
+    """
+
+    def __init__(self, name: str, value: str = 'fm', path: str = None):
+        self.name = name
+        self.value = value
+        self.path = myconfig.get('qc', 'charts', fallback='cache/control_charts') if path is None else path
+        self.lam = myconfig.getfloat('qc', 'ewma_lambda', fallback=0.2)
+        self.width = myconfig.getfloat('qc', 'ewma_l', fallback=3)
+        self.k = myconfig.getfloat('qc', 'cusum_k', fallback=0.5)
+        self.h = myconfig.getfloat('qc', 'cusum_h', fallback=5)
+        self.baseline = myconfig.getint('qc', 'chart_baseline', fallback=30)
+        self.reset()
+
+    def reset(self):
+        # Welford moments of all values
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        # fixed after the baseline
+        self.center = None
+        self.sigma = None
+        # EWMA and CUSUM accumulators, t is the number of values since the baseline
+        self.t = 0
+        self.ewma = None
+        self.cusum_pos = 0.0
+        self.cusum_neg = 0.0
+        self.signals = {'shewhart': 0, 'ewma': 0, 'cusum': 0}
+        # last added magazine and hash of all added rows
+        self.last = None
+        self.digest = ''
+
+    def file(self, suffix: str) -> str:
+        return os.path.join(self.path, self.name + '_' + self.value + suffix)
+
+    def settings(self) -> list:
+        # a state calculated with other settings is not continued
+        return [self.lam, self.width, self.k, self.h, self.baseline]
+
+    def load(self) -> 'ControlChart':
+        """
+        read the state of the series, a new state is started if there is none
+
+        Returns:
+            ControlChart: self
+        """
+        try:
+            with open(self.file('.json')) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if state.get('settings') != self.settings() or not os.path.exists(self.file('.csv')):
+            logger.info('control chart ' + self.name + ' ' + self.value + ': settings changed, starting again')
+            return self
+        if state.get('csv_size') != os.path.getsize(self.file('.csv')):
+            # the chart table was written, but not the state (e.g. the process was killed in between)
+            logger.info('control chart ' + self.name + ' ' + self.value + ': table and state differ, starting again')
+            return self
+        for key in ('n', 'mean', 'm2', 'center', 'sigma', 't', 'ewma', 'cusum_pos', 'cusum_neg', 'signals',
+                    'last', 'digest'):
+            setattr(self, key, state[key])
+        return self
+
+    def save(self):
+        state = {key: getattr(self, key) for key in ('n', 'mean', 'm2', 'center', 'sigma', 't', 'ewma', 'cusum_pos',
+                                                     'cusum_neg', 'signals', 'last', 'digest')}
+        state['settings'] = self.settings()
+        state['csv_size'] = os.path.getsize(self.file('.csv')) if os.path.exists(self.file('.csv')) else None
+        os.makedirs(self.path, exist_ok=True)
+        # write to a temporary file first, a crash must not leave half a state behind
+        temp = self.file('.json.tmp')
+        with open(temp, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp, self.file('.json'))
+
+    def rows(self) -> pandas.DataFrame:
+        """
+        Returns:
+            DataFrame: the chart table (see COLUMNS), one row per added measurement
+        """
+        if self.n == 0 or not os.path.exists(self.file('.csv')):
+            return pandas.DataFrame(columns=COLUMNS)
+        return pandas.read_csv(self.file('.csv'), dtype={'magazine': str})
+
+    @staticmethod
+    def hash_rows(magazines: np.ndarray, values: np.ndarray) -> str:
+        # only checks the rows that were added before, the accumulators don't run over them again
+        sha = hashlib.sha1()
+        sha.update(pandas.util.hash_array(magazines.astype(object)).tobytes())
+        sha.update(values.tobytes())
+        return sha.hexdigest()
+
+    def add_value(self, x: float) -> list:
+        """
+        run the accumulators over one value
+
+        Returns:
+            list: the row of the chart table without the magazine
+        """
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        if self.center is None:
+            if self.n >= max(self.baseline, 2):
+                # the baseline is complete, the limits are fixed from now on
+                self.center = self.mean
+                self.sigma = math.sqrt(self.m2 / (self.n - 1))
+                self.ewma = self.center
+            return [x] + [np.nan] * 8 + [False, False, False]
+
+        self.t += 1
+        self.ewma = self.lam * x + (1 - self.lam) * self.ewma
+        if self.sigma > 0:
+            z = (x - self.center) / self.sigma
+            half = self.width * self.sigma * math.sqrt(self.lam / (2 - self.lam) * (1 - (1 - self.lam) ** (2 * self.t)))
+        else:
+            z, half = 0.0, 0.0
+        self.cusum_pos = max(0.0, self.cusum_pos + z - self.k)
+        self.cusum_neg = max(0.0, self.cusum_neg - z - self.k)
+        shewhart = abs(z) > 3
+        ewma = half > 0 and abs(self.ewma - self.center) > half
+        cusum = self.cusum_pos > self.h or self.cusum_neg > self.h
+        self.signals['shewhart'] += int(shewhart)
+        self.signals['ewma'] += int(ewma)
+        self.signals['cusum'] += int(cusum)
+        return [x, self.center, self.center - 3 * self.sigma, self.center + 3 * self.sigma, self.ewma,
+                self.center - half, self.center + half, self.cusum_pos, self.cusum_neg, shewhart, ewma, cusum]
+
+    def extend(self, dataframe: pandas.DataFrame) -> pandas.DataFrame:
+        """
+        add the magazines that are new since the last update
+
+        Args:
+            dataframe: all measurements of the series (magazine and the value column), e.g. query_series()
+
+        Returns:
+            DataFrame: the new rows of the chart table
+        """
+        frame = dataframe.loc[dataframe['magazine'].notna() & dataframe[self.value].notna(), ['magazine', self.value]]
+        frame = frame.sort_values('magazine', kind='stable')
+        magazines = frame['magazine'].to_numpy(dtype=str)
+        values = frame[self.value].to_numpy(dtype=float)
+
+        if self.last is not None:
+            old = magazines <= self.last
+            if old.sum() != self.n or self.hash_rows(magazines[old], values[old]) != self.digest:
+                logger.info('control chart ' + self.name + ' ' + self.value + ': history changed, starting again')
+                self.reset()
+        start = 0 if self.last is None else int(np.searchsorted(magazines, self.last, side='right'))
+        if start == len(magazines):
+            return pandas.DataFrame(columns=COLUMNS)
+
+        rows = [[magazine] + self.add_value(x) for magazine, x in zip(magazines[start:], values[start:])]
+        new = pandas.DataFrame(rows, columns=COLUMNS)
+        os.makedirs(self.path, exist_ok=True)
+        # the rows are added to a copy that replaces the table, readers never see half a table
+        temp = self.file('.csv.tmp')
+        if start == 0:
+            new.to_csv(temp, index=False)
+        else:
+            shutil.copyfile(self.file('.csv'), temp)
+            new.to_csv(temp, mode='a', header=False, index=False)
+        os.replace(temp, self.file('.csv'))
+        self.digest = self.hash_rows(magazines, values)
+        self.last = str(magazines[-1])
+        logger.info('control chart ' + self.name + ' ' + self.value + ': ' + str(len(new)) + ' rows added, ' +
+                    str(self.n) + ' in total')
+        return new
+
+
+def update(name: str, dataframe: pandas.DataFrame = None, value: str = 'fm') -> ControlChart:
+    """
+    bring the control chart of a series up to date and save its state
+
+    Args:
+        name: name of the series (see chart_names)
+        dataframe: all measurements of the series, queried if not given
+        value: fm or dc13
+
+    Returns:
+        ControlChart: the updated chart
+    """
+    if value not in qcstats.VALUES:
+        raise KeyError('no control charts for ' + value)
+    if dataframe is None:
+        dataframe = query_series(name)
+    chart = ControlChart(name, value)
+    os.makedirs(chart.path, exist_ok=True)
+    with _lock, file_lock(chart.file('.lock')):
+        chart.load()
+        chart.extend(dataframe)
+        chart.save()
+    return chart
+
+
+def read(name: str, value: str = 'fm') -> ControlChart:
+    """
+    the control chart of a series as the last update left it, nothing is written
+
+    Args:
+        name: name of the series (see chart_names)
+        value: fm or dc13
+
+    Returns:
+        ControlChart: the chart, without rows (n == 0) if it was never updated
+    """
+    if value not in qcstats.VALUES:
+        raise KeyError('no control charts for ' + value)
+    return ControlChart(name, value).load()
+
+
+def update_all() -> dict:
+    """
+    update the control charts of fm and dc13 of all series
+
+    Returns:
+        dict: (name, value) -> ControlChart
+    """
+    partitions = standards.partition_standards()
+    charts = {}
+    for name in chart_names():
+        dataframe = partitions[name] if name in partitions else query_series(name)
+        for value in qcstats.VALUES:
+            charts[(name, value)] = update(name, dataframe, value)
+    return charts
@@ -1,14 +1,22 @@
 from config.logging_conf import logger
+import os
 import matplotlib
 # matplotlib.use('TkAgg')  # switch to a different backend in order to make the cursor mpldatawork
-matplotlib.use('Qt5Agg')
+# the batch renderer (plots.batchrender) sets MPLBACKEND=Agg in its processes to draw without windows
+matplotlib.use(os.environ.get('MPLBACKEND', 'Qt5Agg'))
+from PyQt5.QtWidgets import QInputDialog
 from database.pysamsdb import mydb
+from database.mirror import mymirror, use_mirror, like
+import plots.qc.standards as standards
+import plots.qc.qcstats as qcstats
+import plots.qc.controlcharts as controlcharts
 import matplotlib.pyplot as plt
 import mpldatacursor  # a datacursor for matplotlib
 import seaborn as sns  # by importing this all the matlibplots will look different
 import pandas
 import numpy as np
 import plots.utils.plotutils as plotutils
+import plots.utils.downsample as downsample
 
 # set logger name to the name of the module
 logger.name = __name__
@@ -17,7 +25,8 @@ logger.name = __name__
 plt.ion()
 
 ####################################################################################
-def plot_standards(dataframe: pandas.DataFrame, consensus: float, titel: str) -> object:
+def plot_standards(dataframe: pandas.DataFrame, consensus: float, titel: str, stats: pandas.DataFrame = None,
+                   chart: controlcharts.ControlChart = None) -> object:
     """
     create two scatter plots as subplots
     plot 1 shows: fm
@@ -31,6 +40,9 @@ def plot_standards(dataframe: pandas.DataFrame, consensus: float, titel: str) ->
         but will not be displayed.
         consensus: consensus value of those standards, will plot a horizontal line
         titel: the titel of the plot
+        stats: statistics of the plotted measurements (see qcstats.standard_stats, rows with missing values are
+               not plotted), calculated if not given
+        chart: control chart of fm (see controlcharts.read), its limits are drawn if given
 
     Returns:
         None
@@ -40,6 +52,9 @@ def plot_standards(dataframe: pandas.DataFrame, consensus: float, titel: str) ->
     if (dataframe is not None) > 0:
 
         dataframe.dropna(inplace=True)
+        # the statistics are taken from the plotted measurements, so the lines match the points
+        if stats is None:
+            stats = qcstats.standard_stats(dataframe, titel)
 
         # extract data from the dataframe
         logger.info('plot: ' + titel + ': preparing data...')
@@ -47,31 +62,28 @@ def plot_standards(dataframe: pandas.DataFrame, consensus: float, titel: str) ->
         xdata = list(range(len(dataframe.index)))
         # xdata = [x+1 for x in xdata]  # add 1 to the index so that it starts with 1 and not 0
         # xdata = dataframe['xdata']
-        # generate column for the y2err for dc13 data (dc13 has no errors in the database)
-        y2err = [0.003]*len(dataframe.index)
+        # dc13 has no errors in the database, the same error is assumed for all values
+        y2err = qcstats.dc13_sig()
 
-        # calculate means, stdev and chi^2 of fm and dc13
+        # means, stdev and chi^2 of fm and dc13
         logger.info('plot: ' + titel + ': calculating statistics...')
-        #
-        y1_mean = dataframe['fm'].mean()
+        y1_mean, y1_std, chi2_fm_reduced = stats.loc['fm', ['mean', 'stdev', 'chi2_reduced']]
         logger.info('plot: ' + titel + ': mean fm = ' + str(y1_mean))
-        y1_std = dataframe['fm'].std()
         logger.info('plot: ' + titel + ': stdev fm = ' + str(y1_std))
-        chi2_fm = np.sum(((dataframe['fm'].values - y1_mean)/dataframe['fm_sig'].values) ** 2)
-        chi2_fm_reduced = chi2_fm/(dataframe['fm'].size - 1)
         logger.info('plot: ' + titel + ': chi^2-reduced fm = ' + str(chi2_fm_reduced))
-        #
-        y2_mean = dataframe['dc13'].mean()
+        y2_mean, y2_std, chi2_dc13_reduced = stats.loc['dc13', ['mean', 'stdev', 'chi2_reduced']]
         logger.info('plot: ' + titel + ': mean dc13 = ' + str(y2_mean))
-        y2_std = dataframe['dc13'].std()
         logger.info('plot: ' + titel + ': stdev dc13 = ' + str(y2_std))
-        chi2_dc13 = np.sum(((dataframe['dc13'].values - y2_mean)/y2err) ** 2)
-        chi2_dc13_reduced = chi2_dc13/(dataframe['dc13'].size - 1)
         logger.info('plot: ' + titel + ': chi^2-reduced dc13 = ' + str(chi2_dc13_reduced))
-        #
 
         # find positions of years
         year_positions = plotutils.find_year_positions(dataframe)
+        # statistics of fm between the source revisions, first and last are positions like xdata
+        segments = plotutils.segment_stats(dataframe.reset_index(drop=True))
+        for seg in segments.itertuples():
+            logger.info('plot: ' + titel + ': revision ' + seg.revision + ': n = ' + str(seg.count) +
+                        ', mean fm = ' + str(round(seg.mean, 4)) + ' +- ' + str(round(seg.stdev, 4)) +
+                        ', chi^2-reduced = ' + str(round(seg.chi2_reduced, 2)))
 
         # === create plots with error bars using matplotlib
         # set plot styles using seaborn
@@ -83,7 +95,14 @@ def plot_standards(dataframe: pandas.DataFrame, consensus: float, titel: str) ->
         # fm
         logger.info('plot: ' + titel + ': creating plot...')
         fig, (ax, ax2) = plt.subplots(nrows=2, sharex=True)
-        ax.errorbar(x=xdata, y=dataframe['fm'], yerr=dataframe['fm_sig'], fmt='-o', picker=5)
+        # draw at most plot/max_points_per_axis records, the index of the rows is their record number.
+        # if records are left out, a band shows the range of the error bars of all of them
+        records = dataframe.reset_index(drop=True)
+        drawn = downsample.downsample_frame(records, None, 'fm', errors=True)
+        ax.errorbar(x=drawn.index, y=drawn['fm'], yerr=drawn['fm_sig'], fmt='-o', picker=5)
+        if len(drawn) < len(records):
+            ax.fill_between(*downsample.errorbar_envelope(xdata, records['fm'], records['fm_sig'],
+                                                          downsample.max_points() // 4), alpha=0.2)
         ax.set_title(titel)
         ax.set_ylabel('fm')
         ax.grid(True)
@@ -93,6 +112,14 @@ def plot_standards(dataframe: pandas.DataFrame, consensus: float, titel: str) ->
         ax.axhline(y1_mean + y1_std, linestyle='dashed')
         # consensus value
         ax.axhline(consensus, color='brown', alpha=0.7, label=('consensus = ' + str(consensus)))
+        draw_control_limits(ax, chart)
+        # mean of every revision segment
+        if len(segments) > 0:
+            ax.hlines(segments['mean'], segments['first'], segments['last'], colors='r', alpha=0.7,
+                      label='mean per source revision')
+            for seg in segments.itertuples():
+                ax.annotate(str(round(seg.mean, 4)) + ' +- ' + str(round(seg.stdev, 4)),
+                            xy=(seg.first, seg.mean), xytext=(0, 3), textcoords='offset points', fontsize=6)
 
         # insert vertical lines for the transitions of the years
         for pos in year_positions:
@@ -102,7 +129,11 @@ def plot_standards(dataframe: pandas.DataFrame, consensus: float, titel: str) ->
         ax.legend()
 
         # dc13
-        ax2.errorbar(x=xdata, y=dataframe['dc13'], yerr=y2err, fmt='o', picker=5)
+        drawn = downsample.downsample_frame(records, None, 'dc13', errors=True)
+        ax2.errorbar(x=drawn.index, y=drawn['dc13'], yerr=y2err, fmt='o', picker=5)
+        if len(drawn) < len(records):
+            ax2.fill_between(*downsample.errorbar_envelope(xdata, records['dc13'], y2err,
+                                                           downsample.max_points() // 4), alpha=0.2)
         ax2.set_xlabel('record')
         ax2.set_ylabel('dc13')
         ax2.grid(True)
@@ -143,13 +174,44 @@ def plot_standards(dataframe: pandas.DataFrame, consensus: float, titel: str) ->
 ####################################################################################
 # plot blanks values fm of pthalic acids
 #####################################################################################
-def plot_blank_data(dataframe: pandas.DataFrame, titel: str) -> object:
+def draw_control_limits(ax, chart: controlcharts.ControlChart):
+    """
+    draw the 3 sigma limits of a control chart as horizontal lines
+
+    Args:
+        ax: the axes
+        chart: the control chart, nothing is drawn if it is None or its baseline isn't complete
+    """
+    if chart is None or chart.center is None:
+        return
+    label = 'control limits (3 sigma), ' + str(chart.signals['shewhart']) + ' outside'
+    ax.axhline(chart.center - 3 * chart.sigma, color='purple', linestyle='dotted', alpha=0.7, label=label)
+    ax.axhline(chart.center + 3 * chart.sigma, color='purple', linestyle='dotted', alpha=0.7)
+
+
+def saved_chart(name: str):
+    """
+    the control chart of fm of a series as batch.py saved it, drawing a plot doesn't update it
+
+    Returns:
+        ControlChart: the control chart, None if there is none or it can't be read (the plot is drawn without)
+    """
+    try:
+        chart = controlcharts.read(name)
+    except Exception as err:
+        logger.warning('plot: control chart of ' + name + ' can not be read: ' + str(err))
+        return None
+    return chart if chart.n > 0 else None
+
+
+def plot_blank_data(dataframe: pandas.DataFrame, titel: str, chart: controlcharts.ControlChart = None) -> object:
     """
     creates scatter plot of blank values (pthalic acid samples) of fm, dc13 and C14 age
 
     Args:
         dataframe: a pandas Dataframe holding the data returned from a MySql Query
         titel: the titel of the plot
+        chart: control chart of fm (see controlcharts.read), its limits are drawn if given
 
     Returns:
         None
@@ -204,6 +266,7 @@ def plot_blank_data(dataframe: pandas.DataFrame, titel: str) -> object:
                                          ', chi^2= ' + str(round(chi2_fm_reduced,2))), color='green', alpha=0.9)
         ax1.axhline(fm_mean - fm_std, linestyle='dashed', color='green', alpha=0.9)
         ax1.axhline(fm_mean + fm_std, linestyle='dashed', color='green', alpha=0.9)
+        draw_control_limits(ax1, chart)
 
         # insert vertical lines for the transitions of the years
         for pos in year_positions:
@@ -242,7 +305,8 @@ def plot_blank_data(dataframe: pandas.DataFrame, titel: str) -> object:
         ax3.set_ylabel('C14 Age')
         ax3.invert_yaxis()
         #
-        ax1.legend(handles=[h1], loc='upper right')
+        ax1.legend(handles=[h1] + [line for line in ax1.get_lines() if line.get_label().startswith('control')],
+                   loc='upper right')
         ax2.legend(handles=[h2], loc='upper right')
         ax3.legend(handles=[h3], loc='upper right')
 
@@ -261,17 +325,123 @@ def plot_blank_data(dataframe: pandas.DataFrame, titel: str) -> object:
         logger.warning('plot: ' + titel + ': no records received for plotting')
 
 
+####################################################################################
+# control charts (Shewhart, EWMA, CUSUM) of a standard or the blanks
+#####################################################################################
+def ask_control_chart() -> dict:
+    """
+    dialog to ask for the series of the control chart plot
+
+    Returns:
+        dict: keyword arguments for query_control_chart and plot_control_chart
+    """
+    names = controlcharts.chart_names()
+    name, ok = QInputDialog.getItem(None, 'Control Chart', 'standard', names, names.index(controlcharts.OXA2), False)
+    if not ok:
+        name = controlcharts.OXA2
+        logger.info('dialog (control chart) -- not ok, use default: ' + name)
+    return {'name': name}
+
+
+def query_control_chart(name: str = controlcharts.OXA2, value: str = 'fm') -> pandas.DataFrame:
+    """
+    read the control chart of a series (see plots.qc.controlcharts), the charts are brought up to date by batch.py
+
+    Args:
+        name: name of the series, see controlcharts.chart_names()
+        value: fm or dc13
+
+    Returns:
+        DataFrame: the chart table, one row per measurement (empty if the chart was never updated)
+    """
+    return controlcharts.read(name, value).rows()
+
+
+def plot_control_chart(dataframe: pandas.DataFrame = None, name: str = controlcharts.OXA2, value: str = 'fm') -> object:
+    """
+    plot the Shewhart, EWMA and CUSUM charts of a series
+
+    Args:
+        dataframe: result of query_control_chart(), the chart is read if not given
+        name: name of the series
+        value: fm or dc13
+
+    Returns:
+        Figure: the plot
+    """
+    titel = 'control charts ' + name + ' ' + value
+    if dataframe is None:
+        dataframe = query_control_chart(name, value)
+    if len(dataframe) == 0:
+        logger.warning('plot: ' + titel + ': no records received for plotting (run batch.py to update the charts)')
+        return None
+    chart = controlcharts.ControlChart(name, value)
+    xdata = np.arange(len(dataframe))
+    sns.set()
+    sns.set_style("dark")
+    sns.set_palette('Set2')
+    sns.despine()
+
+    logger.info('plot: ' + titel + ': creating plot...')
+    fig, (ax, ax2, ax3) = plt.subplots(nrows=3, sharex=True)
+    # Shewhart
+    ax.plot(xdata, dataframe['x'], 'o', markersize=3, alpha=0.5, label=value)
+    ax.plot(xdata, dataframe['center'], color='green', label='center')
+    ax.plot(xdata, dataframe['lcl'], color='purple', linestyle='dotted', label='3 sigma')
+    ax.plot(xdata, dataframe['ucl'], color='purple', linestyle='dotted')
+    signals = dataframe['shewhart_signal'].astype(bool)
+    ax.plot(xdata[signals], dataframe.loc[signals, 'x'], 'x', color='red', label='outside')
+    ax.set_title(titel)
+    ax.set_ylabel(value)
+    ax.legend(loc='upper right')
+    # EWMA
+    ax2.plot(xdata, dataframe['ewma'], label='EWMA (lambda = ' + str(chart.lam) + ')')
+    ax2.plot(xdata, dataframe['ewma_lower'], color='purple', linestyle='dotted', label='limits')
+    ax2.plot(xdata, dataframe['ewma_upper'], color='purple', linestyle='dotted')
+    signals = dataframe['ewma_signal'].astype(bool)
+    ax2.plot(xdata[signals], dataframe.loc[signals, 'ewma'], 'x', color='red', label='signal')
+    ax2.set_ylabel('EWMA')
+    ax2.legend(loc='upper right')
+    # CUSUM
+    ax3.plot(xdata, dataframe['cusum_pos'], label='CUSUM +')
+    ax3.plot(xdata, dataframe['cusum_neg'], label='CUSUM -')
+    ax3.axhline(chart.h, color='red', linestyle='dotted', label='h = ' + str(chart.h))
+    ax3.set_ylabel('CUSUM (sigma)')
+    ax3.set_xlabel('record')
+    ax3.legend(loc='upper right')
+
+    plt.show()
+
+    path = 'pics/control_chart_' + name + '_' + value
+    logger.info('plot: ' + titel + ': saving figure to disk: ' + path)
+    fig.savefig(path + '.png', dpi=600)
+    dataframe.to_csv(path + '.csv')
+    return fig
+
+
 ####################################################################################
 # queries for the individual plots that use the above function
 # in order to create the plots
 #####################################################################################
-def plot_blanks():
+def query_blanks() -> pandas.DataFrame:
     """
-    query the database and generate a plot
-    by calling the functions stored in other modules
+    query the database for the blank values (phthalic acid)
 
-    creates a plot that shows fm or C14 ages of the blanks
+    Returns:
+        DataFrame: user_label, date, fm, fm_sig, dc13, c14_age, magazine
     """
+    if use_mirror('target_v'):
+        target_v = mymirror.table('target_v')
+        # same conditions as the query below, AND binds stronger than OR
+        mask = like(target_v['user_label'], '%Pthalic%') | (like(target_v['user_label'], '%phthalic%')
+                                                           & (target_v['fm'] > 0)
+                                                           & target_v['graphitized'].notna()
+                                                           & (target_v['dc13'] < 0)
+                                                           & (target_v['c14_age'] > 0)
+                                                           & target_v['magazine'].notna())
+        dataframe = target_v.loc[mask].sort_values('sample_nr')
+        dataframe = dataframe.rename(columns={'graphitized': 'date'})
+        return dataframe[['user_label', 'date', 'fm', 'fm_sig', 'dc13', 'c14_age', 'magazine']].reset_index(drop=True)
     query = """SELECT user_label, graphitized AS date, fm, fm_sig, dc13, c14_age, magazine
                FROM target_v
                WHERE user_label LIKE '%Pthalic%'
@@ -282,116 +452,183 @@ def plot_blanks():
                AND c14_age > 0
                AND target_v.magazine IS NOT NULL
                order by sample_nr"""
-    dataframe = mydb.querydb(query)
-    plot_blank_data(dataframe, 'blanks values')
+    return mydb.querydb(query)
 
 
-def plot_c1():
+def plot_blanks(dataframe: pandas.DataFrame = None):
     """
     query the database and generate a plot
     by calling the functions stored in other modules
+
+    creates a plot that shows fm or C14 ages of the blanks
+
+    Args:
+        dataframe: result of query_blanks(), the database is queried if not given
+    """
+    if dataframe is None:
+        dataframe = query_blanks()
+    return plot_blank_data(dataframe, 'blanks values', saved_chart(controlcharts.BLANKS))
+
+
+def plot_standard(name: str, dataframe: pandas.DataFrame = None):
+    """
+    generate the plot of a standard of the registry in plots.qc.standards
+
+    Args:
+        name: short name of the standard
+        dataframe: measurements of the standard, the database is queried if not given
+    """
+    standard = standards.get_standard(name)
+    if dataframe is None:
+        dataframe = standards.query_standard(name)
+    # the rows that are plotted, the statistics are calculated of the same rows
+    dataframe = dataframe.dropna()
+    return plot_standards(dataframe, standard.consensus, standard.title, qcstats.standard_stats(dataframe, name),
+                          saved_chart(name))
+
+
+def query_c1() -> pandas.DataFrame:
     """
-    query = ("""SELECT Concat(substring(magazine,3,2),'-',substring(magazine,5,2),'-',substring(magazine,7,2)) as measdate,
-                fm, fm_sig, dc13, magazine
-                FROM target_v
-                where user_label like '%IAEA%C1%'
-                AND fm IS NOT NULL
-                AND fm < 0.004
-                Order By magazine;""")
-    logger.debug(query)
-    dataframe = mydb.querydb(query)
-    plot_standards(dataframe, 0, 'IAEA-C1')
+    query the database for the IAEA-C1 standards (see plots.qc.standards)
 
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine
+    """
+    return standards.query_standard('c1')
 
-def plot_c2():
+
+def plot_c1(dataframe: pandas.DataFrame = None):
     """
     query the database and generate a plot
     by calling the functions stored in other modules
+
+    Args:
+        dataframe: result of query_c1(), the database is queried if not given
     """
-    query = ("""SELECT Concat(substring(magazine,3,2),'-',substring(magazine,5,2),'-',substring(magazine,7,2)) as measdate,
-                fm, fm_sig, dc13, magazine
-                FROM target_v
-                where user_label like '%IAEA%C2%'
-                AND fm IS NOT NULL
-                AND fm < 0.43
-                Order By magazine;""")
-    dataframe = mydb.querydb(query)
-    plot_standards(dataframe, 0.4114, 'IAEA-C2')
+    return plot_standard('c1', dataframe)
+
 
+def query_c2() -> pandas.DataFrame:
+    """
+    query the database for the IAEA-C2 standards (see plots.qc.standards)
 
-def plot_c3():
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine
+    """
+    return standards.query_standard('c2')
+
+
+def plot_c2(dataframe: pandas.DataFrame = None):
     """
     query the database and generate a plot
     by calling the functions stored in other modules
+
+    Args:
+        dataframe: result of query_c2(), the database is queried if not given
     """
-    query = ("""SELECT Concat(substring(magazine,3,2),'-',substring(magazine,5,2),'-',substring(magazine,7,2)) as measdate,
-                fm, fm_sig, dc13, magazine
-                FROM target_v
-                where user_label like '%IAEA%C3%'
-                AND fm IS NOT NULL
-                AND fm > 1.27
-                Order By magazine;""")
-    dataframe = mydb.querydb(query)
-    plot_standards(dataframe, 1.2941, 'IAEA-C3')
+    return plot_standard('c2', dataframe)
 
 
-def plot_c6():
+def query_c3() -> pandas.DataFrame:
+    """
+    query the database for the IAEA-C3 standards (see plots.qc.standards)
+
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine
+    """
+    return standards.query_standard('c3')
+
+
+def plot_c3(dataframe: pandas.DataFrame = None):
     """
     query the database and generate a plot
     by calling the functions stored in other modules
+
+    Args:
+        dataframe: result of query_c3(), the database is queried if not given
+    """
+    return plot_standard('c3', dataframe)
+
+
+def query_c6() -> pandas.DataFrame:
     """
-    query = ("""SELECT Concat(substring(magazine,3,2),'-',substring(magazine,5,2),'-',substring(magazine,7,2)) as measdate,
-                fm, fm_sig, dc13, magazine
-                FROM target_v
-                where user_label like '%IAEA%C6%'
-                AND fm IS NOT NULL
-                Order By magazine;""")
-    dataframe = mydb.querydb(query)
-    plot_standards(dataframe, 1.5016, 'IAEA-C6')
+    query the database for the IAEA-C6 standards (see plots.qc.standards)
 
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine
+    """
+    return standards.query_standard('c6')
 
-def plot_hei3():
+
+def plot_c6(dataframe: pandas.DataFrame = None):
     """
     query the database and generate a plot
     by calling the functions stored in other modules
+
+    Args:
+        dataframe: result of query_c6(), the database is queried if not given
     """
-    query = ("""SELECT Concat(substring(magazine,3,2),'-',substring(magazine,5,2),'-',substring(magazine,7,2)) as measdate,
-                fm, fm_sig, dc13, magazine
-                FROM target_v
-                where user_label like '%HEI_3%'
-                AND fm IS NOT NULL
-                Order By magazine;""")
-    dataframe = mydb.querydb(query)
-    plot_standards(dataframe, 0, 'ICOS-HEI_3')
+    return plot_standard('c6', dataframe)
 
 
-def plot_hei10():
+def query_hei3() -> pandas.DataFrame:
+    """
+    query the database for the ICOS HEI_3 standards (see plots.qc.standards)
+
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine
+    """
+    return standards.query_standard('hei3')
+
+
+def plot_hei3(dataframe: pandas.DataFrame = None):
     """
     query the database and generate a plot
     by calling the functions stored in other modules
+
+    Args:
+        dataframe: result of query_hei3(), the database is queried if not given
     """
-    query = ("""SELECT Concat(substring(magazine,3,2),'-',substring(magazine,5,2),'-',substring(magazine,7,2)) as measdate,
-                fm, fm_sig, dc13, magazine
-                FROM target_v
-                where user_label like '%HEI_10%'
-                AND fm IS NOT NULL
-                Order By magazine;""")
-    dataframe = mydb.querydb(query)
-    plot_standards(dataframe, 0, 'ICOS-HEI_10')
+    return plot_standard('hei3', dataframe)
 
 
-def plot_horses():
+def query_hei10() -> pandas.DataFrame:
+    """
+    query the database for the ICOS HEI_10 standards (see plots.qc.standards)
+
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine
+    """
+    return standards.query_standard('hei10')
+
+
+def plot_hei10(dataframe: pandas.DataFrame = None):
     """
     query the database and generate a plot
     by calling the functions stored in other modules
+
+    Args:
+        dataframe: result of query_hei10(), the database is queried if not given
+    """
+    return plot_standard('hei10', dataframe)
+
+
+def query_horses() -> pandas.DataFrame:
+    """
+    query the database for the Latdorf horse bones (see plots.qc.standards)
+
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine
     """
-    query = ("""SELECT Concat(substring(magazine,3,2),'-',substring(magazine,5,2),'-',substring(magazine,7,2)) as measdate,
-                fm, fm_sig, dc13, magazine
-                FROM target_v
-                where user_label like '%Pferd%'
-                AND fm IS NOT NULL
-                AND fm > 0.9
-                Order By magazine;""")
-    dataframe = mydb.querydb(query)
-    plot_standards(dataframe, 0.966, 'Latdorf-Pferde')
+    return standards.query_standard('horses')
 
+
+def plot_horses(dataframe: pandas.DataFrame = None):
+    """
+    query the database and generate a plot
+    by calling the functions stored in other modules
+
+    Args:
+        dataframe: result of query_horses(), the database is queried if not given
+    """
+    return plot_standard('horses', dataframe)
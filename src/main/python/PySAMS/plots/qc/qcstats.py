@@ -0,0 +1,287 @@
+"""
+statistics of the QC reference standards
+
+the measurements of all standards (plots.qc.standards.query_all_standards) are reduced in one groupby
+pass to sums per standard and magazine: n, sum x, sum x^2, sum w, sum w*x and sum w*x^2 with
+w = 1/sig^2, for fm and dc13 at once. All tables are derived from these sums:
+
+- magazines: one row per standard, magazine and value
+- rolling: the same over the last qc/window magazines of a standard
+- overall: one row per standard and value
+
+with count, mean, stdev, weighted_mean, weighted_error, mswd (scatter around the weighted mean),
+chi2_reduced (scatter around the mean, as in the plots), offset (weighted mean - consensus) and
+offset_sigma (offset / weighted_error). Only fm has offsets, and only for standards with a consensus value.
+
+the tables are cached by the hash of the measurements, so the plots, the web app and the exports
+show the same numbers and the sums are only built again when the data changed.
+"""
+
+from config.logging_conf import logger
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+import numpy as np
+import pandas
+import plots.qc.standards as standards
+from config.config import myconfig  # myconfig calss will be loaded here
+
+# set logger name to the name of the module
+logger.name = __name__
+
+# value column -> error column, dc13 has no errors in the database (see dc13_sig)
+VALUES = OrderedDict([('fm', 'fm_sig'), ('dc13', None)])
+# sums per group that all statistics are derived from
+SUMS = ('n', 'x', 'xx', 'w', 'wx', 'wxx')
+STATS = ['count', 'mean', 'stdev', 'weighted_mean', 'weighted_error', 'mswd', 'chi2_reduced', 'offset',
+         'offset_sigma']
+
+# tables of the last data sets, by hash of the data
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+CACHED_TABLES = 8
+
+
+class QCTables(NamedTuple):
+    """
+    the statistics tables of the standards
+
+    overall: standard, value, statistics
+    magazines: standard, magazine, measdate, value, statistics
+    rolling: standard, magazine, measdate, value, magazines (in the window), statistics
+    """
+    overall: pandas.DataFrame
+    magazines: pandas.DataFrame
+    rolling: pandas.DataFrame
+
+
+def dc13_sig() -> float:
+    """
+    Returns:
+        float: error assumed for every dc13 value (config value qc/dc13_sig)
+    """
+    return myconfig.getfloat('qc', 'dc13_sig', fallback=0.003)
+
+
+def window() -> int:
+    """
+    Returns:
+        int: magazines of the rolling statistics (config value qc/window)
+    """
+    return myconfig.getint('qc', 'window', fallback=10)
+
+
+def combine(dataframe: pandas.DataFrame) -> pandas.DataFrame:
+    """
+    the rows of all standards with the name of their standard (a row may belong to several standards)
+
+    Args:
+        dataframe: result of standards.query_all_standards()
+
+    Returns:
+        DataFrame: standard, measdate, fm, fm_sig, dc13, magazine
+    """
+    partitions = standards.partition_standards(dataframe)
+    return pandas.concat([partition.assign(standard=name) for name, partition in partitions.items()],
+                         ignore_index=True)
+
+
+def group_sums(combined: pandas.DataFrame) -> pandas.DataFrame:
+    """
+    the sums of fm and dc13 per standard and magazine in one groupby pass
+
+    the values are shifted by the mean of their standard first, so that the sums of squares stay small
+
+    Args:
+        combined: standard, magazine, measdate and the value and error columns (see combine)
+
+    Returns:
+        DataFrame: standard, magazine, measdate and for every value <value>_<sum> (see SUMS) and <value>_shift,
+        ordered by standard and measurement date
+    """
+    columns = {'standard': combined['standard'].to_numpy(),
+               'magazine': combined['magazine'].to_numpy(),
+               'measdate': combined['measdate'].to_numpy()}
+    for value, error in VALUES.items():
+        x = combined[value].to_numpy(dtype=float)
+        sig = combined[error].to_numpy(dtype=float) if error is not None else np.full(len(x), dc13_sig())
+        with np.errstate(invalid='ignore'):
+            valid = ~np.isnan(x) & (sig > 0)
+        shift = pandas.Series(np.where(valid, x, np.nan)).groupby(columns['standard']).transform('mean').to_numpy()
+        y = np.where(valid, x - shift, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w = np.where(valid, 1 / sig ** 2, 0.0)
+        columns[value + '_n'] = valid.astype(np.int64)
+        columns[value + '_x'] = y
+        columns[value + '_xx'] = y ** 2
+        columns[value + '_w'] = w
+        columns[value + '_wx'] = w * y
+        columns[value + '_wxx'] = w * y ** 2
+        columns[value + '_shift'] = shift
+    frame = pandas.DataFrame(columns)
+    aggregations = {name: 'sum' for name in frame.columns if name.rsplit('_', 1)[-1] in SUMS}
+    aggregations.update({'measdate': 'min', 'fm_shift': 'first', 'dc13_shift': 'first'})
+    sums = frame.groupby(['standard', 'magazine'], sort=False).agg(aggregations).reset_index()
+    return sums.sort_values(['standard', 'measdate', 'magazine'], ignore_index=True)
+
+
+def derive(sums: pandas.DataFrame, keys: list) -> pandas.DataFrame:
+    """
+    the statistics of every row of a table of sums
+
+    Args:
+        sums: table with <value>_<sum> and <value>_shift columns (see group_sums)
+        keys: columns of sums that are copied to the result
+
+    Returns:
+        DataFrame: keys, value and the statistics (see STATS), one row per row of sums and value with values
+    """
+    consensus = pandas.Series({standard.name: standard.consensus for standard in standards.STANDARDS})
+    target = consensus.reindex(sums['standard']).to_numpy(dtype=float, copy=True)
+    # 0 means the standard has no consensus value
+    target[target == 0] = np.nan
+    frames = []
+    for value in VALUES:
+        n, x, xx, w, wx, wxx = (sums[value + '_' + name].to_numpy(dtype=float) for name in SUMS)
+        shift = sums[value + '_shift'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = x / n
+            weighted = wx / w
+            weighted_error = 1 / np.sqrt(w)
+            # the consensus values are fm values
+            offset = shift + weighted - target if value == 'fm' else np.full(len(n), np.nan)
+            stats = {'count': n.astype(np.int64),
+                     'mean': shift + mean,
+                     'stdev': np.where(n > 1, np.sqrt(np.maximum(xx - x * mean, 0) / (n - 1)), np.nan),
+                     'weighted_mean': shift + weighted,
+                     'weighted_error': weighted_error,
+                     'mswd': np.where(n > 1, np.maximum(wxx - wx * weighted, 0) / (n - 1), np.nan),
+                     'chi2_reduced': np.where(n > 1, np.maximum(wxx - 2 * mean * wx + mean ** 2 * w, 0) / (n - 1),
+                                              np.nan),
+                     'offset': offset,
+                     'offset_sigma': offset / weighted_error}
+        frame = sums[keys].copy()
+        frame.insert(len(keys), 'value', value)
+        for name in STATS:
+            frame[name] = stats[name]
+        frames.append(frame[n > 0])
+    # the rows of a standard and value stay in the order of the sums (by measurement date)
+    return pandas.concat(frames, ignore_index=True).sort_values(['standard', 'value'], kind='stable',
+                                                                ignore_index=True)
+
+
+def totals(sums: pandas.DataFrame) -> pandas.DataFrame:
+    """
+    Returns:
+        DataFrame: the sums of every standard over all its magazines (see group_sums)
+    """
+    columns = [name for name in sums.columns if name.rsplit('_', 1)[-1] in SUMS + ('shift',)]
+    return sums.groupby('standard', sort=False).agg({name: ('first' if name.endswith('_shift') else 'sum')
+                                                     for name in columns}).reset_index()
+
+
+def compute(dataframe: pandas.DataFrame, magazines: int = None) -> QCTables:
+    """
+    all statistics tables of the standards, not cached (see tables)
+
+    Args:
+        dataframe: result of standards.query_all_standards()
+        magazines: magazines of the rolling statistics, default is window()
+
+    Returns:
+        QCTables: overall, magazines and rolling statistics
+    """
+    if magazines is None:
+        magazines = window()
+    sums = group_sums(combine(dataframe))
+    sum_columns = [name for name in sums.columns if name.rsplit('_', 1)[-1] in SUMS]
+
+    # the same sums over the last magazines of every standard, from the differences of the cumulative sums
+    grouped = sums.groupby('standard', sort=False)
+    cumulative = grouped[sum_columns].cumsum()
+    lagged = cumulative.groupby(sums['standard'], sort=False).shift(magazines, fill_value=0)
+    rolling = sums.copy()
+    rolling[sum_columns] = cumulative - lagged
+    rolling['magazines'] = np.minimum(grouped.cumcount().to_numpy() + 1, magazines)
+
+    result = QCTables(overall=derive(totals(sums), ['standard']),
+                      magazines=derive(sums, ['standard', 'magazine', 'measdate']),
+                      rolling=derive(rolling, ['standard', 'magazine', 'measdate', 'magazines']))
+    logger.debug('qcstats: ' + str(len(dataframe)) + ' measurements, ' + str(len(sums)) + ' magazines')
+    return result
+
+
+def data_key(dataframe: pandas.DataFrame) -> tuple:
+    # the same measurements and settings give the same tables
+    hashes = pandas.util.hash_pandas_object(dataframe, index=False).to_numpy()
+    return (len(dataframe), tuple(dataframe.columns), int(hashes.sum()), int(hashes[::7].sum()),
+            window(), dc13_sig(), tuple(standards.STANDARDS))
+
+
+def cached(key: tuple, build):
+    # result of build() for key, kept for the next calls with the same key
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is None:
+            result = build()
+            _cache[key] = result
+            if len(_cache) > CACHED_TABLES:
+                _cache.popitem(last=False)
+        _cache.move_to_end(key)
+        return result
+
+
+def tables(dataframe: pandas.DataFrame = None) -> QCTables:
+    """
+    the statistics tables of the standards, computed once per data set
+
+    Args:
+        dataframe: result of standards.query_all_standards(), the database is queried if not given
+
+    Returns:
+        QCTables: overall, magazines and rolling statistics
+    """
+    if dataframe is None:
+        dataframe = standards.query_all_standards()
+    return cached(data_key(dataframe), lambda: compute(dataframe))
+
+
+def standard_stats(dataframe: pandas.DataFrame, name: str) -> pandas.DataFrame:
+    """
+    overall statistics of the measurements of one standard, e.g. for its plot
+
+    Args:
+        dataframe: measurements of the standard (see standards.query_standard)
+        name: short name of the standard
+
+    Returns:
+        DataFrame: statistics (see STATS), indexed by value (fm, dc13)
+    """
+    combined = dataframe.assign(standard=name)
+    overall = cached(data_key(combined), lambda: derive(totals(group_sums(combined)), ['standard']))
+    return overall.set_index('value')
+
+
+def export(path: str = 'pics/qc_stats', dataframe: pandas.DataFrame = None) -> list:
+    """
+    write the statistics tables as csv files <path>_overall.csv, <path>_magazines.csv and <path>_rolling.csv
+
+    Args:
+        path: path and start of the file names
+        dataframe: result of standards.query_all_standards(), the database is queried if not given
+
+    Returns:
+        list: the written files
+    """
+    result = tables(dataframe)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    files = []
+    for name, table in result._asdict().items():
+        file = path + '_' + name + '.csv'
+        table.to_csv(file, index=False)
+        files.append(file)
+    logger.info('qcstats: exported ' + ', '.join(files))
+    return files
@@ -0,0 +1,258 @@
+"""
+registry of the QC reference standards
+
+all standards are fetched from target_v with one single query,
+the rows of the single standards are picked from that result locally.
+
+plots that are created together (all QC plots, the batch) share one fetch:
+
+    standards.start_run()
+    c1, c2 = standards.query_standard('c1'), standards.query_standard('c2')  # one query
+    standards.end_run()
+"""
+
+from config.logging_conf import logger
+import threading
+from typing import NamedTuple
+import numpy as np
+import pandas
+from database.pysamsdb import mydb  # this is the already instantiated MyDatabase object to the AMS DB
+from database.mirror import mymirror, use_mirror, like
+import plots.utils.plotutils as plotutils
+
+# set logger name to the name of the module
+logger.name = __name__
+
+
+class QCStandard(NamedTuple):
+    """
+    one reference standard
+
+    name: short name of the standard (same as the name of its plot in plots.registry)
+    title: titel of the plot
+    label: LIKE pattern of the user_label of the standard
+    consensus: consensus fm value, 0 if there is none
+    fm_min: only fm values above fm_min are used (None = no limit)
+    fm_max: only fm values below fm_max are used (None = no limit)
+    """
+    name: str
+    title: str
+    label: str
+    consensus: float
+    fm_min: float = None
+    fm_max: float = None
+
+
+STANDARDS = [
+    QCStandard('c1', 'IAEA-C1', '%IAEA%C1%', 0, fm_max=0.004),
+    QCStandard('c2', 'IAEA-C2', '%IAEA%C2%', 0.4114, fm_max=0.43),
+    QCStandard('c3', 'IAEA-C3', '%IAEA%C3%', 1.2941, fm_min=1.27),
+    QCStandard('c6', 'IAEA-C6', '%IAEA%C6%', 1.5016),
+    QCStandard('hei3', 'ICOS-HEI_3', '%HEI_3%', 0),
+    QCStandard('hei10', 'ICOS-HEI_10', '%HEI_10%', 0),
+    QCStandard('horses', 'Latdorf-Pferde', '%Pferd%', 0.966, fm_min=0.9),
+]
+
+# query result and partitions of the current run (see start_run), None outside of a run.
+# the plots of a run are queried in parallel threads, the first one fetches, the others wait for it
+_run = None
+_run_lock = threading.RLock()
+
+
+def get_standard(name: str) -> QCStandard:
+    """
+    return the registry entry of a standard
+
+    Args:
+        name: short name of the standard
+
+    Returns:
+        QCStandard: entry of the standard
+    """
+    for standard in STANDARDS:
+        if standard.name == name:
+            return standard
+    raise KeyError('unknown standard: ' + name)
+
+
+def start_run():
+    """
+    the next calls of query_all_standards and query_standard share one fetch, until end_run
+    """
+    global _run
+    with _run_lock:
+        _run = {}
+
+
+def end_run():
+    """
+    the next calls of query_all_standards and query_standard query the database again
+    """
+    global _run
+    with _run_lock:
+        _run = None
+
+
+def _run_result(key: str, build):
+    # result of build() that is kept for the rest of the run, None outside of a run
+    with _run_lock:
+        if _run is None:
+            return None
+        if key not in _run:
+            _run[key] = build()
+        return _run[key]
+
+
+def fetch_all_standards() -> pandas.DataFrame:
+    """
+    fetch the measurements of all standards in STANDARDS with one scan of target_v
+
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine, user_label ordered by magazine
+    """
+    if use_mirror('target_v'):
+        target_v = mymirror.table('target_v')
+        mask = label_members(target_v['user_label']).any(axis=1) & target_v['fm'].notna().to_numpy()
+        dataframe = target_v.loc[mask, ['fm', 'fm_sig', 'dc13', 'magazine', 'user_label']]
+        dataframe = dataframe.sort_values('magazine', ignore_index=True)
+    else:
+        labels = ' OR '.join(['user_label LIKE %s'] * len(STANDARDS))
+        query = ("""SELECT fm, fm_sig, dc13, magazine, user_label
+                    FROM target_v
+                    WHERE fm IS NOT NULL
+                    AND (""" + labels + """)
+                    Order By magazine""")
+        dataframe = mydb.querydb(query, params=[standard.label for standard in STANDARDS], ttl=mydb.history_ttl)
+    # magazine names are MAyymmdd..., the measurement date is taken from it
+    dataframe.insert(0, 'measdate', plotutils.magazine_measdate(dataframe['magazine']).values)
+    return dataframe
+
+
+def query_all_standards() -> pandas.DataFrame:
+    """
+    the measurements of all standards, during a run (see start_run) only the first call fetches them
+
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine, user_label ordered by magazine
+    """
+    dataframe = _run_result('all', fetch_all_standards)
+    return fetch_all_standards() if dataframe is None else dataframe
+
+
+def label_members(user_label: pandas.Series) -> np.ndarray:
+    """
+    which user labels match the LIKE patterns of the standards,
+    the patterns only run over the distinct labels and are mapped back to all rows at once
+
+    Args:
+        user_label: column of user labels
+
+    Returns:
+        ndarray: bool, one row per label and one column per standard in STANDARDS
+    """
+    codes, labels = pandas.factorize(user_label)
+    labels = pandas.Series(labels, dtype=object)
+    matches = np.zeros((len(labels) + 1, len(STANDARDS)), dtype=bool)
+    for i, standard in enumerate(STANDARDS):
+        matches[:-1, i] = like(labels, standard.label).to_numpy(dtype=bool)
+    # missing labels have the code -1 and pick the last row, which matches nothing
+    return matches[codes]
+
+
+def standard_members(dataframe: pandas.DataFrame) -> np.ndarray:
+    """
+    which rows belong to which standard, a row may belong to several standards
+
+    Args:
+        dataframe: result of query_all_standards()
+
+    Returns:
+        ndarray: bool, one row per row of dataframe and one column per standard in STANDARDS
+    """
+    members = label_members(dataframe['user_label'])
+    fm = dataframe['fm'].to_numpy(dtype=float)
+    fm_min = np.array([-np.inf if standard.fm_min is None else standard.fm_min for standard in STANDARDS])
+    fm_max = np.array([np.inf if standard.fm_max is None else standard.fm_max for standard in STANDARDS])
+    with np.errstate(invalid='ignore'):
+        members &= (fm[:, None] > fm_min) & (fm[:, None] < fm_max)
+    return members
+
+
+def partition_standards(dataframe: pandas.DataFrame = None) -> dict:
+    """
+    split the result of query_all_standards into the single standards in one pass
+
+    Args:
+        dataframe: result of query_all_standards(), the database is queried if not given
+
+    Returns:
+        dict: name of the standard -> DataFrame of that standard (measdate, fm, fm_sig, dc13, magazine
+        with a new index 0..n-1)
+    """
+    if dataframe is None:
+        dataframe = query_all_standards()
+    members = standard_members(dataframe)
+    columns = dataframe[['measdate', 'fm', 'fm_sig', 'dc13', 'magazine']]
+    return {standard.name: columns.loc[members[:, i]].reset_index(drop=True)
+            for i, standard in enumerate(STANDARDS)}
+
+
+def query_standard(name: str) -> pandas.DataFrame:
+    """
+    return the measurements of one standard, during a run (see start_run) the standards are fetched
+    and split only once
+
+    Args:
+        name: short name of the standard
+
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine
+    """
+    get_standard(name)
+    partitions = _run_result('partitions', partition_standards)
+    if partitions is None:
+        return partition_standards(fetch_all_standards())[name]
+    # every plot gets its own copy, the plots may change their data
+    return partitions[name].copy()
+
+
+def query_oxa2() -> pandas.DataFrame:
+    """
+    return the measurements of the Oxa2 standards (the normalization standard, it isn't part of STANDARDS)
+
+    Returns:
+        DataFrame: measdate, fm, fm_sig, dc13, magazine ordered by magazine
+    """
+    if use_mirror('target_v'):
+        target_v = mymirror.table('target_v')
+        mask = (target_v['type'] == 'oxa2') & target_v['fm'].notna()
+        dataframe = target_v.loc[mask, ['fm', 'fm_sig', 'dc13', 'magazine']]
+        dataframe = dataframe.sort_values('magazine', ignore_index=True)
+    else:
+        query = """SELECT fm, fm_sig, dc13, magazine
+                   FROM target_v
+                   WHERE type = 'oxa2'
+                   AND fm IS NOT NULL
+                   Order By magazine"""
+        dataframe = mydb.querydb(query, ttl=mydb.history_ttl)
+    dataframe.insert(0, 'measdate', plotutils.magazine_measdate(dataframe['magazine']).values)
+    return dataframe
+
+
+def segment_stats_all(dataframe: pandas.DataFrame = None, value: str = 'fm', error: str = 'fm_sig') -> pandas.DataFrame:
+    """
+    statistics of all standards for every source revision segment in one pass (see plotutils.segment_stats)
+
+    Args:
+        dataframe: result of query_all_standards(), the database is queried if not given
+        value: column the statistics are calculated of
+        error: column with the errors of value
+
+    Returns:
+        DataFrame: standard, segment, revision, first, last, count, mean, stdev, chi2_reduced.
+        first and last are row positions in the DataFrame of the single standard (see partition_standards)
+    """
+    partitions = partition_standards(dataframe)
+    # the index of every partition is 0..n-1, it is kept so that first and last are positions within the standard
+    combined = pandas.concat([partition.assign(standard=name) for name, partition in partitions.items()])
+    return plotutils.segment_stats(combined, value=value, error=error, group='standard')
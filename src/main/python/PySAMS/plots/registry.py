@@ -0,0 +1,111 @@
+"""
+registry of all predefined plots
+
+every plot is split into a query function (fetches the data, can run in a background thread)
+and a plot function (draws the data, has to run in the GUI thread).
+The functions are stored by name and only imported when they are used.
+"""
+
+from config.logging_conf import logger
+import importlib
+from typing import NamedTuple, Callable
+
+# set logger name to the name of the module
+logger.name = __name__
+
+
+class PlotEntry(NamedTuple):
+    """
+    one predefined plot
+
+    name: short name of the plot
+    label: text shown in the plot window
+    module: module that holds the query and plot function
+    query: name of the function that queries the data
+    plot: name of the function that creates the plot from the queried data
+    ask: name of a function that asks the user for parameters (returns a dict of keyword arguments
+         that is passed to the query and the plot function), None if the plot has no parameters
+    params: names of the keyword arguments the ask function returns, the only parameters that are
+            accepted from outside the GUI (web app, batch.py)
+    full: name of the function that queries all rows, if query only returns an overview for the interactive
+          plot (e.g. daily means). The exports (batch.py, the web app) use it, so their csv and png files hold
+          the same rows as before. None if query returns all rows
+    """
+    name: str
+    label: str
+    module: str
+    query: str
+    plot: str
+    ask: str = None
+    params: tuple = ()
+    full: str = None
+
+    def query_function(self) -> Callable:
+        return getattr(importlib.import_module(self.module), self.query)
+
+    def export_function(self) -> Callable:
+        # the query of the exports, all rows
+        return getattr(importlib.import_module(self.module), self.query if self.full is None else self.full)
+
+    def plot_function(self) -> Callable:
+        return getattr(importlib.import_module(self.module), self.plot)
+
+    def ask_function(self) -> Callable:
+        if self.ask is None:
+            return None
+        return getattr(importlib.import_module(self.module), self.ask)
+
+
+STATPLOTS = 'plots.stat.statplots'
+QCPLOTS = 'plots.qc.qcplots'
+
+# all plots in the order they are shown in the plot window
+PLOTS = [
+    PlotEntry('received', 'received samples', STATPLOTS, 'query_received', 'plot_received'),
+    PlotEntry('projects_per_year', 'projects per year', STATPLOTS, 'query_projects_per_year', 'plot_projects_per_year'),
+    PlotEntry('throughput', 'measured samples', STATPLOTS, 'query_throughput', 'plot_throughput'),
+    PlotEntry('age_precision', 'overall age precision', STATPLOTS, 'query_age_precision', 'plot_age_precision'),
+    PlotEntry('oxas_stdev_mag', 'oxas blanks stdev per magazine', STATPLOTS, 'query_oxas_stdev_mag',
+              'plot_oxas_stdev_mag'),
+    PlotEntry('age_precision_time', 'age precision over time', STATPLOTS, 'query_age_precision_time',
+              'plot_age_precision_time', full='query_age_precision_time_full'),
+    PlotEntry('age_hist', 'age histogram', STATPLOTS, 'query_age_hist', 'plot_age_hist'),
+    PlotEntry('material', 'materials', STATPLOTS, 'query_material', 'plot_material'),
+    PlotEntry('turnaround', 'turnaround times histogram (select year)', STATPLOTS, 'query_turnaround',
+              'plot_turnaround', ask='ask_turnaround_params', params=('search_mag',)),
+    PlotEntry('express_samples', 'express samples', STATPLOTS, 'query_express_samples', 'plot_express_samples'),
+    PlotEntry('bone_collagen', 'bone collagen distribution', STATPLOTS, 'query_bone_collagen', 'plot_bone_collagen'),
+    PlotEntry('MAG_params', 'MAG parameters', STATPLOTS, 'query_MAG_params', 'plot_MAG_params',
+              full='query_MAG_params_full'),
+    PlotEntry('AGE_params', 'AGE parameters', STATPLOTS, 'query_AGE_params', 'plot_AGE_params',
+              full='query_AGE_params_full'),
+    PlotEntry('blanks', 'blank values', QCPLOTS, 'query_blanks', 'plot_blanks'),
+    PlotEntry('c1', 'IAEA C1', QCPLOTS, 'query_c1', 'plot_c1'),
+    PlotEntry('c2', 'IAEA C2', QCPLOTS, 'query_c2', 'plot_c2'),
+    PlotEntry('c3', 'IAEA C3', QCPLOTS, 'query_c3', 'plot_c3'),
+    PlotEntry('c6', 'IAEA C6', QCPLOTS, 'query_c6', 'plot_c6'),
+    PlotEntry('hei3', 'ICOS HEI3', QCPLOTS, 'query_hei3', 'plot_hei3'),
+    PlotEntry('hei10', 'ICOS HEI10', QCPLOTS, 'query_hei10', 'plot_hei10'),
+    PlotEntry('horses', 'horses', QCPLOTS, 'query_horses', 'plot_horses'),
+    PlotEntry('control_chart', 'control charts (select standard)', QCPLOTS, 'query_control_chart',
+              'plot_control_chart', ask='ask_control_chart', params=('name',)),
+]
+
+# plots that are created by "-- all QC plots --"
+QC_PLOTS = ['blanks', 'c1', 'c2', 'c3', 'c6', 'horses']
+
+
+def get_plot(name: str) -> PlotEntry:
+    """
+    return the registry entry of a plot
+
+    Args:
+        name: short name of the plot
+
+    Returns:
+        PlotEntry: entry of the plot
+    """
+    for entry in PLOTS:
+        if entry.name == name:
+            return entry
+    raise KeyError('unknown plot: ' + name)
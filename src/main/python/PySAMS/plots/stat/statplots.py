@@ -1,7 +1,9 @@
 from config.logging_conf import logger
+import os
 import matplotlib
 # matplotlib.use('TkAgg')  # switch to a different backend in order to make the cursor mpldatawork
-matplotlib.use('Qt5Agg')
+# the batch renderer (plots.batchrender) sets MPLBACKEND=Agg in its processes to draw without windows
+matplotlib.use(os.environ.get('MPLBACKEND', 'Qt5Agg'))
 from PyQt5.QtWidgets import QInputDialog
 from database.pysamsdb import mydb
 import matplotlib.pyplot as plt
@@ -9,8 +11,12 @@ import matplotlib.dates as dates
 import mpldatacursor  # a datacursor for matlibplot, make sure to run the correct backend
 import seaborn as sns  # by importing this all the matlibplots will look better
 import math
+import functools
+import pandas
 import datetime
 import plots.utils.plotutils as plotutils
+import plots.utils.downsample as downsample
+from plots.utils.lod import LODController
 
 # set logger name to the name of the module
 logger.name = __name__
@@ -21,11 +27,32 @@ plt.ion()
 ####################################################################################
 # plot received samples per year
 #####################################################################################
-def plot_received() -> object:
+def query_received() -> pandas.DataFrame:
+    """
+    query the database for the number of received samples per year
+
+    Returns:
+        DataFrame: x_data (year), y_data (number of samples)
+    """
+    query = """select year(project_t.in_date) AS x_data, count(sample_t.sample_nr) as y_data
+                 from sample_t
+                 INNER JOIN project_t ON sample_t.project_nr = project_t.project_nr
+                 INNER JOIN user_t ON project_t.user_nr = user_t.user_nr
+                 WHERE sample_t.type NOT IN ('oxa2', 'oxa1', 'blank')
+                 AND sample_t.user_label NOT LIKE '%IAEA%'
+                 AND year(in_date) > 2009
+                 group by year(project_t.in_date)"""
+    return mydb.querydb(query)
+
+
+def plot_received(dataframe: pandas.DataFrame = None) -> object:
     """
     create a plot of received samples per year
     use the rows from two database queries (function: query_db) in order to plot the data;
 
+    Args:
+        dataframe: result of query_received(), the database is queried if not given
+
     Returns:
         None
     """
@@ -41,15 +68,8 @@ def plot_received() -> object:
     titel = 'received C14 samples per year'
     logger.info('plot -- creating plot: ' + titel)
     
-    query = """select year(project_t.in_date) AS x_data, count(sample_t.sample_nr) as y_data
-                 from sample_t
-                 INNER JOIN project_t ON sample_t.project_nr = project_t.project_nr
-                 INNER JOIN user_t ON project_t.user_nr = user_t.user_nr
-                 WHERE sample_t.type NOT IN ('oxa2', 'oxa1', 'blank')
-                 AND sample_t.user_label NOT LIKE '%IAEA%'
-                 AND year(in_date) > 2009
-                 group by year(project_t.in_date)"""
-    dataframe = mydb.querydb(query)
+    if dataframe is None:
+        dataframe = query_received()
 
     # if enough data where provided, do the math and create the plot
     if (dataframe is not None) > 0:
@@ -104,11 +124,28 @@ def plot_received() -> object:
 ####################################################################################
 # plot projects per year
 #####################################################################################
-def plot_projects_per_year() -> object:
+def query_projects_per_year() -> pandas.DataFrame:
+    """
+    query the database for the number of projects per year
+
+    Returns:
+        DataFrame: x_data (year), y_data (number of projects)
+    """
+    query = """select year(project_t.in_date) AS x_data, count(project_t.project_nr) as y_data
+                 from project_t
+                 WHERE year(in_date) > 2009
+                 group by year(project_t.in_date)"""
+    return mydb.querydb(query)
+
+
+def plot_projects_per_year(dataframe: pandas.DataFrame = None) -> object:
     """
     create a plot of projects per year
     use the rows from two database queries (function: query_db) in order to plot the data;
 
+    Args:
+        dataframe: result of query_projects_per_year(), the database is queried if not given
+
     Returns:
         None
     """
@@ -124,11 +161,8 @@ def plot_projects_per_year() -> object:
     titel = 'projects per year'
     logger.info('plot -- creating plot: ' + titel)
 
-    query = """select year(project_t.in_date) AS x_data, count(project_t.project_nr) as y_data
-                 from project_t
-                 WHERE year(in_date) > 2009
-                 group by year(project_t.in_date)"""
-    dataframe = mydb.querydb(query)
+    if dataframe is None:
+        dataframe = query_projects_per_year()
 
     # if enough data where provided, do the math and create the plot
     if (dataframe is not None) > 0:
@@ -182,11 +216,51 @@ def plot_projects_per_year() -> object:
 ####################################################################################
 # plot throughput
 #####################################################################################
-def plot_throughput() -> object:
+def query_throughput() -> tuple:
+    """
+    query the database for the number of measured targets per year
+
+    Returns:
+        tuple: three DataFrames with x_data (year) and y_data (number of targets) for
+        samples only, all targets and express samples
+    """
+    # the counts are grouped per magazine by the database and added up per year locally (see plotutils.MagazineIndex)
+    # samples only, no oxas, blanks or QC
+    query1 = """select magazine, count(sample_nr) as y_data
+                        from target_v
+                        WHERE type NOT IN ('oxa2', 'oxa1', 'blank')
+                        AND user_label NOT LIKE '%IAEA%'
+                        AND magazine LIKE 'MA%'
+                        AND fm IS NOT NULL
+                        group by magazine"""
+    dataframe1 = plotutils.counts_per_year(mydb.querydb(query1, ttl=mydb.history_ttl))
+    # all measured targets per year
+    query2 = """select magazine, count(sample_nr) as y_data
+                         from target_v
+                         WHERE target_v.type NOT IN ('')
+                         AND fm IS NOT NULL
+                         AND magazine LIKE 'MA%'
+                         group by magazine"""
+    dataframe2 = plotutils.counts_per_year(mydb.querydb(query2, ttl=mydb.history_ttl))
+    # number of measure EIL samples
+    query3 = """select magazine, count(sample_nr) as y_data
+                         from target_v
+                         WHERE fm IS NOT NULL
+                         AND magazine LIKE 'MA%'
+                         AND user_label LIKE '%EIL%'
+                         group by magazine"""
+    dataframe3 = plotutils.counts_per_year(mydb.querydb(query3, ttl=mydb.history_ttl))
+    return dataframe1, dataframe2, dataframe3
+
+
+def plot_throughput(dataframes: tuple = None) -> object:
     """
     create a plot of throughput data
     use the rows from two database queries (function: query_db) in order to plot the data;
 
+    Args:
+        dataframes: result of query_throughput(), the database is queried if not given
+
     Returns:
         None
     """
@@ -210,33 +284,9 @@ def plot_throughput() -> object:
     titel = 'measurements per year'
     logger.info('plot -- creating plot: ' + titel)
 
-    query1 = """select CAST(SUBSTRING(magazine, 3, 2) AS UNSIGNED) AS x_data, count(sample_nr) as y_data
-                        from target_v
-                        WHERE type NOT IN ('oxa2', 'oxa1', 'blank')
-                        AND user_label NOT LIKE '%IAEA%'
-                        AND magazine LIKE 'MA%'
-                        AND CAST(SUBSTRING(magazine, 3, 2) AS UNSIGNED) > '10'
-                        AND fm IS NOT NULL
-                        group by CAST(SUBSTRING(magazine, 3, 2) AS UNSIGNED)"""
-    dataframe1 = mydb.querydb(query1)
-    # all measured targets per year
-    query2 = """select CAST(SUBSTRING(magazine, 3, 2) AS UNSIGNED) AS x_data, count(sample_nr) as y_data
-                         from target_v
-                         WHERE target_v.type NOT IN ('')
-                         AND fm IS NOT NULL
-                         AND magazine LIKE 'MA%'
-                         AND CAST(SUBSTRING(magazine, 3, 2) AS UNSIGNED) > '10'
-                         group by CAST(SUBSTRING(magazine, 3, 2) AS UNSIGNED)"""
-    dataframe2 = mydb.querydb(query2)
-    # number of measure EIL samples
-    query3 = """select CAST(SUBSTRING(magazine, 3, 2) AS UNSIGNED) AS x_data, count(sample_nr) as y_data
-                         from target_v
-                         WHERE fm IS NOT NULL
-                         AND magazine LIKE 'MA%'
-                         AND CAST(SUBSTRING(magazine, 3, 2) AS UNSIGNED) > '10'
-                         AND user_label LIKE '%EIL%'
-                         group by CAST(SUBSTRING(magazine, 3, 2) AS UNSIGNED)"""
-    dataframe3 = mydb.querydb(query3)
+    if dataframes is None:
+        dataframes = query_throughput()
+    dataframe1, dataframe2, dataframe3 = dataframes
 
     # if enough data where provided, do the math and create the plot
     if (dataframe1 is not None) > 0:
@@ -307,18 +357,13 @@ def plot_throughput() -> object:
 ####################################################################################
 # plot age precision
 #####################################################################################
-def plot_age_precision() -> object:
+def query_age_precision() -> pandas.DataFrame:
     """
-    create a plot age precision data
-    use the rows from two database queries (function: query_db) in order to plot the data;
+    query the database for the C14 ages and their errors
 
     Returns:
-        None
+        DataFrame: x_data (C14 age), y_data (C14 age sigma), fm, fm_sig
     """
-
-    titel = 'precision of C14 ages'
-    logger.info('plot -- creating plot: ' + titel)
-
     query = """ select target_t.c14_age AS x_data, target_t.c14_age_sig AS y_data, fm, fm_sig
                 from target_t
                 INNER JOIN sample_t ON target_t.sample_nr=sample_t.sample_nr
@@ -329,7 +374,26 @@ def plot_age_precision() -> object:
                 AND target_t.c14_age < 15000
                 AND target_t.C14_age >0
                 AND target_t.c14_age_sig < 100"""
-    dataframe = mydb.querydb(query)
+    return mydb.querydb(query)
+
+
+def plot_age_precision(dataframe: pandas.DataFrame = None) -> object:
+    """
+    create a plot age precision data
+    use the rows from two database queries (function: query_db) in order to plot the data;
+
+    Args:
+        dataframe: result of query_age_precision(), the database is queried if not given
+
+    Returns:
+        None
+    """
+
+    titel = 'precision of C14 ages'
+    logger.info('plot -- creating plot: ' + titel)
+
+    if dataframe is None:
+        dataframe = query_age_precision()
 
     # if enough data where provided, do the math and create the plot
     if (dataframe is not None) > 0:
@@ -391,18 +455,13 @@ def plot_age_precision() -> object:
 ####################################################################################
 # plot oxas stdev per magazine
 #####################################################################################
-def plot_oxas_stdev_mag() -> object:
+def query_oxas_stdev_mag() -> pandas.DataFrame:
     """
-    create a plot age precision data
-    use the rows from two database queries (function: query_db) in order to plot the data;
+    query the database for the stdev of the oxas per magazine
 
     Returns:
-        None
+        DataFrame: magazine, type, count, y_data (stdev fm), y_data2 (stdev dc13)
     """
-
-    titel = 'oxas stdev per magazine 2014 - 2021'
-    logger.info('plot -- creating plot: ' + titel)
-
     query = """SELECT magazine, s.type, count(t.fm) AS count, STD(t.fm) AS y_data, STD(t.dc13) AS y_data2
                       FROM target_t t
                       INNER JOIN sample_t s ON t.sample_nr=s.sample_nr
@@ -419,7 +478,26 @@ def plot_oxas_stdev_mag() -> object:
                       GROUP BY t.magazine, s.type
                       HAVING count(t.fm) > 1 AND STD(t.fm) < 0.01
                       ORDER BY magazine"""
-    dataframe = mydb.querydb(query)
+    return mydb.querydb(query)
+
+
+def plot_oxas_stdev_mag(dataframe: pandas.DataFrame = None) -> object:
+    """
+    create a plot age precision data
+    use the rows from two database queries (function: query_db) in order to plot the data;
+
+    Args:
+        dataframe: result of query_oxas_stdev_mag(), the database is queried if not given
+
+    Returns:
+        None
+    """
+
+    titel = 'oxas stdev per magazine 2014 - 2021'
+    logger.info('plot -- creating plot: ' + titel)
+
+    if dataframe is None:
+        dataframe = query_oxas_stdev_mag()
 
     # if enough data where provided, do the math and create the plot
     if (dataframe is not None) > 0:
@@ -505,18 +583,13 @@ def plot_oxas_stdev_mag() -> object:
 ####################################################################################
 # plot age distribution
 #####################################################################################
-def plot_age_hist() -> object:
+def query_age_hist() -> pandas.DataFrame:
     """
-    create a histogram of the age distribution of arch samples
-    use the rows from two database queries (function: query_db) in order to plot the data;
+    query the database for the C14 ages of "arch" samples
 
     Returns:
-        None
+        DataFrame: x_data (C14 age)
     """
-
-    titel = 'ages of "arch" samples (from 2008 on)'
-    logger.info('plot -- creating plot: ' + titel)
-
     query = """SELECT sample_t.c14_age AS x_data
                 FROM sample_t
                 INNER JOIN target_t ON sample_t.sample_nr = target_t.sample_nr
@@ -526,7 +599,26 @@ def plot_age_hist() -> object:
                 AND sample_t.c14_age > -200
                 # AND sample_t.material = 'bone'
                 AND magazine LIKE 'MA%' """
-    dataframe = mydb.querydb(query)
+    return mydb.querydb(query)
+
+
+def plot_age_hist(dataframe: pandas.DataFrame = None) -> object:
+    """
+    create a histogram of the age distribution of arch samples
+    use the rows from two database queries (function: query_db) in order to plot the data;
+
+    Args:
+        dataframe: result of query_age_hist(), the database is queried if not given
+
+    Returns:
+        None
+    """
+
+    titel = 'ages of "arch" samples (from 2008 on)'
+    logger.info('plot -- creating plot: ' + titel)
+
+    if dataframe is None:
+        dataframe = query_age_hist()
 
     # if enough data where provided, do the math and create the plot
     if (dataframe is not None) > 0:
@@ -580,18 +672,13 @@ def plot_age_hist() -> object:
 ####################################################################################
 # plot material distribution
 #####################################################################################
-def plot_material() -> object:
+def query_material() -> pandas.DataFrame:
     """
-    create a pyplot of the distribution of materials
-    use the rows from two database queries (function: query_db) in order to plot the data;
+    query the database for the number of samples per material and year
 
     Returns:
-        None
+        DataFrame: label (material), year, y_data (number of samples)
     """
-
-    titel = 'sample material'
-    logger.info('plot -- creating plot: ' + titel)
-
     query = """SELECT material AS label, year(graphitized) AS year, count(target_t.sample_nr) as y_data
                 FROM sample_t
                 INNER JOIN target_t ON sample_t.sample_nr = target_t.sample_nr
@@ -600,7 +687,26 @@ def plot_material() -> object:
                 AND sample_t.c14_age IS NOT NULL
                 AND magazine LIKE 'MA%'
                 GROUP BY material, year(graphitized)"""
-    dataframe = mydb.querydb(query)
+    return mydb.querydb(query)
+
+
+def plot_material(dataframe: pandas.DataFrame = None) -> object:
+    """
+    create a pyplot of the distribution of materials
+    use the rows from two database queries (function: query_db) in order to plot the data;
+
+    Args:
+        dataframe: result of query_material(), the database is queried if not given
+
+    Returns:
+        None
+    """
+
+    titel = 'sample material'
+    logger.info('plot -- creating plot: ' + titel)
+
+    if dataframe is None:
+        dataframe = query_material()
 
     # if enough data where provided, do the math and create the plot
     if (dataframe is not None) > 0:
@@ -675,17 +781,13 @@ def plot_material() -> object:
 ####################################################################################
 # plot various turnaround times as histogram
 #####################################################################################
-def plot_turnaround() -> object:
+def ask_turnaround_magazine() -> str:
     """
-    create histograms of the turnaround times of samples
-    in_date->prep_end, prep_end->graphitized, graphitized->out_date, in_date->out_date,
-    use the rows from two database queries (function: query_db) in order to plot the data;
+    dialog to ask for the year of the magazines used in the turnaround plot
 
     Returns:
-        None
+        str: search phrase for the magazine names, e.g. 'MA21%'
     """
-
-    # dialog to ask for the magazine year
     # calculate todays year as a default year
     now = datetime.datetime.now()
     num, ok = QInputDialog.getInt(None, "Year of Measurement", "enter year (2-digits)", now.year - 2000, 10, 50, 1)
@@ -695,10 +797,30 @@ def plot_turnaround() -> object:
     else:
         search_mag = 'MA16%'
         logger.info('dialog (year) -- not ok, use default: ' + search_mag)
+    return search_mag
 
-    titel = 'turnaround (' + search_mag + ') in -> graph'
-    logger.info('plot -- creating plot: ' + titel)
 
+def ask_turnaround_params() -> dict:
+    """
+    ask for the parameters of the turnaround plot
+
+    Returns:
+        dict: keyword arguments for query_turnaround and plot_turnaround
+    """
+    return {'search_mag': ask_turnaround_magazine()}
+
+
+def query_turnaround(search_mag: str) -> pandas.DataFrame:
+    """
+    query the database for the turnaround times of the samples measured in magazines matching search_mag
+
+    Args:
+        search_mag: search phrase for the magazine names, e.g. 'MA21%'
+
+    Returns:
+        DataFrame: sample_nr, in_date, prep_end, graphitized, out_date and the durations in days
+        inprep_data, prepgraph_data, graphout_data, inout_data
+    """
     query = """ select target_t.sample_nr, project_t.in_date, preparation_t.prep_end, target_t.graphitized, project_t.out_date,
                 TIMESTAMPDIFF(day, project_t.in_date, preparation_t.prep_end) AS inprep_data,
                 TIMESTAMPDIFF(day, preparation_t.prep_end, target_t.graphitized) AS prepgraph_data,
@@ -719,7 +841,7 @@ def plot_turnaround() -> object:
                 AND project_t.in_date IS NOT NULL
                 AND preparation_t.prep_end IS NOT NULL
                 AND project_t.out_date IS NOT NULL
-                AND target_t.magazine LIKE "{0}"
+                AND target_t.magazine LIKE %s
                 AND target_t.c14_age IS NOT NULL
                 AND TIMESTAMPDIFF(day, project_t.in_date, preparation_t.prep_end) BETWEEN 0 AND 200
                 AND TIMESTAMPDIFF(day, preparation_t.prep_end, target_t.graphitized) BETWEEN 0 AND 80
@@ -727,11 +849,34 @@ def plot_turnaround() -> object:
                 AND TIMESTAMPDIFF(day, project_t.in_date, project_t.out_date) BETWEEN 0 AND 200
                 ORDER BY target_t.sample_nr
                 """
-    # insert search phrase into query string
-    query_formatted = query.format(search_mag)
-    logger.debug(query_formatted)
+    # the search phrase is passed as a parameter of the query, it may come from the web app
+    logger.debug('search_mag = ' + str(search_mag))
+    return mydb.querydb(query, params=(search_mag,))
+
+
+def plot_turnaround(dataframe: pandas.DataFrame = None, search_mag: str = None) -> object:
+    """
+    create histograms of the turnaround times of samples
+    in_date->prep_end, prep_end->graphitized, graphitized->out_date, in_date->out_date,
+    use the rows from two database queries (function: query_db) in order to plot the data;
+
+    Args:
+        dataframe: result of query_turnaround(), the database is queried if not given
+        search_mag: search phrase for the magazine names, a dialog asks for the year if not given
+
+    Returns:
+        None
+    """
+
+    # dialog to ask for the magazine year
+    if search_mag is None:
+        search_mag = ask_turnaround_magazine()
+
+    titel = 'turnaround (' + search_mag + ') in -> graph'
+    logger.info('plot -- creating plot: ' + titel)
 
-    dataframe = mydb.querydb(query_formatted)
+    if dataframe is None:
+        dataframe = query_turnaround(search_mag)
 
     # if enough data where provided, do the math and create the plot
     if (dataframe is not None) > 0:
@@ -832,11 +977,30 @@ def plot_turnaround() -> object:
 ####################################################################################
 # plot number of express samples per year
 #####################################################################################
-def plot_express_samples() -> object:
+def query_express_samples() -> pandas.DataFrame:
+    """
+    query the database for the number of express samples per year
+
+    Returns:
+        DataFrame: year, y_data (number of express samples)
+    """
+    query = """SELECT YEAR(in_date) AS year, count(sample_nr) AS y_data
+                       FROM sample_t
+                       INNER JOIN project_t ON sample_t.project_nr=project_t.project_nr
+                       WHERE user_label like '%EIL%'
+                       GROUP BY year
+                       HAVING year > '2010'"""
+    return mydb.querydb(query)
+
+
+def plot_express_samples(dataframe: pandas.DataFrame = None) -> object:
     """
     create a histogram of the number of express samples per year
     use the rows from two database queries (function: query_db) in order to plot the data;
 
+    Args:
+        dataframe: result of query_express_samples(), the database is queried if not given
+
     Returns:
         None
     """
@@ -844,13 +1008,8 @@ def plot_express_samples() -> object:
     titel = 'number of received express samples'
     logger.info('plot -- creating plot: ' + titel)
 
-    query = """SELECT YEAR(in_date) AS year, count(sample_nr) AS y_data
-                       FROM sample_t
-                       INNER JOIN project_t ON sample_t.project_nr=project_t.project_nr
-                       WHERE user_label like '%EIL%'
-                       GROUP BY year
-                       HAVING year > '2010'"""
-    dataframe = mydb.querydb(query)
+    if dataframe is None:
+        dataframe = query_express_samples()
 
     # if enough data where provided, do the math and create the plot
     if (dataframe is not None) > 0:
@@ -905,18 +1064,13 @@ def plot_express_samples() -> object:
 ####################################################################################
 # plot bone collagen distribution
 #####################################################################################
-def plot_bone_collagen() -> object:
+def query_bone_collagen() -> pandas.DataFrame:
     """
-    create a histogram of the collagen distribution of bone samples
-    use the rows from two database queries (function: query_db) in order to plot the data;
+    query the database for the collagen yield of bone samples
 
     Returns:
-        None
+        DataFrame: sample_nr, material, weight_start, weight_end, y_data (collagen %)
     """
-
-    titel = 'bone collagen content (all years > 2010)'
-    logger.info('plot -- creating plot: ' + titel)
-
     query = """SELECT sample_t.sample_nr, sample_t.material, preparation_t.weight_start, preparation_t.weight_end, (preparation_t.weight_end / preparation_t.weight_start * 100) AS y_data
                FROM sample_t
                INNER JOIN preparation_t ON sample_t.sample_nr = preparation_t.sample_nr
@@ -926,7 +1080,26 @@ def plot_bone_collagen() -> object:
                AND preparation_t.weight_start > 0
                AND (preparation_t.weight_end / preparation_t.weight_start) < 0.2
                AND year(preparation_t.prep_end) > '2010'"""
-    dataframe = mydb.querydb(query)
+    return mydb.querydb(query)
+
+
+def plot_bone_collagen(dataframe: pandas.DataFrame = None) -> object:
+    """
+    create a histogram of the collagen distribution of bone samples
+    use the rows from two database queries (function: query_db) in order to plot the data;
+
+    Args:
+        dataframe: result of query_bone_collagen(), the database is queried if not given
+
+    Returns:
+        None
+    """
+
+    titel = 'bone collagen content (all years > 2010)'
+    logger.info('plot -- creating plot: ' + titel)
+
+    if dataframe is None:
+        dataframe = query_bone_collagen()
 
     # if enough data where provided, do the math and create the plot
     if (dataframe is not None) > 0:
@@ -984,20 +1157,23 @@ def plot_bone_collagen() -> object:
 ####################################################################################
 # plot age precision vs time for different C14 ages
 #####################################################################################
-def plot_age_precision_time() -> object:
-    """
-    create plots of age precision over time for various time intervals
-    use the rows from two database queries (function: query_db) in order to plot the data;
+# column of the daily overviews (number of targets of the day), the exports get all rows instead
+OVERVIEW_COLUMN = 'targets'
 
+
+def is_overview(dataframe: pandas.DataFrame) -> bool:
+    """
     Returns:
-        None
+        bool: True if the DataFrame holds the daily means of a time plot (e.g. query_MAG_params) and
+        not the single targets (e.g. query_MAG_params_full)
     """
+    return OVERVIEW_COLUMN in dataframe.columns
 
-    titel = 'precison of C14 ages vs time'
-    logger.info('plot -- creating plot: ' + titel)
 
-    query = """SELECT p.project_nr, p.user_nr, u.last_name, t.sample_nr, t.graphitized AS x_data, t.c14_age AS c14_age, t.c14_age_sig AS y_data
-               FROM target_t t
+# C14 age ranges (lower and upper limit, both excluded) of the age precision plot
+C14_AGE_RANGES = [(1000, 5000), (5000, 10000), (10000, 20000), (20000, 40000)]
+# targets of the age precision plot
+AGE_PRECISION_TARGETS = """FROM target_t t
                INNER JOIN sample_t s ON t.sample_nr=s.sample_nr
                INNER JOIN project_t p ON s.project_nr=p.project_nr
                INNER JOIN user_t u ON p.user_nr=u.user_nr
@@ -1005,12 +1181,90 @@ def plot_age_precision_time() -> object:
                AND t.c14_age IS NOT NULL
                AND t.c14_age_sig < 100
                AND t.graphitized > '2011-01-01'"""
-    dataframe = mydb.querydb(query)
+# the single targets of the age precision plot
+AGE_PRECISION_ROWS = """SELECT p.project_nr, p.user_nr, u.last_name, t.sample_nr, t.graphitized AS x_data, t.c14_age AS c14_age, t.c14_age_sig AS y_data
+               """ + AGE_PRECISION_TARGETS
+
+
+def query_age_precision_time() -> pandas.DataFrame:
+    """
+    query the database for the overview of the C14 age errors over time,
+    the mean of every day and age range (see C14_AGE_RANGES), the single targets are loaded
+    by query_age_precision_time_window when the plot is zoomed in
+
+    Returns:
+        DataFrame: x_data (graphitized), age_range (position in C14_AGE_RANGES + 1), c14_age (mean),
+        y_data (mean C14 age sigma), targets (number of targets)
+    """
+    ranges = ' '.join(['WHEN t.c14_age > %s AND t.c14_age < %s THEN %s'] * len(C14_AGE_RANGES))
+    params = [value for i, (low, high) in enumerate(C14_AGE_RANGES) for value in (low, high, i + 1)]
+    query = ("""SELECT DATE(t.graphitized) AS x_data, CASE """ + ranges + """ ELSE 0 END AS age_range,
+               AVG(t.c14_age) AS c14_age, AVG(t.c14_age_sig) AS y_data, COUNT(*) AS targets
+               """ + AGE_PRECISION_TARGETS + """
+               GROUP BY DATE(t.graphitized), age_range
+               HAVING age_range > 0
+               ORDER BY DATE(t.graphitized)""")
+    return mydb.querydb(query, params=params, ttl=mydb.history_ttl)
+
+
+def query_age_precision_time_window(start: datetime.datetime, end: datetime.datetime, age_min: int,
+                                    age_max: int) -> pandas.DataFrame:
+    """
+    query the database for the C14 age errors of the single targets graphitized between start and end
+
+    Args:
+        start: first graphitization date
+        end: last graphitization date
+        age_min: lower limit of the C14 age (excluded)
+        age_max: upper limit of the C14 age (excluded)
+
+    Returns:
+        DataFrame: project_nr, user_nr, last_name, sample_nr, x_data (graphitized), c14_age, y_data (C14 age sigma)
+    """
+    query = (AGE_PRECISION_ROWS + """
+               AND t.graphitized BETWEEN %s AND %s
+               AND t.c14_age > %s
+               AND t.c14_age < %s
+               ORDER BY t.graphitized""")
+    return mydb.querydb(query, params=(start, end, age_min, age_max))
+
+
+def query_age_precision_time_full() -> pandas.DataFrame:
+    """
+    query the database for the C14 age errors of all single targets, for the exports (batch.py, web app)
+
+    Returns:
+        DataFrame: project_nr, user_nr, last_name, sample_nr, x_data (graphitized), c14_age, y_data (C14 age sigma)
+    """
+    return mydb.querydb(AGE_PRECISION_ROWS + """
+               ORDER BY t.graphitized""", ttl=mydb.history_ttl)
+
+
+def plot_age_precision_time(dataframe: pandas.DataFrame = None) -> object:
+    """
+    create plots of age precision over time for various time intervals
+    the interactive plot opens with the daily means, zooming in loads the single targets of the visible dates.
+    The csv and png files of the daily means are saved as age_precision_time_daily
+
+    Args:
+        dataframe: result of query_age_precision_time() (daily means) or query_age_precision_time_full() (all
+                   targets), the daily means are queried if not given
+
+    Returns:
+        None
+    """
+
+    titel = 'precison of C14 ages vs time'
+    logger.info('plot -- creating plot: ' + titel)
+
+    if dataframe is None:
+        dataframe = query_age_precision_time()
 
     # if enough data where provided, do the math and create the plot
     if (dataframe is not None) > 0:
 
         dataframe.dropna(inplace=True)
+        overview = is_overview(dataframe)
 
         # extract data from results of query
         logger.info('plot -- ' + titel + ': preparing data...')
@@ -1052,10 +1306,24 @@ def plot_age_precision_time() -> object:
         sns.despine()
 
         logger.info('plot -- ' + titel + ': creating plot...')
+        # draw at most plot/max_points_per_axis points per axis
         fig, (ax, ax2, ax3) = plt.subplots(ncols=1, nrows=3)
-        df1.plot(ax=ax, x='x_data', y='y_data', style='.', alpha=0.8, label='C14 age = 1000 - 5000 years')
-        df2.plot(ax=ax2, x='x_data', y='y_data', style='.', alpha=0.8, label='C14 age = 5000 - 10000 years')
-        df3.plot(ax=ax3, x='x_data', y='y_data', style='.', alpha=0.8, label='C14 age = 10 000 - 20 000 years')
+        # zooming into the daily means loads the single targets of the visible dates
+        lod = LODController(fig)
+        loaders = [functools.partial(query_age_precision_time_window, age_min=low, age_max=high) if overview else None
+                   for low, high in C14_AGE_RANGES]
+        downsample.downsample_frame(df1, 'x_data', 'y_data').plot(ax=ax, x='x_data', y='y_data', style='.', alpha=0.8,
+                                                               label='C14 age = 1000 - 5000 years')
+        lod.add(ax, ax.get_lines()[-1], df1, 'x_data', 'y_data',
+                loader=loaders[0])
+        downsample.downsample_frame(df2, 'x_data', 'y_data').plot(ax=ax2, x='x_data', y='y_data', style='.', alpha=0.8,
+                                                               label='C14 age = 5000 - 10000 years')
+        lod.add(ax2, ax2.get_lines()[-1], df2, 'x_data', 'y_data',
+                loader=loaders[1])
+        downsample.downsample_frame(df3, 'x_data', 'y_data').plot(ax=ax3, x='x_data', y='y_data', style='.', alpha=0.8,
+                                                               label='C14 age = 10 000 - 20 000 years')
+        lod.add(ax3, ax3.get_lines()[-1], df3, 'x_data', 'y_data',
+                loader=loaders[2])
         # df4.plot(ax=ax4, x='x_data', y='y_data', style='.', alpha=0.8, label='C14 age = 20 000 - 30 000 years')
 
         # ax.set_xlim(0, df1['x_data'].max())
@@ -1096,7 +1364,7 @@ def plot_age_precision_time() -> object:
         plt.show()
 
         logger.info('plot -- ' + titel + ': saving figure to disk')
-        path = 'pics/age_precision_time'
+        path = 'pics/age_precision_time' + ('_daily' if overview else '')
         fig.savefig(path + '.png', dpi=600)
         dataframe.to_csv(path + '.csv')
 
@@ -1110,10 +1378,82 @@ def plot_age_precision_time() -> object:
 ####################################################################################
 # plot MAG parameters (pressure, H2/CO2 ratio etc etc)
 #####################################################################################
-def plot_MAG_params() -> object:
+# Oxa2 targets graphitized with MAG, the type pattern is the first parameter
+MAG_TARGETS = """FROM target_t t
+               INNER JOIN sample_t s ON t.sample_nr=s.sample_nr
+               WHERE graphitized IS NOT NULL
+               AND t.fm IS NOT NULL
+               AND t.hydro_init IS NULL
+               AND (co2_final-co2_init)/co2_init > 1
+               AND s.type LIKE %s
+               AND t.graphitized > '2013-01-01'"""
+# the single targets of the MAG plot
+MAG_ROWS = """SELECT t.sample_nr, prep_nr, target_nr, fm, co2_init, co2_final, hydro_final, dc13, graphitized,
+               (co2_final-co2_init)/co2_init AS H2FactorMAG
+               """ + MAG_TARGETS
+
+
+def query_MAG_params() -> pandas.DataFrame:
+    """
+    query the database for the overview of the graphitization parameters of Oxa2 targets graphitized with MAG,
+    the mean of every day, the single targets are loaded by query_MAG_params_window when the plot is zoomed in
+
+    Returns:
+        DataFrame: graphitized, fm, co2_init, co2_final, hydro_final, dc13, H2FactorMAG (means), targets (number of
+        targets)
+    """
+    # distinguish between AGE and MAG by using hydro_init
+    # hydro_init is NULL for MAG
+
+    # data for H2/CO2 ratio, one mean per day
+    query = ("""SELECT DATE(graphitized) AS graphitized, AVG(fm) AS fm, AVG(co2_init) AS co2_init,
+               AVG(co2_final) AS co2_final, AVG(hydro_final) AS hydro_final, AVG(dc13) AS dc13,
+               AVG((co2_final-co2_init)/co2_init) AS H2FactorMAG, COUNT(*) AS targets
+               """ + MAG_TARGETS + """
+               GROUP BY DATE(graphitized)
+               ORDER BY DATE(graphitized)""")
+    return mydb.querydb(query, params=('%oxa2%',), ttl=mydb.history_ttl, raw=True)
+
+
+def query_MAG_params_window(start: datetime.datetime, end: datetime.datetime) -> pandas.DataFrame:
+    """
+    query the database for the graphitization parameters of the single Oxa2 targets graphitized with MAG
+    between start and end
+
+    Args:
+        start: first graphitization date
+        end: last graphitization date
+
+    Returns:
+        DataFrame: sample_nr, prep_nr, target_nr, fm, co2_init, co2_final, hydro_final, dc13, graphitized, H2FactorMAG
+    """
+    query = (MAG_ROWS + """
+               AND t.graphitized BETWEEN %s AND %s
+               order by graphitized asc""")
+    return mydb.querydb(query, params=('%oxa2%', start, end), raw=True)
+
+
+def query_MAG_params_full() -> pandas.DataFrame:
+    """
+    query the database for the graphitization parameters of all single Oxa2 targets graphitized with MAG,
+    for the exports (batch.py, web app)
+
+    Returns:
+        DataFrame: sample_nr, prep_nr, target_nr, fm, co2_init, co2_final, hydro_final, dc13, graphitized, H2FactorMAG
+    """
+    return mydb.querydb(MAG_ROWS + """
+               order by sample_nr asc""", params=('%oxa2%',), ttl=mydb.history_ttl, raw=True)
+
+
+def plot_MAG_params(dataframe: pandas.DataFrame = None) -> object:
     """
     create plots of various parameters regarding the graphitization using AGE for Oxa2
     e.g. pressures, H2/CO2 ratio, ...
+    the interactive plot opens with the daily means, their csv and png files are saved as MAG_params_daily
+
+    Args:
+        dataframe: result of query_MAG_params() (daily means) or query_MAG_params_full() (all targets),
+                   the daily means are queried if not given
 
     Returns:
         None
@@ -1122,33 +1462,18 @@ def plot_MAG_params() -> object:
     titel = 'MAG Parameters (Oxa2)'
     logger.info('plot -- creating plot: ' + titel)
 
-    # distinguish between AGE and MAG by using hydro_init
-    # hydro_init is NULL for MAG
-
-    # data for H2/CO2 ratio
-    query1 = """SELECT t.sample_nr, prep_nr, target_nr, fm, co2_init, co2_final, hydro_final, dc13, graphitized,
-               (co2_final-co2_init)/co2_init AS H2FactorMAG
-               FROM target_t t
-               INNER JOIN sample_t s ON t.sample_nr=s.sample_nr
-               WHERE graphitized IS NOT NULL
-               AND t.fm IS NOT NULL
-               AND t.hydro_init IS NULL
-               AND (co2_final-co2_init)/co2_init > 1
-               AND s.type LIKE '%oxa2%'
-               AND t.graphitized > '2013-01-01'
-               order by sample_nr asc"""
-    dataframe1 = mydb.querydb(query1)
+    if dataframe is None:
+        dataframe = query_MAG_params()
 
     # if enough data where provided, do the math and create the plot
-    if (dataframe1 is not None) > 0:
-        dataframe1.dropna(inplace=True)
+    if (dataframe is not None) > 0:
+        dataframe.dropna(inplace=True)
         # extract data from results of query
         logger.info('plot -- ' + titel + ': preparing data...')
 
         # since there are no x-data, generate those from the number of rows
-        # xdata1 = list(range(len(dataframe1.index)))
+        # xdata1 = list(range(len(dataframe.index)))
         # xdata2 = list(range(len(dataframe2.index)))
-        xdata1 = dates.date2num(dataframe1.graphitized)
 
         # create plot
         # set plot styles using seaborn
@@ -1157,25 +1482,35 @@ def plot_MAG_params() -> object:
         sns.set_palette('Set2')
         sns.despine()
 
+        # draw at most plot/max_points_per_axis points per axis
+        drawn = {name: downsample.downsample_frame(dataframe, 'graphitized', name)
+                 for name in ('H2FactorMAG', 'hydro_final', 'co2_init')}
+
         logger.info('plot -- ' + titel + ': creating plot...')
         fig, (ax, ax2, ax3) = plt.subplots(ncols=1, nrows=3)
-        ax.scatter(x=xdata1, y='H2FactorMAG', data=dataframe1, label='H2/CO2 ratio', color='green',
-                   alpha=0.5)
+        # zooming into the daily means loads the single targets of the visible dates
+        lod = LODController(fig)
+        loader = query_MAG_params_window if is_overview(dataframe) else None
+        points = ax.scatter(x=dates.date2num(drawn['H2FactorMAG'].graphitized), y='H2FactorMAG',
+                            data=drawn['H2FactorMAG'], label='H2/CO2 ratio', color='green', alpha=0.5)
+        lod.add(ax, points, dataframe, 'graphitized', 'H2FactorMAG', loader=loader)
         ax.xaxis_date()  # set x axis to date format
         ax.set_title(titel)
         ax.set_ylabel('H2/CO2 ratio')
         ax.grid(True)
         ax.legend(loc='upper left')
 
-        ax2.scatter(x=xdata1, y='hydro_final', data=dataframe1, label='final presure H2', color='green',
-                    alpha=0.5)
+        points = ax2.scatter(x=dates.date2num(drawn['hydro_final'].graphitized), y='hydro_final',
+                             data=drawn['hydro_final'], label='final presure H2', color='green', alpha=0.5)
+        lod.add(ax2, points, dataframe, 'graphitized', 'hydro_final', loader=loader)
         ax2.xaxis_date()
         ax2.set_ylabel('final pressure H2')
         ax2.grid(True)
         ax2.legend(loc='upper left')
 
-        ax3.scatter(x=xdata1, y='co2_init', data=dataframe1, label='CO2 initial', color='green',
-                    alpha=0.5)
+        points = ax3.scatter(x=dates.date2num(drawn['co2_init'].graphitized), y='co2_init',
+                             data=drawn['co2_init'], label='CO2 initial', color='green', alpha=0.5)
+        lod.add(ax3, points, dataframe, 'graphitized', 'co2_init', loader=loader)
         ax3.xaxis_date()
         ax3.set_xlabel('Graph Date')
         ax3.set_ylabel('CO2 initial')
@@ -1187,9 +1522,11 @@ def plot_MAG_params() -> object:
         plt.show()
 
         logger.info('plot -- ' + titel + ': saving figure to disk')
-        path = 'pics/MAG_params'
+        path = 'pics/MAG_params' + ('_daily' if is_overview(dataframe) else '')
         fig.savefig(path + '.png', dpi=600)
-        dataframe1.to_csv(path + '.csv')
+        dataframe.to_csv(path + '.csv')
+
+        return fig
 
     else:
         # no records where given to the function
@@ -1199,10 +1536,83 @@ def plot_MAG_params() -> object:
 ####################################################################################
 # plot AGE parameters (pressure, H2/CO2 ratio etc etc)
 #####################################################################################
-def plot_AGE_params() -> object:
+# Oxa2 targets graphitized with AGE, the type pattern is the first parameter
+AGE_TARGETS = """FROM target_t t
+               INNER JOIN sample_t s ON t.sample_nr=s.sample_nr
+               WHERE graphitized IS NOT NULL
+               AND t.fm IS NOT NULL
+               AND t.hydro_init IS NOT NULL
+               AND (hydro_init-(co2_final*0.54))/(co2_final*0.54) > 1
+               AND s.type LIKE %s
+               AND t.graphitized > '2013-01-01'"""
+# the single targets of the AGE plot
+AGE_ROWS = """SELECT t.sample_nr, prep_nr, target_nr, fm, co2_init, co2_final, hydro_init, hydro_final, dc13, graphitized,
+               (hydro_init-(co2_final*0.54))/(co2_final*0.54) AS H2FactorAGE
+               """ + AGE_TARGETS
+
+
+def query_AGE_params() -> pandas.DataFrame:
+    """
+    query the database for the overview of the graphitization parameters of Oxa2 targets graphitized with AGE,
+    the mean of every day, the single targets are loaded by query_AGE_params_window when the plot is zoomed in
+
+    Returns:
+        DataFrame: graphitized, fm, co2_init, co2_final, hydro_init, hydro_final, dc13, H2FactorAGE (means),
+        targets (number of targets)
+    """
+    # distinguish between AGE and MAG by using hydro_init
+    # hydro_init is NULL for MAG and NOT NULL for AGE
+
+    # data for H2/CO2 ratio, one mean per day
+    query = ("""SELECT DATE(graphitized) AS graphitized, AVG(fm) AS fm, AVG(co2_init) AS co2_init,
+               AVG(co2_final) AS co2_final, AVG(hydro_init) AS hydro_init, AVG(hydro_final) AS hydro_final,
+               AVG(dc13) AS dc13, AVG((hydro_init-(co2_final*0.54))/(co2_final*0.54)) AS H2FactorAGE,
+               COUNT(*) AS targets
+               """ + AGE_TARGETS + """
+               GROUP BY DATE(graphitized)
+               ORDER BY DATE(graphitized)""")
+    return mydb.querydb(query, params=('%oxa2%',), ttl=mydb.history_ttl, raw=True)
+
+
+def query_AGE_params_window(start: datetime.datetime, end: datetime.datetime) -> pandas.DataFrame:
+    """
+    query the database for the graphitization parameters of the single Oxa2 targets graphitized with AGE
+    between start and end
+
+    Args:
+        start: first graphitization date
+        end: last graphitization date
+
+    Returns:
+        DataFrame: sample_nr, prep_nr, target_nr, fm, co2_init, co2_final, hydro_init, hydro_final, dc13, graphitized, H2FactorAGE
+    """
+    query = (AGE_ROWS + """
+               AND t.graphitized BETWEEN %s AND %s
+               order by graphitized asc""")
+    return mydb.querydb(query, params=('%oxa2%', start, end), raw=True)
+
+
+def query_AGE_params_full() -> pandas.DataFrame:
+    """
+    query the database for the graphitization parameters of all single Oxa2 targets graphitized with AGE,
+    for the exports (batch.py, web app)
+
+    Returns:
+        DataFrame: sample_nr, prep_nr, target_nr, fm, co2_init, co2_final, hydro_init, hydro_final, dc13, graphitized, H2FactorAGE
+    """
+    return mydb.querydb(AGE_ROWS + """
+               order by sample_nr asc""", params=('%oxa2%',), ttl=mydb.history_ttl, raw=True)
+
+
+def plot_AGE_params(dataframe: pandas.DataFrame = None) -> object:
     """
     create plots of various parameters regarding the graphitization using AGE for Oxa2
     e.g. pressures, H2/CO2 ratio, ...
+    the interactive plot opens with the daily means, their csv and png files are saved as AGE_Params_daily
+
+    Args:
+        dataframe: result of query_AGE_params() (daily means) or query_AGE_params_full() (all targets),
+                   the daily means are queried if not given
 
     Returns:
         None
@@ -1211,33 +1621,18 @@ def plot_AGE_params() -> object:
     titel = 'AGE Parameters (Oxa2)'
     logger.info('plot -- creating plot: ' + titel)
 
-    # distinguish between AGE and MAG by using hydro_init
-    # hydro_init is NULL for MAG and NOT NULL for AGE
-
-    # data for H2/CO2 ratio
-    query1 = """SELECT t.sample_nr, prep_nr, target_nr, fm, co2_init, co2_final, hydro_init, hydro_final, dc13, graphitized,
-               (hydro_init-(co2_final*0.54))/(co2_final*0.54) AS H2FactorAGE
-               FROM target_t t
-               INNER JOIN sample_t s ON t.sample_nr=s.sample_nr
-               WHERE graphitized IS NOT NULL
-               AND t.fm IS NOT NULL
-               AND t.hydro_init IS NOT NULL
-               AND (hydro_init-(co2_final*0.54))/(co2_final*0.54) > 1
-               AND s.type LIKE '%oxa2%'
-               AND t.graphitized > '2013-01-01'
-               order by sample_nr asc"""
-    dataframe1 = mydb.querydb(query1)
+    if dataframe is None:
+        dataframe = query_AGE_params()
 
     # if enough data where provided, do the math and create the plot
-    if (dataframe1 is not None) > 0:
-        dataframe1.dropna(inplace=True)
+    if (dataframe is not None) > 0:
+        dataframe.dropna(inplace=True)
         # extract data from results of query
         logger.info('plot -- ' + titel + ': preparing data...')
 
         # since there are no x-data, generate those from the number of rows
-        # xdata1 = list(range(len(dataframe1.index)))
+        # xdata1 = list(range(len(dataframe.index)))
         # xdata2 = list(range(len(dataframe2.index)))
-        xdata1 = dates.date2num(dataframe1.graphitized)
 
         # create plot
         # set plot styles using seaborn
@@ -1246,25 +1641,35 @@ def plot_AGE_params() -> object:
         sns.set_palette('Set2')
         sns.despine()
 
+        # draw at most plot/max_points_per_axis points per axis
+        drawn = {name: downsample.downsample_frame(dataframe, 'graphitized', name)
+                 for name in ('H2FactorAGE', 'hydro_final', 'co2_init')}
+
         logger.info('plot -- ' + titel + ': creating plot...')
         fig, (ax, ax2, ax3) = plt.subplots(ncols=1, nrows=3)
-        ax.scatter(x=xdata1, y='H2FactorAGE', data=dataframe1, label='H2/CO2 ratio', color='green',
-                   alpha=0.5)
+        # zooming into the daily means loads the single targets of the visible dates
+        lod = LODController(fig)
+        loader = query_AGE_params_window if is_overview(dataframe) else None
+        points = ax.scatter(x=dates.date2num(drawn['H2FactorAGE'].graphitized), y='H2FactorAGE',
+                            data=drawn['H2FactorAGE'], label='H2/CO2 ratio', color='green', alpha=0.5)
+        lod.add(ax, points, dataframe, 'graphitized', 'H2FactorAGE', loader=loader)
         ax.xaxis_date()  # set x axis to date format
         ax.set_title(titel)
         ax.set_ylabel('H2/CO2 ratio')
         ax.grid(True)
         ax.legend(loc='upper left')
 
-        ax2.scatter(x=xdata1, y='hydro_final', data=dataframe1, label='final pressure H2', color='green',
-                    alpha=0.5)
+        points = ax2.scatter(x=dates.date2num(drawn['hydro_final'].graphitized), y='hydro_final',
+                             data=drawn['hydro_final'], label='final pressure H2', color='green', alpha=0.5)
+        lod.add(ax2, points, dataframe, 'graphitized', 'hydro_final', loader=loader)
         ax2.xaxis_date()
         ax2.set_ylabel('final pressure H2')
         ax2.grid(True)
         ax2.legend(loc='upper left')
 
-        ax3.scatter(x=xdata1, y='co2_init', data=dataframe1, label='CO2 initial', color='green',
-                    alpha=0.5)
+        points = ax3.scatter(x=dates.date2num(drawn['co2_init'].graphitized), y='co2_init',
+                             data=drawn['co2_init'], label='CO2 initial', color='green', alpha=0.5)
+        lod.add(ax3, points, dataframe, 'graphitized', 'co2_init', loader=loader)
         ax3.xaxis_date()
         ax3.set_xlabel('Graph Date')
         ax3.set_ylabel('CO initial')
@@ -1276,9 +1681,11 @@ def plot_AGE_params() -> object:
         plt.show()
 
         logger.info('plot -- ' + titel + ': saving figure to disk')
-        path = 'pics/AGE_Params'
+        path = 'pics/AGE_Params' + ('_daily' if is_overview(dataframe) else '')
         fig.savefig(path + '.png', dpi=600)
-        dataframe1.to_csv(path + '.csv')
+        dataframe.to_csv(path + '.csv')
+
+        return fig
 
     else:
         # no records where given to the function
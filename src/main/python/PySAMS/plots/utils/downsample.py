@@ -0,0 +1,191 @@
+"""
+downsampling of long series for plotting
+
+the QC and stat plots show every target since 2011 as a marker, which are tens of thousands of points
+that are drawn again on every pan and zoom. The functions here pick the points that matter for the eye:
+
+- lttb: Largest-Triangle-Three-Buckets, one point per bucket that spans the largest triangle with
+  its neighbours, keeps the shape of the series and its peaks
+- minmax: the lowest and the highest point of every bucket, keeps all outliers
+- errorbar_envelope: lower and upper end of the error bars per bucket, drawn as a band
+
+all functions return row positions, so the other columns (errors, labels, ...) can be picked too.
+The plot functions opt in with downsample_frame() (config value plot/downsample).
+"""
+
+from config.logging_conf import logger
+import numpy as np
+import pandas
+from config.config import myconfig  # myconfig calss will be loaded here
+
+# set logger name to the name of the module
+logger.name = __name__
+
+
+def enabled() -> bool:
+    """
+    Returns:
+        bool: True if the plot functions should downsample their series (config value plot/downsample)
+    """
+    return myconfig.getboolean('plot', 'downsample', fallback=True)
+
+
+def max_points() -> int:
+    """
+    Returns:
+        int: most points drawn per axis (config value plot/max_points_per_axis)
+    """
+    return myconfig.getint('plot', 'max_points_per_axis', fallback=2000)
+
+
+def as_float(values) -> np.ndarray:
+    """
+    Returns:
+        ndarray: the values as floats, dates as nanoseconds
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]').astype(np.int64).astype(float)
+    if values.dtype.kind == 'O':
+        # e.g. date objects of a query result
+        return as_float(pandas.to_datetime(values))
+    return values.astype(float)
+
+
+def lttb(x, y, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    the first and the last point are kept, the points in between are split into threshold - 2 buckets.
+    Of every bucket the point is kept that spans the largest triangle with the point kept before
+    and the average of the next bucket.
+
+    Args:
+        x: x values, sorted ascending
+        y: y values
+        threshold: number of points to keep
+
+    Returns:
+        ndarray: positions of the kept points, ascending
+    """
+    x = as_float(x)
+    y = as_float(y)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # bucket i holds the positions edges[i] .. edges[i + 1] - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            # the last bucket looks at the last point
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # twice the area of the triangles (a, point, average of the next bucket)
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def bucket_starts(n: int, buckets: int) -> np.ndarray:
+    """
+    Returns:
+        ndarray: first position of every bucket when n points are split into buckets of equal size
+    """
+    return np.unique(np.linspace(0, n, buckets + 1).astype(np.int64)[:-1])
+
+
+def minmax(y, buckets: int) -> np.ndarray:
+    """
+    the lowest and the highest point of every bucket of consecutive points
+
+    Args:
+        y: y values in the order of x
+        buckets: number of buckets
+
+    Returns:
+        ndarray: positions of the kept points, ascending (at most 2 * buckets)
+    """
+    y = as_float(y)
+    n = len(y)
+    if 2 * buckets >= n:
+        return np.arange(n)
+    bucket = np.zeros(n, dtype=np.int64)
+    bucket[bucket_starts(n, buckets)[1:]] = 1
+    bucket = np.cumsum(bucket)
+    # sorted by bucket and y, the first point of a bucket is its minimum and the last its maximum
+    order = np.lexsort((y, bucket))
+    sorted_buckets = bucket[order]
+    first = np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]]
+    last = np.r_[sorted_buckets[1:] != sorted_buckets[:-1], True]
+    return np.unique(np.concatenate([order[first], order[last]]))
+
+
+def errorbar_envelope(x, y, err, buckets: int) -> tuple:
+    """
+    band that covers the error bars of every bucket of consecutive points
+
+    Args:
+        x: x values, sorted ascending
+        y: y values
+        err: errors of y
+        buckets: number of buckets
+
+    Returns:
+        tuple: x (mean of every bucket), lower (lowest y - err) and upper (highest y + err) as ndarrays
+    """
+    x = as_float(x)
+    y = as_float(y)
+    err = as_float(err)
+    starts = bucket_starts(len(x), buckets)
+    counts = np.diff(np.r_[starts, len(x)])
+    centers = np.add.reduceat(x, starts) / counts
+    lower = np.minimum.reduceat(y - err, starts)
+    upper = np.maximum.reduceat(y + err, starts)
+    return centers, lower, upper
+
+
+def downsample_frame(dataframe: pandas.DataFrame, x: str, y, limit: int = None, errors: bool = False):
+    """
+    the rows of a DataFrame that are drawn, if downsampling is enabled
+
+    Args:
+        dataframe: the data, it is sorted by x if it isn't
+        x: name of the x column, None = the row positions
+        y: name of the y column (or list of names, the union of the kept rows of all of them)
+        limit: most rows to keep, default is max_points()
+        errors: True for error bar series, the lowest and highest points of the buckets are kept too
+                (half of the limit goes to lttb, the other half to minmax)
+
+    Returns:
+        DataFrame: the kept rows (the same dataframe if it is small enough or downsampling is disabled)
+    """
+    if limit is None:
+        limit = max_points()
+    if not enabled() or len(dataframe) <= limit:
+        return dataframe
+    if x is not None and not dataframe[x].is_monotonic_increasing:
+        # lttb needs the points in the order of x
+        dataframe = dataframe.sort_values(x, kind='stable')
+    xdata = np.arange(len(dataframe)) if x is None else dataframe[x].to_numpy()
+    names = [y] if isinstance(y, str) else list(y)
+    # every y column gets its share of the limit
+    share = max(3, limit // len(names))
+    positions = []
+    for name in names:
+        if errors:
+            positions.append(lttb(xdata, dataframe[name].to_numpy(), max(3, share // 2)))
+            positions.append(minmax(dataframe[name].to_numpy(), max(1, share // 4)))
+        else:
+            positions.append(lttb(xdata, dataframe[name].to_numpy(), share))
+    positions = np.unique(np.concatenate(positions))
+    logger.debug('downsample: ' + str(len(dataframe)) + ' -> ' + str(len(positions)) + ' rows')
+    return dataframe.iloc[positions]
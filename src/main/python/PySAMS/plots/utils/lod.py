@@ -0,0 +1,251 @@
+"""
+level of detail for time series plots
+
+the time plots open with a coarse overview that the database aggregated (e.g. one mean per day).
+When the x range of an axis changes (zoom, pan), the LODController loads the full rows of the
+visible window with the loader of the series (a query restricted to the window), downsamples
+only those and swaps them into the artists. Zooming back out to the whole range shows the
+overview again. Series without a loader take the visible rows from the DataFrame they were added
+with instead.
+
+the work is done in a background thread after the limits stopped changing for plot/lod_delay ms,
+the artists are updated in the GUI thread by a timer of the canvas:
+
+    lod = LODController(fig)
+    lod.add(ax, ax.scatter(...), overview, 'graphitized', 'H2FactorMAG', loader=query_MAG_params_window)
+
+canvases without timers (Agg, batch renderer) keep the overview.
+"""
+
+from config.logging_conf import logger
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib.dates as dates
+from matplotlib.lines import Line2D
+import numpy as np
+import pandas
+import plots.utils.downsample as downsample
+from config.config import myconfig  # myconfig calss will be loaded here
+
+# set logger name to the name of the module
+logger.name = __name__
+
+# one thread for all plots, a new zoom makes the pending results of the old one obsolete anyway
+_executor = None
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lod')
+    return _executor
+
+
+def enabled() -> bool:
+    """
+    Returns:
+        bool: True if zooming re-reads the visible rows (config value plot/lod)
+    """
+    return myconfig.getboolean('plot', 'lod', fallback=True)
+
+
+class Series:
+    """
+    the rows of one artist, sorted by x
+
+    Args:
+        artist: Line2D or PathCollection (scatter) that shows the rows
+        dataframe: the full result, or the overview if there is a loader
+        x: name of the x column (dates or numbers)
+        y: name of the y column
+        limit: most points drawn, default is downsample.max_points()
+        loader: function(start, end) that returns the full rows (columns x and y) of the x range
+                start .. end, called in the background thread. Dates are passed as datetime.datetime
+    """
+
+    def __init__(self, artist, dataframe: pandas.DataFrame, x: str, y: str, limit: int = None, loader=None):
+        self.artist = artist
+        self.xname = x
+        self.yname = y
+        self.loader = loader
+        self.xraw, self.x, self.y = self.arrays(dataframe)
+        self.dates = self.xraw.dtype.kind in 'MO'
+        self.limit = downsample.max_points() if limit is None else limit
+        # rows that are shown now (xraw, x, y), None = the overview the plot was created with
+        self.shown = None
+
+    def arrays(self, dataframe: pandas.DataFrame) -> tuple:
+        # x as given, x as numbers and y of the rows sorted by x
+        dataframe = dataframe.dropna(subset=[self.xname, self.yname])
+        if not dataframe[self.xname].is_monotonic_increasing:
+            dataframe = dataframe.sort_values(self.xname, kind='stable')
+        xraw = dataframe[self.xname].to_numpy()
+        return xraw, self.to_numbers(xraw), dataframe[self.yname].to_numpy(dtype=float)
+
+    @staticmethod
+    def to_numbers(values: np.ndarray) -> np.ndarray:
+        # the axes limits of date axes are matplotlib date numbers
+        if values.dtype.kind in 'MO':
+            return dates.date2num(pandas.to_datetime(values))
+        return values.astype(float)
+
+    def bounds(self, x0: float, x1: float) -> tuple:
+        """
+        Returns:
+            tuple: the x range x0 .. x1 as it is passed to the loader
+        """
+        if self.dates:
+            # naive datetimes, the database doesn't know time zones
+            return tuple(dates.num2date(value).replace(tzinfo=None) for value in (x0, x1))
+        return x0, x1
+
+    def window(self, x0: float, x1: float, loaded: dict = None):
+        """
+        the rows to draw for the x range x0 .. x1, runs in the background thread
+
+        Args:
+            x0, x1: the visible x range in axes coordinates
+            loaded: results of the loaders of this update by (loader, start, end), series with the same
+                    loader and range share one query
+
+        Returns:
+            tuple: xraw, x and y of the rows, None for the overview
+        """
+        start = np.searchsorted(self.x, x0, side='left')
+        end = np.searchsorted(self.x, x1, side='right')
+        if start == 0 and end == len(self.x):
+            # everything is visible
+            return None
+        if self.loader is not None:
+            key = (self.loader,) + self.bounds(x0, x1)
+            if loaded is None:
+                loaded = {}
+            if key not in loaded:
+                loaded[key] = self.loader(*key[1:])
+            xraw, x, y = self.arrays(loaded[key])
+        else:
+            # one point beyond the edges, so that lines run out of the axes
+            start = max(0, start - 1)
+            end = min(len(self.x), end + 1)
+            xraw, x, y = self.xraw[start:end], self.x[start:end], self.y[start:end]
+        positions = downsample.lttb(x, y, self.limit)
+        return xraw[positions], x[positions], y[positions]
+
+    def show(self, rows):
+        """
+        draw the rows (xraw, x, y) of window(), None = the overview
+        """
+        self.shown = rows
+        if rows is None:
+            positions = downsample.lttb(self.x, self.y, self.limit)
+            rows = self.xraw[positions], self.x[positions], self.y[positions]
+        xraw, x, y = rows
+        if isinstance(self.artist, Line2D):
+            self.artist.set_data(xraw, y)
+        else:
+            self.artist.set_offsets(np.column_stack([x, y]))
+
+
+class LODController:
+    """
+    swaps the rows of the visible x range into the artists of a figure after zooming or panning
+
+    Args:
+        fig: the figure, the controller is kept as fig.lod so it lives as long as the figure
+        delay: ms to wait for the limits to settle, default is plot/lod_delay
+
+    Returns:
+        None
+    """
+
+    def __init__(self, fig, delay: int = None):
+        self.fig = fig
+        fig.lod = self
+        self.series = {}  # axes -> list of Series
+        self.generation = 0  # results of older limits are dropped
+        self.pending = set()  # axes whose limits changed since the last applied update
+        self.future = None
+        if delay is None:
+            delay = myconfig.getint('plot', 'lod_delay', fallback=200)
+        self.delay_timer = fig.canvas.new_timer(interval=delay)
+        self.delay_timer.single_shot = True
+        self.delay_timer.add_callback(self.start_update)
+        self.poll_timer = fig.canvas.new_timer(interval=50)
+        self.poll_timer.add_callback(self.poll)
+
+    def add(self, ax, artist, dataframe: pandas.DataFrame, x: str, y: str, limit: int = None, loader=None):
+        """
+        register an artist of ax that shows the column y over the column x of dataframe
+
+        Args:
+            ax: the axes of the artist
+            artist: Line2D or PathCollection
+            dataframe: the overview if there is a loader, otherwise all rows
+                       (not only the ones the artist was created with)
+            x: name of the x column
+            y: name of the y column
+            limit: most points drawn, default is downsample.max_points()
+            loader: function(start, end) that loads the full rows of the visible range (see Series)
+
+        Returns:
+            LODController: self
+        """
+        if not enabled() or not downsample.enabled():
+            return self
+        if ax not in self.series:
+            self.series[ax] = []
+            ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        self.series[ax].append(Series(artist, dataframe, x, y, limit, loader))
+        return self
+
+    def on_xlim_changed(self, ax):
+        self.pending.add(ax)
+        self.generation += 1
+        # restart the delay, the limits change many times while panning
+        self.delay_timer.stop()
+        self.delay_timer.start()
+
+    def compute(self, generation: int, jobs: list) -> tuple:
+        # runs in the background thread, only reads the arrays of the series and loads the windows
+        loaded = {}
+        return generation, [(series, series.window(x0, x1, loaded)) for series, x0, x1 in jobs]
+
+    def start_update(self):
+        """
+        hand the visible ranges of the changed axes to the background thread
+        """
+        jobs = []
+        for ax in self.pending:
+            x0, x1 = sorted(ax.get_xlim())
+            jobs.extend((series, x0, x1) for series in self.series.get(ax, []))
+        if not jobs:
+            return
+        self.future = executor().submit(self.compute, self.generation, jobs)
+        self.poll_timer.start()
+
+    def poll(self):
+        """
+        apply the result of the background thread when it's ready
+        """
+        if self.future is None or not self.future.done():
+            return
+        self.poll_timer.stop()
+        future, self.future = self.future, None
+        try:
+            generation, results = future.result()
+        except Exception as e:
+            logger.error('LODController: ' + str(e))
+            return
+        if generation != self.generation:
+            # the limits changed again, a newer update follows (with all pending axes)
+            return
+        self.pending = set()
+        changed = False
+        for series, positions in results:
+            if positions is None and series.shown is None:
+                continue
+            series.show(positions)
+            changed = True
+        if changed:
+            logger.debug('LODController: ' + ', '.join('overview' if series.shown is None else str(len(series.shown[0]))
+                                                       for series, _ in results))
+            self.fig.canvas.draw_idle()
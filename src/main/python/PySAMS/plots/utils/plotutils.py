@@ -1,9 +1,176 @@
 from config.logging_conf import logger
+import numpy as np
+import pandas
+from config.config import myconfig  # myconfig calss will be loaded here
 
 # set logger name to the name of the module
 logger.name = __name__
 
 
+# magazine names start with MAyymmdd, the date the magazine was measured
+MAGAZINE_PATTERN = r'^MA(\d{2})(\d{2})(\d{2})'
+
+# first magazines after a source revision, used if the config file has no [revisions] section
+REVISIONS = ['MA141204', 'MA150213', 'MA150507', 'MA150722', 'MA151007', 'MA151112', 'MA160310',
+             'MA160616', 'MA161004', 'MA170117', 'MA170327', 'MA170602', 'MA170727', 'MA170830',
+             'MA171026', 'MA180109', 'MA180405']
+
+
+def get_revisions() -> list:
+    """
+    the source revisions registered in the config file (section revisions, key magazines)
+
+    Returns:
+        list: names of the first magazines after the revisions, sorted
+    """
+    magazines = myconfig.get('revisions', 'magazines', fallback=None)
+    if magazines is None:
+        return list(REVISIONS)
+    return sorted(mag.strip() for mag in magazines.split(',') if mag.strip())
+
+
+def parse_magazine_dates(magazines) -> pandas.Series:
+    """
+    parse the dates out of magazine names (MAyymmdd...)
+
+    Args:
+        magazines: magazine names (list, array or Series)
+
+    Returns:
+        Series: datetime64 dates, NaT for names that don't follow the pattern
+    """
+    names = pandas.Series(magazines, dtype=object).astype(str)
+    parts = names.str.extract(MAGAZINE_PATTERN)
+    return pandas.to_datetime('20' + parts[0] + parts[1] + parts[2], format='%Y%m%d', errors='coerce')
+
+
+def magazine_measdate(magazines) -> pandas.Series:
+    """
+    measurement date of the magazines as text yy-mm-dd (same as the measdate column built by SQL before)
+
+    Args:
+        magazines: magazine names (Series)
+
+    Returns:
+        Series: yy-mm-dd strings, NaN if there is no magazine
+    """
+    magazines = pandas.Series(magazines)
+    names = magazines.astype(str)
+    return (names.str[2:4] + '-' + names.str[4:6] + '-' + names.str[6:8]).where(magazines.notna())
+
+
+class MagazineIndex:
+    """
+    index of the rows of a dataframe by the date of their magazine
+
+    the magazine names are parsed once, the dates are kept sorted so that years,
+    date ranges and revisions are found with a binary search (searchsorted)
+    instead of scanning all magazine names again and again.
+
+    the positions returned are row positions (0..n-1) of the dataframe,
+    use dataframe.index[pos] to get the index labels
+
+    Args:
+        dataframe: dataframe with a magazine column (or the magazine column itself)
+        column: name of the magazine column
+
+    Returns:
+        None
+    """
+
+    def __init__(self, dataframe, column: str = 'magazine'):
+        magazines = dataframe[column] if isinstance(dataframe, pandas.DataFrame) else dataframe
+        self.dates = parse_magazine_dates(magazines).values
+        # stable sort: rows of the same magazine keep their order, NaT goes to the end and is left out
+        order = np.argsort(self.dates, kind='stable')
+        valid = np.count_nonzero(~np.isnat(self.dates))
+        self.order = order[:valid]
+        self.sorted_dates = self.dates[self.order]
+
+    def __len__(self):
+        return len(self.dates)
+
+    def positions_between(self, start, end=None) -> np.ndarray:
+        """
+        Args:
+            start: first date (anything pandas.Timestamp accepts, e.g. '2021-01-01')
+            end: end date (not included), None = open end
+
+        Returns:
+            ndarray: row positions of all magazines measured from start to end, sorted by date
+        """
+        lo = np.searchsorted(self.sorted_dates, np.datetime64(pandas.Timestamp(start)), side='left')
+        if end is None:
+            hi = len(self.sorted_dates)
+        else:
+            hi = np.searchsorted(self.sorted_dates, np.datetime64(pandas.Timestamp(end)), side='left')
+        return self.order[lo:hi]
+
+    def first_position(self, start, end=None):
+        """
+        Returns:
+            int: first row (in the order of the dataframe) measured from start to end, None if there is none
+        """
+        positions = self.positions_between(start, end)
+        if positions.size == 0:
+            return None
+        return int(positions.min())
+
+    def years(self) -> np.ndarray:
+        """
+        Returns:
+            ndarray: year of every row, 0 for rows without a valid magazine name
+        """
+        years = np.zeros(len(self.dates), dtype=np.int64)
+        years[self.order] = self.sorted_dates.astype('datetime64[Y]').astype(np.int64) + 1970
+        return years
+
+    def year_boundaries(self, years: list = None) -> dict:
+        """
+        first row of every year
+
+        Args:
+            years: years to look for, default are all years found in the magazine names
+
+        Returns:
+            dict: year -> row position, years without magazines are left out
+        """
+        if years is None:
+            if len(self.sorted_dates) == 0:
+                return {}
+            first = self.sorted_dates[0].astype('datetime64[Y]').astype(int) + 1970
+            last = self.sorted_dates[-1].astype('datetime64[Y]').astype(int) + 1970
+            years = range(first, last + 1)
+        boundaries = {}
+        for year in years:
+            pos = self.first_position(str(year) + '-01-01', str(year + 1) + '-01-01')
+            if pos is not None:
+                boundaries[year] = pos
+        return boundaries
+
+    def revision_boundaries(self, revisions: list = None) -> dict:
+        """
+        first row measured after every source revision
+
+        Args:
+            revisions: names of the first magazines after the revisions, default is get_revisions()
+
+        Returns:
+            dict: magazine name -> row position, revisions without magazines before the next revision are left out
+        """
+        if revisions is None:
+            revisions = get_revisions()
+        dates = sorted((date, name) for name, date in zip(revisions, parse_magazine_dates(revisions))
+                       if not pandas.isnull(date))
+        boundaries = {}
+        for i, (date, name) in enumerate(dates):
+            end = dates[i + 1][0] if i + 1 < len(dates) else None
+            pos = self.first_position(date, end)
+            if pos is not None:
+                boundaries[name] = pos
+        return boundaries
+
+
 def find_year_positions(dataframe):
     '''
     find in the dataframe the positions where a new year starts using the magazine names
@@ -14,18 +181,10 @@ def find_year_positions(dataframe):
     Returns:
         year_positions: list of all found positions as indices of the dataframe
     '''
-
-    # list of names of the magazines that change with year
-    years = ['MA15', 'MA16', 'MA17', 'MA18', 'MA19', 'MA20', 'MA21']
     year_positions = []
-    for year in years:
-        posdf = dataframe.loc[dataframe['magazine'].str.contains(year), 'magazine']
-        if posdf.size > 0:
-            pos = posdf.index[0]
-        else:
-            pos = 0
-        year_positions.append(pos)
-        logger.info('plot: found position of ' + year + ' at index = ' + str(pos))
+    for year, pos in MagazineIndex(dataframe).year_boundaries().items():
+        year_positions.append(dataframe.index[pos])
+        logger.info('plot: found position of ' + str(year) + ' at index = ' + str(dataframe.index[pos]))
     return year_positions
 
 
@@ -40,23 +199,144 @@ def find_revisions(dataframe):
     Returns:
         revision_positions: list of all found positions as indices of the dataframe
     '''
-
-    # list of names of the magazines that change with year
-    magazines = ['MA141204', 'MA150213', 'MA150507', 'MA150722', 'MA151007', 'MA151112', 'MA160310',
-                 'MA160616', 'MA161004', 'MA170117', 'MA170327', 'MA170602', 'MA170727', 'MA170830',
-                 'MA171026', 'MA180109', 'MA180405']
     revision_positions = []
-    for mag in magazines:
-        posdf = dataframe.loc[dataframe['magazine'].str.contains(mag), 'magazine']
-        if posdf.size > 0:
-            pos = posdf.index[0]
-        else:
-            pos = 0
-        revision_positions.append(pos)
-        logger.info('plot: found position of revision ' + mag + ' at index = ' + str(pos))
+    for mag, pos in MagazineIndex(dataframe).revision_boundaries().items():
+        revision_positions.append(dataframe.index[pos])
+        logger.info('plot: found position of revision ' + mag + ' at index = ' + str(dataframe.index[pos]))
     return revision_positions
 
 
+def counts_per_year(dataframe: pandas.DataFrame, min_year: int = 2011) -> pandas.DataFrame:
+    """
+    add up counts per magazine to counts per year
+
+    magazines without a valid date in their name (e.g. MA21_test) are counted in the year of their
+    first two digits, like the SQL query did before (CAST(SUBSTRING(magazine, 3, 2) AS UNSIGNED)).
+    Magazines without even these digits can't be counted, they are logged.
+
+    Args:
+        dataframe: magazine and y_data (count per magazine)
+        min_year: years before are left out
+
+    Returns:
+        DataFrame: x_data (two digit year) and y_data (count per year)
+    """
+    years = MagazineIndex(dataframe).years()
+    unparsed = years == 0
+    if unparsed.any():
+        names = pandas.Series(dataframe['magazine'].to_numpy()[unparsed], dtype=object)
+        digits = pandas.to_numeric(names.astype(str).str.extract(r'^[Mm][Aa](\d{2})', expand=False),
+                                   errors='coerce').to_numpy()
+        found = ~np.isnan(digits)
+        years[np.flatnonzero(unparsed)[found]] = 2000 + digits[found].astype(np.int64)
+        if found.any():
+            logger.info('counts_per_year: ' + str(int(found.sum())) + ' magazines without a date counted by their '
+                        'year digits: ' + ', '.join(str(name) for name in names[found].head(10)))
+        if not found.all():
+            logger.warning('counts_per_year: ' + str(int((~found).sum())) + ' magazines without a year left out: ' +
+                           ', '.join(str(name) for name in names[~found].head(10)))
+    valid = years >= min_year
+    counts = dataframe.loc[valid, 'y_data'].groupby(years[valid] % 100).sum()
+    return pandas.DataFrame({'x_data': counts.index.values, 'y_data': counts.values})
+
+
+def revision_segments(dataframe: pandas.DataFrame, revisions: list = None) -> np.ndarray:
+    """
+    number of the revision segment of every row, segment 0 is before the first revision,
+    segment k starts with the k-th revision
+
+    Args:
+        dataframe: dataframe that holds the data, column 'magazine' must be present
+        revisions: names of the first magazines after the revisions, default is get_revisions()
+
+    Returns:
+        ndarray: segment of every row, -1 for rows without a valid magazine name
+    """
+    if revisions is None:
+        revisions = get_revisions()
+    dates = parse_magazine_dates(dataframe['magazine']).values
+    revision_dates = np.sort(parse_magazine_dates(revisions).dropna().values)
+    segments = np.searchsorted(revision_dates, dates, side='right')
+    segments[np.isnat(dates)] = -1
+    return segments
+
+
+def segment_stats(dataframe: pandas.DataFrame, value: str = 'fm', error: str = 'fm_sig', group: str = None,
+                  revisions: list = None) -> pandas.DataFrame:
+    """
+    mean, stdev and reduced chi^2 of a column for every revision segment (and group, e.g. standard)
+
+    all segments are calculated at once: the rows are sorted by group and segment
+    and the sums are taken with np.add.reduceat over the segment boundaries
+
+    Args:
+        dataframe: dataframe that holds the data, column 'magazine' must be present
+        value: column the statistics are calculated of
+        error: column with the errors of value, used for chi^2 (None = no chi^2)
+        group: column that splits the data in addition to the segments (None = no groups)
+        revisions: names of the first magazines after the revisions, default is get_revisions()
+
+    Returns:
+        DataFrame: group (if given), segment, revision (first magazine of the segment), first and last
+        (index labels of the first and the last row of the segment), count, mean, stdev, chi2_reduced
+    """
+    if revisions is None:
+        revisions = get_revisions()
+    # only valid magazine names count as revisions, MAyymmdd names sort by date
+    revisions = sorted(name for name, date in zip(revisions, parse_magazine_dates(revisions)) if not pandas.isnull(date))
+    columns = ['segment', 'revision', 'first', 'last', 'count', 'mean', 'stdev', 'chi2_reduced']
+    if group is not None:
+        columns.insert(0, group)
+
+    values = dataframe[value].to_numpy(dtype=float)
+    segments = revision_segments(dataframe, revisions)
+    if group is not None:
+        codes, groups = pandas.factorize(dataframe[group])
+    else:
+        codes, groups = np.zeros(len(dataframe), dtype=np.int64), None
+    valid = ~np.isnan(values) & (segments >= 0) & (codes >= 0)
+    if error is not None:
+        errors = dataframe[error].to_numpy(dtype=float)
+        valid &= ~np.isnan(errors)
+    if not valid.any():
+        return pandas.DataFrame(columns=columns)
+
+    # sort the rows by group and segment, the rows of one segment are next to each other then
+    positions = np.flatnonzero(valid)
+    nsegments = len(revisions) + 1
+    keys = codes[valid] * nsegments + segments[valid]
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    positions = positions[order]
+    x = values[positions]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+
+    means = np.add.reduceat(x, starts) / counts
+    deviations = x - np.repeat(means, counts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # a segment of a single value has no stdev
+        stdevs = np.sqrt(np.add.reduceat(deviations ** 2, starts) / (counts - 1))
+        if error is not None:
+            chi2 = np.add.reduceat((deviations / errors[positions]) ** 2, starts) / (counts - 1)
+        else:
+            chi2 = np.full(len(starts), np.nan)
+
+    segment = keys[starts] % nsegments
+    names = np.array(['start'] + list(revisions), dtype=object)
+    result = pandas.DataFrame({'segment': segment,
+                               'revision': names[segment],
+                               'first': dataframe.index[np.minimum.reduceat(positions, starts)],
+                               'last': dataframe.index[np.maximum.reduceat(positions, starts)],
+                               'count': counts,
+                               'mean': means,
+                               'stdev': stdevs,
+                               'chi2_reduced': chi2})
+    if group is not None:
+        result.insert(0, group, groups[keys[starts] // nsegments])
+    return result
+
+
 def myformatter(**kwarg):
     '''
     this is a formatter for mpldatacorsor that shows more than just the x,y data
@@ -0,0 +1,230 @@
+"""
+descriptive statistics of the numeric columns of a DataFrame that can be updated chunk by chunk
+
+the statistics of all columns are calculated at once on the 2d array of the chunk. A new chunk is
+merged into the running state with the parallel version of Welford's algorithm (Chan et al.), so
+the results of a streamed query (mydb.querydb_chunks) are available after every chunk and two
+states of different parts of the data can be merged.
+
+    stats = RunningStats()
+    for chunk in mydb.querydb_chunks(query):
+        stats.update(chunk)
+        print(stats.result())
+
+columns with a partner column named <column>_sig (e.g. fm and fm_sig) get the error weighted mean,
+its error, the MSWD and the reduced chi^2 of the values around their mean.
+"""
+
+from config.logging_conf import logger
+import numpy as np
+import pandas
+
+# set logger name to the name of the module
+logger.name = __name__
+
+# suffix of the columns that hold the errors of another column
+SIGMA_SUFFIX = '_sig'
+
+
+class RunningStats:
+    """
+    running count, mean, stdev, min, max, quantiles, weighted mean, MSWD and reduced chi^2
+    of every numeric column
+
+    the quantiles are exact as long as a column has no more than max_sample values,
+    above that they are taken from a uniform random sample of max_sample values
+
+    Args:
+        quantiles: quantiles to report, e.g. (0.25, 0.5, 0.75)
+        max_sample: values per column that are kept for the quantiles
+        seed: seed of the random sample
+
+    Returns:
+        None
+    """
+
+    def __init__(self, quantiles: tuple = (0.25, 0.5, 0.75), max_sample: int = 100000, seed: int = None):
+        self.quantiles = tuple(quantiles)
+        self.max_sample = max_sample
+        self.rng = np.random.default_rng(seed)
+        self.columns = None  # names of the numeric columns, fixed by the first chunk
+        self.pairs = []  # (position of the value column, position of its error column)
+
+    def _init(self, dataframe: pandas.DataFrame):
+        numeric = dataframe.select_dtypes(include='number')
+        self.columns = [name for name in numeric.columns if not pandas.api.types.is_bool_dtype(numeric[name])]
+        position = {name: i for i, name in enumerate(self.columns)}
+        self.pairs = [(position[name], position[name + SIGMA_SUFFIX]) for name in self.columns
+                      if name + SIGMA_SUFFIX in position]
+        k = len(self.columns)
+        self.count = np.zeros(k, dtype=np.int64)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)  # sum of the squared deviations from the mean
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self.samples = [np.empty(0) for _ in range(k)]
+        self.seen = np.zeros(k, dtype=np.int64)  # values the samples were drawn from
+        # weighted sums of the value columns with errors, w = 1/sig^2, y = value - shift
+        p = len(self.pairs)
+        self.shift = np.full(p, np.nan)  # keeps the squares small, set by the first chunk
+        self.w_count = np.zeros(p, dtype=np.int64)
+        self.sum_y = np.zeros(p)
+        self.sum_w = np.zeros(p)
+        self.sum_wy = np.zeros(p)
+        self.sum_wy2 = np.zeros(p)
+
+    def _merge_sample(self, i: int, sample: np.ndarray, seen: int):
+        # merge two uniform samples into one uniform sample of at most max_sample values
+        total = self.seen[i] + seen
+        if len(self.samples[i]) + len(sample) <= self.max_sample:
+            self.samples[i] = np.concatenate([self.samples[i], sample])
+        else:
+            # how many values come from each side follows the share of the values they stand for
+            size = min(self.max_sample, len(self.samples[i]) + len(sample))
+            take = self.rng.hypergeometric(self.seen[i], seen, size)
+            take = min(max(take, size - len(sample)), len(self.samples[i]))
+            self.samples[i] = np.concatenate([self.rng.choice(self.samples[i], take, replace=False),
+                                              self.rng.choice(sample, size - take, replace=False)])
+        self.seen[i] = total
+
+    def update(self, dataframe: pandas.DataFrame):
+        """
+        add the rows of a chunk
+
+        Args:
+            dataframe: chunk of the data, the numeric columns of the first chunk are used
+
+        Returns:
+            RunningStats: self
+        """
+        if self.columns is None:
+            self._init(dataframe)
+        if len(dataframe) == 0 or not self.columns:
+            return self
+        values = dataframe.reindex(columns=self.columns).to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        has = count > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(has, np.nansum(values, axis=0) / count, 0.0)
+        m2 = np.nansum((values - mean) ** 2, axis=0)
+        # merge (Chan et al.)
+        total = self.count + count
+        delta = mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(total > 0, self.mean + delta * count / total, 0.0)
+            self.m2 = self.m2 + m2 + np.where(total > 0, delta ** 2 * self.count * count / total, 0.0)
+        self.count = total
+        filled = np.where(valid, values, np.inf)
+        self.min = np.minimum(self.min, filled.min(axis=0))
+        filled = np.where(valid, values, -np.inf)
+        self.max = np.maximum(self.max, filled.max(axis=0))
+        for i in np.flatnonzero(has):
+            column = values[valid[:, i], i]
+            if len(column) > self.max_sample:
+                column = self.rng.choice(column, self.max_sample, replace=False)
+            self._merge_sample(i, column, int(count[i]))
+
+        if self.pairs:
+            x = values[:, [value for value, _ in self.pairs]]
+            sig = values[:, [error for _, error in self.pairs]]
+            ok = ~np.isnan(x) & (sig > 0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                first = np.isnan(self.shift) & (ok.sum(axis=0) > 0)
+                self.shift[first] = (np.nansum(np.where(ok, x, 0.0), axis=0) / ok.sum(axis=0))[first]
+                y = np.where(ok, x - self.shift, 0.0)
+                w = np.where(ok, 1.0 / sig ** 2, 0.0)
+            self.w_count += ok.sum(axis=0)
+            self.sum_y += y.sum(axis=0)
+            self.sum_w += w.sum(axis=0)
+            self.sum_wy += (w * y).sum(axis=0)
+            self.sum_wy2 += (w * y ** 2).sum(axis=0)
+        return self
+
+    def merge(self, other: 'RunningStats'):
+        """
+        add the state of another RunningStats of the same columns (e.g. of another part of the data)
+
+        Args:
+            other: the other state
+
+        Returns:
+            RunningStats: self
+        """
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self._init(pandas.DataFrame(columns=other.columns, dtype=float))
+        if self.columns != other.columns:
+            raise ValueError('RunningStats of different columns can not be merged')
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(total > 0, self.mean + delta * other.count / total, 0.0)
+            self.m2 = self.m2 + other.m2 + np.where(total > 0, delta ** 2 * self.count * other.count / total, 0.0)
+        self.count = total
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        for i in range(len(self.columns)):
+            if other.seen[i] > 0:
+                self._merge_sample(i, other.samples[i], int(other.seen[i]))
+        # bring the weighted sums of the other state to the shift of this one
+        no_shift = np.isnan(self.shift)
+        self.shift[no_shift] = other.shift[no_shift]
+        c = np.where(np.isnan(other.shift), 0.0, other.shift - self.shift)
+        self.w_count += other.w_count
+        self.sum_y += other.sum_y + c * other.w_count
+        self.sum_wy2 += other.sum_wy2 + 2 * c * other.sum_wy + c ** 2 * other.sum_w
+        self.sum_wy += other.sum_wy + c * other.sum_w
+        self.sum_w += other.sum_w
+        return self
+
+    def result(self) -> pandas.DataFrame:
+        """
+        Returns:
+            DataFrame: one row per numeric column with count, mean, stdev, min, the quantiles, max and for
+            columns with errors weighted_mean, weighted_error, mswd and chi2_reduced (NaN for the others)
+        """
+        if not self.columns:
+            return pandas.DataFrame()
+        has = self.count > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats = {'count': self.count,
+                     'mean': np.where(has, self.mean, np.nan),
+                     'stdev': np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan),
+                     'min': np.where(has, self.min, np.nan)}
+            for q in self.quantiles:
+                stats['{0:g}%'.format(q * 100)] = [np.quantile(sample, q) if len(sample) else np.nan
+                                                    for sample in self.samples]
+            stats['max'] = np.where(has, self.max, np.nan)
+
+            k = len(self.columns)
+            for name in ('weighted_mean', 'weighted_error', 'mswd', 'chi2_reduced'):
+                stats[name] = np.full(k, np.nan)
+            if self.pairs:
+                positions = [value for value, _ in self.pairs]
+                n = self.w_count
+                weighted = self.sum_wy / self.sum_w
+                stats['weighted_mean'][positions] = self.shift + weighted
+                stats['weighted_error'][positions] = 1 / np.sqrt(self.sum_w)
+                # scatter around the weighted mean
+                stats['mswd'][positions] = np.where(n > 1, (self.sum_wy2 - self.sum_wy * weighted) / (n - 1), np.nan)
+                # scatter around the plain mean of the same values
+                c = self.sum_y / n
+                chi2 = self.sum_wy2 - 2 * c * self.sum_wy + c ** 2 * self.sum_w
+                stats['chi2_reduced'][positions] = np.where(n > 1, chi2 / (n - 1), np.nan)
+        return pandas.DataFrame(stats, index=self.columns)
+
+
+def describe(dataframe: pandas.DataFrame, **kwargs) -> pandas.DataFrame:
+    """
+    statistics of the numeric columns of a complete DataFrame (see RunningStats)
+
+    Args:
+        dataframe: the data
+        kwargs: arguments of RunningStats
+
+    Returns:
+        DataFrame: one row per numeric column
+    """
+    return RunningStats(**kwargs).update(dataframe).result()
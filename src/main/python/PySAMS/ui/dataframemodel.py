@@ -0,0 +1,209 @@
+"""
+table model that shows a pandas DataFrame in a QTableView
+
+the model keeps the columns of the DataFrame as numpy arrays. The rows are handed to the view
+in pages (canFetchMore/fetchMore) while the user scrolls down, and the cells are formatted
+block by block with vectorized numpy functions. The formatted blocks are cached, so
+repainting or scrolling back doesn't format the same values again.
+
+a streamed query result (mydb.querydb_chunks) is shown while it arrives: the first chunk is set with
+setDataFrame, the next ones are added with appendDataFrame.
+"""
+
+from config.logging_conf import logger
+from collections import OrderedDict
+import numpy
+import pandas
+import PyQt5.QtCore as QtCore
+
+# set logger name to the name of the module
+logger.name = __name__
+
+
+class DataFrameModel(QtCore.QAbstractTableModel):
+    """
+    read only Qt table model backed by a DataFrame
+
+    Args:
+        dataframe: the data, None = empty model
+        parent: parent QObject
+        page_rows: rows handed to the view per fetchMore
+        block_rows: rows formatted at once
+        cached_blocks: formatted blocks kept in memory
+
+    Returns:
+        None
+    """
+
+    def __init__(self, dataframe: pandas.DataFrame = None, parent=None, page_rows: int = 1000,
+                 block_rows: int = 500, cached_blocks: int = 512):
+        super().__init__(parent)
+        self.page_rows = page_rows
+        self.block_rows = block_rows
+        self.cached_blocks = cached_blocks
+        self._dataframe = pandas.DataFrame()
+        # chunks added with appendDataFrame that are not part of _dataframe yet
+        self._chunks = []
+        self._columns = []
+        self._kinds = []
+        self._index = numpy.empty(0, dtype=object)
+        self._loaded = 0
+        # (column, block) -> array of formatted strings, least recently used first
+        self._blocks = OrderedDict()
+        if dataframe is not None:
+            self.setDataFrame(dataframe)
+
+    def setDataFrame(self, dataframe: pandas.DataFrame):
+        """
+        show another DataFrame, the view is reset
+
+        Args:
+            dataframe: the data
+        """
+        self.beginResetModel()
+        self._dataframe = dataframe
+        self._chunks = []
+        # by position, query results may have duplicate column names
+        self._columns = [dataframe.iloc[:, i].to_numpy() for i in range(dataframe.shape[1])]
+        self._kinds = [self._kind(column) for column in self._columns]
+        self._index = dataframe.index.to_numpy()
+        self._loaded = min(self.page_rows, len(dataframe))
+        self._blocks.clear()
+        self.endResetModel()
+        logger.debug('DataFrameModel: ' + str(len(dataframe)) + ' rows, ' + str(len(self._columns)) + ' columns')
+
+    def appendDataFrame(self, dataframe: pandas.DataFrame):
+        """
+        add the rows of the next chunk of the same query, the rows already shown are kept
+
+        Args:
+            dataframe: the next chunk, same columns as the data shown
+        """
+        if not self._columns:
+            self.setDataFrame(dataframe)
+            return
+        if dataframe.shape[1] != len(self._columns):
+            raise ValueError('chunk has ' + str(dataframe.shape[1]) + ' columns, the model has ' +
+                             str(len(self._columns)))
+        if len(dataframe) == 0:
+            return
+        start = len(self._index)
+        self._chunks.append(dataframe)
+        self._columns = [numpy.concatenate([column, dataframe.iloc[:, i].to_numpy()])
+                         for i, column in enumerate(self._columns)]
+        kinds = [self._kind(column) for column in self._columns]
+        if kinds != self._kinds:
+            # e.g. an int column got a NULL and is float now, all blocks are formatted again
+            self._kinds = kinds
+            self._blocks.clear()
+            if self._loaded > 0:
+                self.dataChanged.emit(self.index(0, 0), self.index(self._loaded - 1, len(self._columns) - 1))
+        else:
+            # only the last block may have been formatted with fewer rows
+            first = start // self.block_rows
+            for key in [key for key in self._blocks if key[1] >= first]:
+                del self._blocks[key]
+        self._index = numpy.concatenate([self._index, numpy.arange(start, start + len(dataframe))])
+        if self._loaded < self.page_rows:
+            # the first page fills up while the chunks arrive, the rest is fetched while scrolling
+            count = min(self.page_rows, len(self._index)) - self._loaded
+            self.beginInsertRows(QtCore.QModelIndex(), self._loaded, self._loaded + count - 1)
+            self._loaded += count
+            self.endInsertRows()
+
+    def dataframe(self) -> pandas.DataFrame:
+        """
+        Returns:
+            DataFrame: all rows shown, with the chunks added with appendDataFrame
+        """
+        if self._chunks:
+            self._dataframe = pandas.concat([self._dataframe] + self._chunks, ignore_index=True)
+            self._chunks = []
+        return self._dataframe
+
+    def column(self, col: int) -> numpy.ndarray:
+        """
+        Returns:
+            ndarray: values of a column, not copied
+        """
+        return self._columns[col]
+
+    @staticmethod
+    def _kind(column: numpy.ndarray) -> str:
+        # how the values of a column are formatted
+        if column.dtype.kind == 'f':
+            return 'float'
+        if column.dtype.kind in 'iub':
+            return 'int'
+        if column.dtype.kind == 'M':
+            valid = column[~numpy.isnat(column)]
+            # dates without time are shown without 00:00:00
+            if len(valid) == 0 or (valid.astype('datetime64[D]') == valid).all():
+                return 'date'
+            return 'datetime'
+        return 'object'
+
+    def _format(self, col: int, block: int) -> numpy.ndarray:
+        key = (col, block)
+        strings = self._blocks.get(key)
+        if strings is not None:
+            self._blocks.move_to_end(key)
+            return strings
+        values = self._columns[col][block * self.block_rows:(block + 1) * self.block_rows]
+        kind = self._kinds[col]
+        if kind == 'float':
+            strings = numpy.char.mod('%.6g', values).astype(object)
+            strings[numpy.isnan(values)] = ''
+        elif kind == 'int':
+            strings = values.astype(str).astype(object)
+        elif kind in ('date', 'datetime'):
+            strings = numpy.datetime_as_string(values, unit='D' if kind == 'date' else 's').astype(object)
+            strings[numpy.isnat(values)] = ''
+        else:
+            strings = numpy.array(['' if pandas.isnull(value) else str(value) for value in values], dtype=object)
+        self._blocks[key] = strings
+        if len(self._blocks) > self.cached_blocks:
+            self._blocks.popitem(last=False)
+        return strings
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return self._loaded
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._columns)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()) -> bool:
+        if parent.isValid():
+            return False
+        return self._loaded < len(self._index)
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.page_rows, len(self._index) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index: QtCore.QModelIndex, role: int = QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == QtCore.Qt.DisplayRole:
+            block, offset = divmod(index.row(), self.block_rows)
+            return self._format(index.column(), block)[offset]
+        if role == QtCore.Qt.TextAlignmentRole and self._kinds[index.column()] in ('float', 'int'):
+            return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section: int, orientation: int, role: int = QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            return str(self._dataframe.columns[section])
+        return str(self._index[section])
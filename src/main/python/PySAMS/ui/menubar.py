@@ -8,8 +8,6 @@ from config.logging_conf import logger
 from PyQt5.QtWidgets import QMenuBar, QAction, qApp, QMessageBox
 from PyQt5.QtGui import QIcon
 from ui.settingsDlg import MySettingsDlg
-from ui.plotwindow import PlotWindow
-from ui.sqlplotwindow import SqlPlotWindow
 
 # set logger name to the name of the module
 logger.name = __name__
@@ -82,9 +80,12 @@ class MyMenuBar(QMenuBar):
         self.settingsDlg = MySettingsDlg()
 
     def plotWindow(self):
+        # the plot windows pull in matplotlib, pandas etc, import them when they are opened the first time
+        from ui.plotwindow import PlotWindow
         self.plotWindow = PlotWindow()
 
     def sqlplotWindow(self):
+        from ui.sqlplotwindow import SqlPlotWindow
         self.sqlplotWindow = SqlPlotWindow()
 
 
@@ -1,8 +1,11 @@
 from config.logging_conf import logger
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
+import matplotlib.dates as mdates
 import PyQt5.QtWidgets as QtWidgets
+import numpy as np
 import pandas
+from config.config import myconfig  # myconfig calss will be loaded here
 
 # set logger name to the name of the module
 logger.name = __name__
@@ -12,6 +15,13 @@ class MyPlotCanvas(FigureCanvas):
     """
     Creates a widget of a plot canvas that can be placed in a layout an display plots.
 
+    the artists of a plot are kept and reused by the next create_plot (set_offsets / set_data)
+    as long as the kind of plot stays the same. They are animated: a full draw paints the axes only,
+    the points are blitted on top of the saved background. If the limits don't change a new result
+    is shown by blitting alone.
+
+    above max_points points (config value plot/max_points) the data are shown as a 2d histogram
+    (plot/large_mode = density) or only every n-th point is drawn (plot/large_mode = decimate).
     """
 
     def __init__(self, parent=None, width=5, height=4, dpi=100):
@@ -29,8 +39,60 @@ class MyPlotCanvas(FigureCanvas):
         FigureCanvas.setSizePolicy(self, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
         FigureCanvas.updateGeometry(self)
 
+        # settings for large data sets
+        self.max_points = myconfig.getint('plot', 'max_points', fallback=50000)
+        self.large_mode = myconfig.get('plot', 'large_mode', fallback='density')
+        self.density_bins = myconfig.getint('plot', 'density_bins', fallback=200)
+
+        # artists of the current plot, reused by the next create_plot
+        self.points = None  # PathCollection of the scatter plot
+        self.density = None  # AxesImage of the 2d histogram
+        # (mode, x is date, y is date) of the current plot, the artists are only reused if it stays the same
+        self.layout = None
+        self.labels = None
+        # the figure without the animated artists, saved after every full draw
+        self.background = None
+        self.mpl_connect('draw_event', self.on_draw)
+
         logger.debug('MyPlotCanvas: initializing... done')
 
+    def animated_artists(self) -> list:
+        return [artist for artist in (self.points, self.density) if artist is not None]
+
+    def on_draw(self, event):
+        # a full draw happened (new limits, resize, ...), keep the background and paint the points on top,
+        # the canvas shows the buffer after the draw anyway
+        self.background = self.copy_from_bbox(self.figure.bbox)
+        for artist in self.animated_artists():
+            self.ax.draw_artist(artist)
+
+    def print_figure(self, *args, **kwargs):
+        # animated artists are left out of normal draws, saved figures have to show them
+        artists = self.animated_artists()
+        for artist in artists:
+            artist.set_animated(False)
+        try:
+            return super().print_figure(*args, **kwargs)
+        finally:
+            for artist in artists:
+                artist.set_animated(True)
+
+    @staticmethod
+    def to_numbers(column: pandas.Series):
+        """
+        Returns:
+            ndarray: the values as floats (dates as matplotlib date numbers), None if they are no numbers
+        """
+        if pandas.api.types.is_datetime64_any_dtype(column):
+            return mdates.date2num(column.to_numpy())
+        if pandas.api.types.is_numeric_dtype(column) and not pandas.api.types.is_bool_dtype(column):
+            return column.to_numpy(dtype=float)
+        try:
+            # mysql returns the results of calculations as Decimal
+            return pandas.to_numeric(column).to_numpy(dtype=float)
+        except (TypeError, ValueError):
+            return None
+
     def create_plot(self, dataframe: pandas.DataFrame):
         """
         use the data in datamodel to create a plot inside the plotcanvas
@@ -42,12 +104,111 @@ class MyPlotCanvas(FigureCanvas):
             None
         """
         logger.debug('MyPlotCanvas: create_plot method started')
-        self.ax.cla()
-        # convert first and second column of the datamodel to a dataframe
         # get the names of the first two columns
         header = dataframe.columns.values.tolist()
         self.xlabel = header[0]
         self.ylabel = header[1]
+        x = self.to_numbers(dataframe.iloc[:, 0])
+        y = self.to_numbers(dataframe.iloc[:, 1])
+        if x is None or y is None:
+            # text or categories, let matplotlib sort them out
+            self.create_plain_plot(dataframe)
+            return
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x = x[valid]
+        y = y[valid]
+
+        mode = 'points'
+        if len(x) > self.max_points:
+            mode = 'density' if self.large_mode == 'density' else 'decimate'
+            logger.debug('MyPlotCanvas: ' + str(len(x)) + ' points, using ' + mode)
+        if mode == 'decimate':
+            step = int(np.ceil(len(x) / self.max_points))
+            x = x[::step]
+            y = y[::step]
+            mode = 'points'
+        layout = (mode, pandas.api.types.is_datetime64_any_dtype(dataframe.iloc[:, 0]),
+                  pandas.api.types.is_datetime64_any_dtype(dataframe.iloc[:, 1]))
+
+        if layout != self.layout or len(x) == 0:
+            self.rebuild(layout)
+        limits = (self.ax.get_xlim(), self.ax.get_ylim())
+        if len(x) > 0:
+            if mode == 'density':
+                self.update_density(x, y)
+            else:
+                self.update_points(x, y)
+        # add axis labels
+        self.ax.set_xlabel(self.xlabel)
+        self.ax.set_ylabel(self.ylabel)
+
+        if self.background is not None and limits == (self.ax.get_xlim(), self.ax.get_ylim()) \
+                and layout == self.layout and self.labels == (self.xlabel, self.ylabel):
+            # same axes as before, only the points changed
+            self.blit_artists()
+        else:
+            self.draw_idle()
+        self.layout = layout
+        self.labels = (self.xlabel, self.ylabel)
+
+        logger.debug('MyPlotCanvas: create_plot method ended')
+
+    def rebuild(self, layout: tuple):
+        # clear the axes, the artists are created again by update_points / update_density
+        self.ax.cla()
+        self.points = None
+        self.density = None
+        self.background = None
+        self.layout = None
+        self.labels = None
+        if layout[1]:
+            self.ax.xaxis_date()
+        if layout[2]:
+            self.ax.yaxis_date()
+
+    def update_points(self, x: np.ndarray, y: np.ndarray):
+        offsets = np.column_stack([x, y])
+        if self.points is None:
+            self.points = self.ax.scatter(x=x, y=y, animated=True)
+        else:
+            self.points.set_offsets(offsets)
+        # scale the axes to the new points only
+        self.ax.ignore_existing_data_limits = True
+        self.ax.update_datalim(offsets)
+        self.ax.autoscale_view()
+
+    def update_density(self, x: np.ndarray, y: np.ndarray):
+        counts, xedges, yedges = np.histogram2d(x, y, bins=self.density_bins)
+        # empty bins stay white
+        counts = np.ma.masked_equal(counts.T, 0)
+        extent = (xedges[0], xedges[-1], yedges[0], yedges[-1])
+        if self.density is None:
+            self.density = self.ax.imshow(counts, origin='lower', extent=extent, aspect='auto',
+                                          interpolation='nearest', animated=True)
+        else:
+            self.density.set_data(counts)
+            self.density.set_extent(extent)
+        self.density.set_clim(1, max(1, counts.max()))
+        self.ax.set_xlim(extent[0], extent[1])
+        self.ax.set_ylim(extent[2], extent[3])
+
+    def blit_artists(self):
+        """
+        paint the animated artists on the saved background, without drawing the axes again
+        """
+        self.restore_region(self.background)
+        for artist in self.animated_artists():
+            self.ax.draw_artist(artist)
+        self.blit(self.figure.bbox)
+
+    def create_plain_plot(self, dataframe: pandas.DataFrame):
+        """
+        scatter plot of the first two columns without reusing artists (e.g. for text columns)
+
+        Args:
+            dataframe
+        """
+        self.rebuild((None, False, False))
         # create scatter plot of the first two columns
         self.ax.scatter(x=dataframe.iloc[:, 0], y=dataframe.iloc[:, 1])
         # add axis labels
@@ -60,9 +221,3 @@ class MyPlotCanvas(FigureCanvas):
         # sns.despine()
 
         self.draw()
-
-        logger.debug('MyPlotCanvas: create_plot method ended')
-
-
-
-
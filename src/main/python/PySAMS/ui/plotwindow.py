@@ -1,13 +1,23 @@
 from config.logging_conf import logger
 import PyQt5.QtCore as QtCore
 import PyQt5.QtWidgets as QtWidgets
-import plots.qc.qcplots as qcplots
-import plots.stat.statplots as statplots
+import plots.registry as registry
+from plots.batchrender import BatchRenderer
+from database.queryworker import QueryWorker
 
 # set logger name to the name of the module
 logger.name = __name__
 
 
+class BatchSignals(QtCore.QObject):
+    """
+    progress of the batch renderer, emitted from the thread the batch runs in
+
+    progress: number of finished plots and the name of the last one
+    """
+    progress = QtCore.pyqtSignal(int, str)
+
+
 class PlotWindow(QtWidgets.QMainWindow):
     """
     main class for the plot window (formerly the AMSDataInspector).
@@ -22,8 +32,6 @@ class PlotWindow(QtWidgets.QMainWindow):
         None
     """
 
-    # TODO add function to create all plots at once
-
     def __init__(self):
         """
         Initialize the App object.
@@ -62,45 +70,38 @@ class PlotWindow(QtWidgets.QMainWindow):
         label = QtWidgets.QLabel('Choose Plot', self)
 
         # central widget: add a list widget
-        self.listBoxItems = ['-- do all plots --',
-                             '-- all QC plots --',
-                             'received samples',
-                             'projects per year',
-                             'measured samples',
-                             'overall age precision',
-                             'oxas blanks stdev per magazine',
-                             'age precision over time',
-                             'age histogram',
-                             'materials',
-                             'turnaround times histogram (select year)',
-                             'express samples',
-                             'bone collagen distribution',
-                             'MAG parameters',
-                             'AGE parameters',
-                             'blank values',
-                             'IAEA C1',
-                             'IAEA C2',
-                             'IAEA C3',
-                             'IAEA C6',
-                             'ICOS HEI3',
-                             'ICOS HEI10',
-                             'horses']
+        # all plots are rendered without windows and only saved (see start_batch), the label says so
+        self.listBoxItems = ['-- save all plots to pics/ (no windows) --',
+                             '-- all QC plots --'] + [entry.label for entry in registry.PLOTS]
         self.listBox = QtWidgets.QListWidget(self)
         self.listBox.addItems(self.listBoxItems)
+        self.listBox.item(0).setToolTip('render all plots in the background and save them to pics/, '
+                                        'the plots are not shown')
         self.listBox.itemSelectionChanged.connect(self.list_selection_on_change)
 
         # central widget: create a button
-        button = QtWidgets.QPushButton('Plot', self)
-        button.setToolTip('create the selected plot')
-        button.move(100, 200)
-        button.clicked.connect(lambda: self.btn_on_click(self.listBox))
+        self.button = QtWidgets.QPushButton('Plot', self)
+        self.button.setToolTip('create the selected plot')
+        self.button.move(100, 200)
+        self.button.clicked.connect(lambda: self.btn_on_click(self.listBox))
+
+        # state of the plots that are being created,
+        # the queries run in the background, the plots are drawn when the data arrived
+        self.pending_plots = []
+        self.worker = None
+        self.progressdlg = None
+        # "-- save all plots --" runs in the batch renderer, which saves the plots to pics/ without windows
+        self.renderer = None
+        self.batch_signals = None
+        # True while the plots share one fetch of the standards
+        self.shared_run = False
 
         # central widget: combine all into a layout
         self.vlayout = QtWidgets.QVBoxLayout()
         self.vlayout.setContentsMargins(0, 10, 0, 0)
         self.vlayout.addWidget(label)
         self.vlayout.addWidget(self.listBox)
-        self.vlayout.addWidget(button)
+        self.vlayout.addWidget(self.button)
 
         # central widget: assign layout to central widget
         centralWidget.setLayout(self.vlayout)
@@ -122,176 +123,162 @@ class PlotWindow(QtWidgets.QMainWindow):
         logger.debug(str(listBox.currentRow()))
         # create the plots depending on the selection of the list box
         if listBox.currentRow() == 0:  # this creates all plots at ones
-            # show a progress dialog with 18 steps (number of plots to be processed)
-            progressdlg = QtWidgets.QProgressDialog('creating plots...', 'stop', 0, 18)
-            progressdlg.setWindowModality(QtCore.Qt.WindowModal)
-            progressdlg.setMinimumDuration(0)
-
-            # in order to be able to check the 'stop' button run the commands inside of a loop
-            proceed = True
-            while proceed:
-                progressdlg.setValue(0)
-                fig = statplots.plot_received()
-                progressdlg.setValue(1)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_projects_per_year()
-                progressdlg.setValue(2)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_throughput()
-                progressdlg.setValue(3)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_age_precision()
-                progressdlg.setValue(4)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_oxas_stdev_mag()
-                progressdlg.setValue(5)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_age_precision_time()
-                progressdlg.setValue(6)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_age_hist()
-                progressdlg.setValue(7)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_material()
-                progressdlg.setValue(8)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_turnaround()
-                progressdlg.setValue(9)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_express_samples()
-                progressdlg.setValue(10)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_bone_collagen()
-                progressdlg.setValue(11)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_MAG_params()
-                progressdlg.setValue(12)
-                if progressdlg.wasCanceled():
-                    break
-                fig = statplots.plot_AGE_params()
-                progressdlg.setValue(13)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_blanks()
-                progressdlg.setValue(14)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_c1()
-                progressdlg.setValue(15)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_c2()
-                progressdlg.setValue(16)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_c3()
-                progressdlg.setValue(17)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_c6()
-                progressdlg.setValue(18)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_hei3()
-                progressdlg.setValue(19)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_hei10()
-                progressdlg.setValue(20)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_horses()
-                progressdlg.setValue(21)
-                proceed = False  # stop loop and get out of this if
+            self.start_batch(list(registry.PLOTS))
+            return
         elif listBox.currentRow() == 1:  # this creates all qc plots at ones
-            # show a progress dialog with 6 steps (number of plots to be processed)
-            progressdlg = QtWidgets.QProgressDialog('creating plots...', 'stop', 0, 6)
-            progressdlg.setWindowModality(QtCore.Qt.WindowModal)
-            progressdlg.setMinimumDuration(0)
-            # in order to be able to check the 'stop' button run the commands inside of a loop
-            proceed = True
-            while proceed:
-                progressdlg.setValue(0)
-                fig = qcplots.plot_blanks()
-                progressdlg.setValue(1)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_c1()
-                progressdlg.setValue(2)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_c2()
-                progressdlg.setValue(3)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_c3()
-                progressdlg.setValue(4)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_c6()
-                progressdlg.setValue(5)
-                if progressdlg.wasCanceled():
-                    break
-                fig = qcplots.plot_horses()
-                progressdlg.setValue(6)
-                proceed = False  # stop loop and get out of this if
-        if listBox.currentRow() == 2:
-            fig = statplots.plot_received()
-        if listBox.currentRow() == 3:
-            fig = statplots.plot_projects_per_year()
-        elif listBox.currentRow() == 4:
-            fig = statplots.plot_throughput()
-        elif listBox.currentRow() == 5:
-            fig = statplots.plot_age_precision()
-        elif listBox.currentRow() == 6:
-            fig = statplots.plot_oxas_stdev_mag()
-        elif listBox.currentRow() == 7:
-            fig = statplots.plot_age_precision_time()
-        elif listBox.currentRow() == 8:
-            fig = statplots.plot_age_hist()
-        elif listBox.currentRow() == 9:
-            fig = statplots.plot_material()
-        elif listBox.currentRow() == 10:
-            fig = statplots.plot_turnaround()
-        elif listBox.currentRow() == 11:
-            fig = statplots.plot_express_samples()
-        elif listBox.currentRow() == 12:
-            fig = statplots.plot_bone_collagen()
-        elif listBox.currentRow() == 13:
-            fig = statplots.plot_MAG_params()
-        elif listBox.currentRow() == 14:
-            fig = statplots.plot_AGE_params()
-        elif listBox.currentRow() == 15:
-            fig = qcplots.plot_blanks()
-        elif listBox.currentRow() == 16:
-            fig = qcplots.plot_c1()
-        elif listBox.currentRow() == 17:
-            fig = qcplots.plot_c2()
-        elif listBox.currentRow() == 18:
-            fig = qcplots.plot_c3()
-        elif listBox.currentRow() == 19:
-            fig = qcplots.plot_c6()
-        elif listBox.currentRow() == 20:
-            fig = qcplots.plot_hei3()
-        elif listBox.currentRow() == 21:
-            fig = qcplots.plot_hei10()
-        elif listBox.currentRow() == 22:
-            fig = qcplots.plot_horses()
-
-        # somehow this is not needed, plots are created anyway
-
-        # create the plot canvas object where the figure will be displayed
-        # self.plotcanvas = plotcanvas.MyPlotCanvas(parent=self, width=5, height=4)
-        # send figure to canvas
-        # self.plotcanvas.create_plot(fig)
+            entries = [registry.get_plot(name) for name in registry.QC_PLOTS]
+        elif listBox.currentRow() > 1:
+            entries = [registry.PLOTS[listBox.currentRow() - 2]]
+        else:
+            return
+        self.start_plots(entries)
+
+    def start_plots(self, entries: list):
+        """
+        create a list of plots one after the other
+
+        the query of each plot runs in the background so that the window keeps responding,
+        the plot is drawn as soon as its data arrived.
+
+        Args:
+            entries: list of registry.PlotEntry
+        """
+        self.pending_plots = self.ask_params(entries)
+
+        if len(entries) > 1:
+            self.start_shared_run()
+            self.show_progress(len(entries))
+        else:
+            self.progressdlg = None
+
+        self.button.setEnabled(False)
+        self.next_plot()
+
+    def ask_params(self, entries: list) -> list:
+        """
+        ask for the parameters of all plots first, so that the user doesn't have to wait for the queries in between
+
+        Returns:
+            list: (entry, params) for every entry
+        """
+        asked = []
+        for entry in entries:
+            ask = entry.ask_function()
+            params = ask() if ask is not None else {}
+            asked.append((entry, params))
+        return asked
+
+    def start_shared_run(self):
+        # the plots of the standards fetch all standards once for the whole list (see plots.qc.standards)
+        import plots.qc.standards as standards
+        standards.start_run()
+        self.shared_run = True
+
+    def show_progress(self, count: int):
+        # progress dialog with one step per plot
+        self.progressdlg = QtWidgets.QProgressDialog('creating plots...', 'stop', 0, count)
+        self.progressdlg.setWindowModality(QtCore.Qt.WindowModal)
+        self.progressdlg.setMinimumDuration(0)
+        self.progressdlg.canceled.connect(self.cancel_plots)
+        self.progressdlg.setValue(0)
+
+    def start_batch(self, entries: list):
+        """
+        render the plots in the background with the batch renderer (plots.batchrender),
+        the figures are saved to pics/ and not shown
+
+        Args:
+            entries: list of registry.PlotEntry
+        """
+        params = {entry.name: entry_params for entry, entry_params in self.ask_params(entries)}
+        self.start_shared_run()
+        self.show_progress(len(entries))
+        self.renderer = BatchRenderer()
+        self.batch_signals = BatchSignals()
+        self.batch_signals.progress.connect(self.on_batch_progress)
+        signals = self.batch_signals
+        self.worker = QueryWorker(self.renderer.run, entries, params,
+                                  progress=lambda done, total, result: signals.progress.emit(done, result.name))
+        self.worker.signals.finished.connect(self.on_batch_finished)
+        self.worker.signals.error.connect(lambda message: self.on_batch_finished([]))
+        self.button.setEnabled(False)
+        self.statusbar.showMessage('rendering ' + str(len(entries)) + ' plots')
+        self.worker.start()
+
+    def on_batch_progress(self, done: int, name: str):
+        self.statusbar.showMessage('finished: ' + name)
+        if self.progressdlg is not None and not self.progressdlg.wasCanceled():
+            self.progressdlg.setValue(done)
+
+    def on_batch_finished(self, results: list):
+        failed = [result.name for result in results if not result.ok]
+        if failed:
+            logger.warning('plotwindow -- plots not created: ' + ', '.join(failed))
+        self.renderer = None
+        self.batch_signals = None
+        self.finish_plots()
+        self.statusbar.showMessage(str(len(results) - len(failed)) + ' plots saved to pics/', 5000)
+
+    def next_plot(self):
+        """
+        start the query of the next pending plot
+        """
+        if not self.pending_plots:
+            self.finish_plots()
+            return
+        entry, params = self.pending_plots.pop(0)
+        self.statusbar.showMessage('querying: ' + entry.label)
+        self.worker = QueryWorker(entry.query_function(), **params)
+        self.worker.signals.finished.connect(lambda result: self.on_query_finished(entry, params, result))
+        self.worker.signals.error.connect(lambda message: self.on_query_error(entry, message))
+        self.worker.signals.cancelled.connect(self.finish_plots)
+        self.worker.start()
+
+    def on_query_finished(self, entry: registry.PlotEntry, params: dict, result):
+        # the data are here, draw the plot in the GUI thread
+        self.statusbar.showMessage('plotting: ' + entry.label)
+        try:
+            entry.plot_function()(result, **params)
+        except Exception as err:
+            logger.error('plotwindow -- plot ' + entry.label + ' failed: ' + str(err))
+        self.step_progress()
+
+    def on_query_error(self, entry: registry.PlotEntry, message: str):
+        logger.error('plotwindow -- query of ' + entry.label + ' failed: ' + message)
+        self.statusbar.showMessage('query failed: ' + entry.label, 5000)
+        self.step_progress()
+
+    def step_progress(self):
+        if self.progressdlg is not None:
+            if self.progressdlg.wasCanceled():
+                return
+            self.progressdlg.setValue(self.progressdlg.value() + 1)
+        self.next_plot()
+
+    @QtCore.pyqtSlot()
+    def cancel_plots(self):
+        """
+        stop creating plots, a query that is running right now is aborted on the server
+        """
+        logger.debug('plotwindow -- cancel plots')
+        if self.renderer is not None:
+            # the batch stops after the plots that are being rendered right now, on_batch_finished cleans up
+            self.statusbar.showMessage('stopping...')
+            self.renderer.cancel()
+            return
+        self.pending_plots = []
+        if self.worker is not None:
+            self.worker.cancel()
+        self.finish_plots()
+
+    def finish_plots(self):
+        if self.shared_run:
+            import plots.qc.standards as standards
+            standards.end_run()
+            self.shared_run = False
+        self.worker = None
+        if self.progressdlg is not None:
+            self.progressdlg.reset()
+            self.progressdlg = None
+        self.button.setEnabled(True)
+        self.statusbar.showMessage('done', 2000)
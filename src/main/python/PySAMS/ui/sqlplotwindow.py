@@ -1,9 +1,11 @@
 from config.logging_conf import logger
 import PyQt5.QtCore as QtCore
 import PyQt5.QtWidgets as QtWidgets
-import PyQt5.QtSql as QtSql
 from database.pysamsdb import mydb  # this is the already instantiated MyDatabase object to the AMS DB
+from database.queryworker import ChunkWorker
 import ui.plotcanvas as plotcanvas
+from ui.dataframemodel import DataFrameModel
+from plots.utils.runningstats import RunningStats
 import pandas
 
 
@@ -69,13 +71,32 @@ class SqlPlotWindow(QtWidgets.QMainWindow):
         self.button.setSizePolicy(QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Preferred)
         self.button.clicked.connect(lambda: self.btn_on_click(self.querybox))
 
+        # create a button that aborts a running query
+        self.stopbutton = QtWidgets.QPushButton('Stop', self)
+        self.stopbutton.setToolTip('abort the running query')
+        self.stopbutton.setSizePolicy(QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Preferred)
+        self.stopbutton.setEnabled(False)
+        self.stopbutton.clicked.connect(self.stop_on_click)
+        # the worker that runs the query in the background, chunks and rows it delivered so far
+        self.worker = None
+        self.chunks = 0
+        self.rows = 0
+
         # create a table that holds the query results
-        self.datatable = QtWidgets.QTableView()  # the QSqlTableModel will be set up when running the query
+        self.datatable = QtWidgets.QTableView()
         self.datatable.setSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Minimum)
+        # the rows of the result are shown by the model while scrolling, all rows have the same height
+        self.datamodel = DataFrameModel(parent=self)
+        self.datatable.setModel(self.datamodel)
+        self.datatable.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
 
         # create a table that shows the statistics results
         self.stattable = QtWidgets.QTableView()
         self.stattable.setSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Minimum)
+        # one row per numeric column of the result
+        self.statmodel = DataFrameModel(parent=self)
+        self.stattable.setModel(self.statmodel)
+        self.stats = None
 
         # create a canvas for the plot
         self.canvas = plotcanvas.MyPlotCanvas(parent=self.centralWidget, width=8, height=6, dpi=100)
@@ -86,6 +107,7 @@ class SqlPlotWindow(QtWidgets.QMainWindow):
         # self.hlayouttop.setContentsMargins(5, 5, 5, 5)
         self.hlayouttop.addWidget(self.querybox)
         self.hlayouttop.addWidget(self.button)
+        self.hlayouttop.addWidget(self.stopbutton)
         # self.hlayouttop.addStretch()
 
         # label above top horz
@@ -125,50 +147,76 @@ class SqlPlotWindow(QtWidgets.QMainWindow):
         logger.debug(str(querybox))
         # query database and display the results as a plot and in tables
         if len(querybox.toPlainText()) > 0:  # perform query if anything is entered at all
-            qrydata = mydb.querydb(querybox.toPlainText()) # Query database and connect query to a QSqlQueryModel
-            datamodel = QtSql.QSqlQueryModel()  # create QueryModel Object
-            datamodel.setQuery(qrydata)  # bind resulting qrydata from the databasequery to the model
-            self.datatable.setModel(datamodel) # bind datatable to the datamodel
-            logger.debug('query columns ' + str(datamodel.columnCount()))
-            logger.debug('query rows ' + str(datamodel.rowCount()))
-            # send data to canvas
-            dataframe = self.datamodel_to_dataframe(datamodel)
-            self.canvas.create_plot(dataframe)
-            # do some statistics of the data and show in the stattable
-            self.update_stattable(dataframe)
-
-    def datamodel_to_dataframe(self, datamodel: QtSql.QSqlQueryModel) -> pandas.DataFrame:
-        """
-        get the first two columns out of the datamodel into a dataframe.
-
-        Args:
-            datamodel: data from the SQLQuery also shown in the tableView
+            # run the query in the background so that the window keeps responding,
+            # the rows are streamed in chunks and shown while they arrive
+            # ad hoc queries are not cached, the user expects the current data
+            self.worker = ChunkWorker(mydb.querydb_chunks, querybox.toPlainText())
+            self.chunks = 0
+            self.rows = 0
+            self.worker.signals.chunk.connect(self.on_query_chunk)
+            self.worker.signals.finished.connect(self.on_query_finished)
+            self.worker.signals.error.connect(self.on_query_error)
+            self.worker.signals.cancelled.connect(self.on_query_cancelled)
+            self.button.setEnabled(False)
+            self.stopbutton.setEnabled(True)
+            self.statusbar.showMessage('running query...')
+            self.worker.start()
 
-        Returns:
-            dataframe:
-
-        """
-        col1label = datamodel.record(0).fieldName(0)
-        col2label = datamodel.record(0).fieldName(1)
-        dataframe = pandas.DataFrame()
-        col1data = []
-        col2data = []
-        if not datamodel.record().isEmpty():
-            for i in range(0, datamodel.rowCount()):
-                col1data.append(datamodel.record(i).value(col1label))
-                col2data.append(datamodel.record(i).value(col2label))
-            # convert list into a pandas series
-            list1 = pandas.Series(col1data)
-            list2 = pandas.Series(col2data)
-            # add series to a dataframe
-            dataframe.insert(loc=0, column=col1label, value=col1data, allow_duplicates=True)
-            dataframe.insert(loc=1, column=col2label, value=col2data, allow_duplicates=True)
-        return dataframe
-
-    def update_stattable(self, dataframe: pandas.DataFrame):
+    @QtCore.pyqtSlot()
+    def stop_on_click(self):
+        logger.debug('SQLplotwindow -- stop query')
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def on_query_chunk(self, chunk: pandas.DataFrame):
+        first = self.chunks == 0
+        self.chunks += 1
+        self.rows += len(chunk)
+        # show the rows in the datatable, the first chunk replaces the result of the last query
+        if first:
+            self.datamodel.setDataFrame(chunk)
+        else:
+            self.datamodel.appendDataFrame(chunk)
+        # do some statistics of the data and show in the stattable
+        self.update_stattable(chunk, reset=first)
+        self.statusbar.showMessage('running query... ' + str(self.rows) + ' rows')
+
+    def on_query_finished(self, rows: int):
+        if self.chunks == 0:
+            # no chunk arrived, the table still shows the last query
+            self.datamodel.setDataFrame(pandas.DataFrame())
+            self.update_stattable(pandas.DataFrame())
+        self.query_done('query finished, ' + str(rows) + ' rows')
+        qrydata = self.datamodel.dataframe()
+        logger.debug('query columns ' + str(qrydata.shape[1]))
+        logger.debug('query rows ' + str(qrydata.shape[0]))
+        if qrydata.shape[1] < 2:
+            self.statusbar.showMessage('query finished, at least two columns are needed for a plot', 5000)
+            return
+        # send data to canvas
+        self.canvas.create_plot(qrydata)
+
+    def on_query_error(self, message: str):
+        self.query_done('query failed: ' + message)
+
+    def on_query_cancelled(self):
+        self.query_done('query aborted')
+
+    def query_done(self, message: str):
+        self.worker = None
+        self.button.setEnabled(True)
+        self.stopbutton.setEnabled(False)
+        self.statusbar.showMessage(message, 5000)
+
+    def update_stattable(self, dataframe: pandas.DataFrame, reset: bool = True):
         """
-        update the stattabel with the most recent results
-        Returns:
+        update the stattable with the statistics of the numeric columns of the query result
 
+        Args:
+            dataframe: the query result or the next chunk of it
+            reset: True for a new query, False to add a chunk to the statistics of the chunks before
         """
-        pass
+        if reset or self.stats is None:
+            self.stats = RunningStats()
+        self.stats.update(dataframe)
+        self.statmodel.setDataFrame(self.stats.result())
@@ -0,0 +1,15 @@
+"""
+common setup of the tests
+
+the modules of PySAMS are imported from src/main/python/PySAMS like the app does (import config..., import plots...).
+The tests run in a temporary directory, because importing config.logging_conf creates logfile.log and
+MyConfig writes config.ini (with the default values) to the working directory.
+"""
+
+import os
+import sys
+import tempfile
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'main', 'python', 'PySAMS')
+sys.path.insert(0, CODE_DIR)
+os.chdir(tempfile.mkdtemp(prefix='pysams_tests_'))
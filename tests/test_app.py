@@ -0,0 +1,62 @@
+"""
+app: checks of the query arguments and the response cache of the web app
+"""
+
+import time
+import pytest
+
+pytest.importorskip('flask')
+import app  # noqa: E402  (flask is checked first)
+
+
+@pytest.fixture
+def client():
+    app.cache.clear()
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('url', ['/api/plots/received.csv?part=x', '/api/plots/received.csv?part=-1',
+                                 '/api/plots/received.json?foo=1', '/api/plots/turnaround.json',
+                                 '/api/plots/turnaround.csv?search_mag=MA21%25&year=21',
+                                 '/api/plots/received.arrow?part=1.5', '/plots/control_chart.png?value=dc13'])
+def test_bad_arguments(client, url):
+    if url.endswith('1.5') and app.pyarrow is None:
+        pytest.skip('pyarrow is not installed')
+    assert client.get(url).status_code == 400
+    assert len(app.cache) == 0
+
+
+def test_unknown_plot(client):
+    assert client.get('/api/plots/nothing.json').status_code == 404
+
+
+def test_response_cache_is_limited():
+    cache = app.ResponseCache(max_entries=3)
+    for i in range(5):
+        cache.get('key' + str(i), 60, lambda: ('body', 'text/plain'))
+    assert len(cache) == 3
+    # the least recently used entries were dropped
+    assert cache._fresh('key0') is None and cache._fresh('key4') is not None
+    # the build locks are only kept while building
+    assert cache._key_locks == {}
+
+
+def test_response_cache_drops_expired_entries():
+    cache = app.ResponseCache()
+    cache.get('old', 0.01, lambda: ('body', 'text/plain'))
+    time.sleep(0.02)
+    cache.get('new', 60, lambda: ('body', 'text/plain'))
+    assert len(cache) == 1
+
+
+def test_response_cache_builds_once():
+    cache = app.ResponseCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return 'body', 'text/csv'
+    first = cache.get('key', 60, build)
+    second = cache.get('key', 60, build)
+    assert len(calls) == 1
+    assert first.etag == second.etag and first.gzipped is not None
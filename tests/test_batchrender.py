@@ -0,0 +1,32 @@
+"""
+plots.batchrender: hashes of the plot data
+"""
+
+import numpy as np
+import pandas
+from plots.batchrender import data_hash
+
+
+def frame():
+    return pandas.DataFrame({'magazine': ['MA210304', 'MA210311'], 'fm': [1.01, 0.99]})
+
+
+def test_equal_data_equal_hash():
+    assert data_hash(frame()) == data_hash(frame())
+    assert data_hash((frame(), [frame(), 3])) == data_hash((frame(), [frame(), 3]))
+
+
+def test_changes_change_the_hash():
+    changed = frame()
+    changed.loc[1, 'fm'] = 0.98
+    assert data_hash(changed) != data_hash(frame())
+    # same values, other dtype or other column names
+    assert data_hash(frame().astype({'fm': np.float32})) != data_hash(frame())
+    assert data_hash(frame().rename(columns={'fm': 'fm2'})) != data_hash(frame())
+    # a frame split differently over a tuple
+    assert data_hash((frame(),)) != data_hash((frame(), frame().iloc[:0]))
+
+
+def test_other_values():
+    assert data_hash({'year': 21}) == data_hash({'year': 21})
+    assert data_hash(None) != data_hash(0)
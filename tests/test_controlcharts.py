@@ -0,0 +1,118 @@
+"""
+plots.qc.controlcharts: running Welford, EWMA and CUSUM state on disk
+"""
+
+import math
+import os
+import numpy as np
+import pandas
+import pytest
+import plots.qc.controlcharts as controlcharts
+from plots.qc.controlcharts import ControlChart
+
+
+def series(magazines: int = 20, per_magazine: int = 3, seed: int = 4) -> pandas.DataFrame:
+    rng = np.random.default_rng(seed)
+    names = np.repeat(['MA21%04d' % i for i in range(magazines)], per_magazine)
+    return pandas.DataFrame({'magazine': names, 'fm': rng.normal(1.0, 0.01, len(names))})
+
+
+def chart(tmp_path, baseline: int = 10) -> ControlChart:
+    result = ControlChart('c6', 'fm', path=str(tmp_path))
+    result.baseline = baseline
+    return result
+
+
+def test_welford_and_baseline(tmp_path):
+    dataframe = series()
+    c = chart(tmp_path)
+    rows = c.extend(dataframe)
+    x = dataframe['fm'].to_numpy()
+    assert c.n == len(x)
+    assert c.mean == pytest.approx(x.mean())
+    assert math.sqrt(c.m2 / (c.n - 1)) == pytest.approx(x.std(ddof=1))
+    # center and sigma are fixed by the first baseline values
+    assert c.center == pytest.approx(x[:10].mean())
+    assert c.sigma == pytest.approx(x[:10].std(ddof=1))
+    assert rows['center'].isna().sum() == 10
+    assert rows['ucl'].iloc[-1] == pytest.approx(c.center + 3 * c.sigma)
+
+
+def test_ewma_and_cusum(tmp_path):
+    c = chart(tmp_path, baseline=2)
+    c.extend(pandas.DataFrame({'magazine': ['MA1', 'MA2'], 'fm': [1.0, 3.0]}))
+    assert c.center == 2.0 and c.sigma == pytest.approx(math.sqrt(2))
+    row = c.add_value(2.0 + 4 * c.sigma)
+    # z = 4: a Shewhart signal, EWMA moves lambda of the way
+    assert c.ewma == pytest.approx(2.0 + c.lam * 4 * c.sigma)
+    assert c.cusum_pos == pytest.approx(4 - c.k)
+    assert c.cusum_neg == 0
+    half = c.width * c.sigma * math.sqrt(c.lam / (2 - c.lam) * (1 - (1 - c.lam) ** 2))
+    assert row[5] == pytest.approx(2.0 - half)
+    assert row[-3:] == [True, True, False]
+    assert c.signals == {'shewhart': 1, 'ewma': 1, 'cusum': 0}
+
+
+def test_incremental_equals_from_scratch(tmp_path):
+    dataframe = series()
+    first = dataframe[dataframe['magazine'] < 'MA210010']
+    c = chart(tmp_path / 'a')
+    c.extend(first)
+    c.save()
+    resumed = chart(tmp_path / 'a').load()
+    new = resumed.extend(dataframe)
+    assert len(new) == len(dataframe) - len(first)
+    scratch = chart(tmp_path / 'b')
+    scratch.extend(dataframe)
+    pandas.testing.assert_frame_equal(resumed.rows(), scratch.rows())
+    assert resumed.cusum_pos == scratch.cusum_pos and resumed.ewma == scratch.ewma
+
+
+def test_changed_history_starts_again(tmp_path):
+    dataframe = series()
+    c = chart(tmp_path)
+    c.extend(dataframe)
+    c.save()
+    changed = dataframe.copy()
+    changed.loc[0, 'fm'] = 2.0
+    resumed = chart(tmp_path).load()
+    resumed.extend(changed)
+    assert resumed.n == len(dataframe)
+    assert resumed.rows()['x'].iloc[0] == 2.0
+
+
+def test_table_without_state_starts_again(tmp_path):
+    dataframe = series()
+    c = chart(tmp_path)
+    c.extend(dataframe[dataframe['magazine'] < 'MA210010'])
+    c.save()
+    # the table got new rows, but the state was not saved
+    c.extend(dataframe)
+    assert chart(tmp_path).load().n == 0
+
+
+def test_update_and_read(tmp_path, monkeypatch):
+    # the charts are kept in qc/charts, a path relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    dataframe = series()
+    updated = controlcharts.update('c6', dataframe)
+    assert not os.path.exists(updated.file('.lock'))
+    saved = controlcharts.read('c6')
+    assert saved.n == len(dataframe)
+    pandas.testing.assert_frame_equal(saved.rows(), updated.rows())
+    assert controlcharts.read('c1').rows().empty
+
+
+def test_file_lock(tmp_path):
+    path = str(tmp_path / 'x.lock')
+    with controlcharts.file_lock(path):
+        assert os.path.exists(path)
+        with pytest.raises(TimeoutError):
+            with controlcharts.file_lock(path, timeout=0.1):
+                pass
+    assert not os.path.exists(path)
+    # a lock file left by a crashed process
+    open(path, 'w').close()
+    os.utime(path, (0, 0))
+    with controlcharts.file_lock(path, timeout=0.1):
+        pass
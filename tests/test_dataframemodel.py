@@ -0,0 +1,47 @@
+"""
+ui.dataframemodel: chunks added to the model
+"""
+
+import numpy as np
+import pandas
+import pytest
+
+pytest.importorskip('PyQt5')
+import PyQt5.QtCore as QtCore  # noqa: E402
+from ui.dataframemodel import DataFrameModel  # noqa: E402
+
+
+def text(model: DataFrameModel, row: int, col: int) -> str:
+    return model.data(model.index(row, col))
+
+
+def test_append_chunks():
+    model = DataFrameModel(page_rows=4, block_rows=2)
+    model.setDataFrame(pandas.DataFrame({'n': [1, 2, 3], 'label': ['a', 'b', 'c']}))
+    assert text(model, 2, 1) == 'c'
+    model.appendDataFrame(pandas.DataFrame({'n': [4, 5], 'label': ['d', 'e']}))
+    # the first page filled up, the rest is fetched while scrolling
+    assert model.rowCount() == 4
+    assert model.canFetchMore()
+    model.fetchMore()
+    assert model.rowCount() == 5
+    assert [text(model, row, 0) for row in range(5)] == ['1', '2', '3', '4', '5']
+    assert model.headerData(4, QtCore.Qt.Vertical) == '4'
+    expected = pandas.DataFrame({'n': [1, 2, 3, 4, 5], 'label': ['a', 'b', 'c', 'd', 'e']})
+    pandas.testing.assert_frame_equal(model.dataframe(), expected)
+
+
+def test_append_changes_the_kind():
+    model = DataFrameModel(pandas.DataFrame({'n': [1, 2]}))
+    assert text(model, 1, 0) == '2'
+    model.appendDataFrame(pandas.DataFrame({'n': [np.nan]}))
+    # the int column is float now, the cached blocks are formatted again
+    assert text(model, 1, 0) == '2'
+    assert text(model, 2, 0) == ''
+    assert model.dataframe()['n'].dtype == np.float64
+
+
+def test_append_other_columns_fails():
+    model = DataFrameModel(pandas.DataFrame({'n': [1]}))
+    with pytest.raises(ValueError):
+        model.appendDataFrame(pandas.DataFrame({'n': [1], 'm': [2]}))
@@ -0,0 +1,78 @@
+"""
+plots.utils.downsample: picked points of long series
+"""
+
+import numpy as np
+import pandas
+from plots.utils.downsample import lttb, minmax, errorbar_envelope, downsample_frame, bucket_starts
+
+
+def series(n: int = 10000, seed: int = 2):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=float)
+    y = np.sin(x / 500) + rng.normal(0, 0.05, n)
+    return x, y
+
+
+def test_lttb_keeps_ends_and_peaks():
+    x, y = series()
+    y[4321] = 10
+    kept = lttb(x, y, 200)
+    assert len(kept) == 200
+    assert kept[0] == 0 and kept[-1] == len(x) - 1
+    assert (np.diff(kept) > 0).all()
+    assert 4321 in kept
+
+
+def test_lttb_short_series_unchanged():
+    x, y = series(50)
+    np.testing.assert_array_equal(lttb(x, y, 100), np.arange(50))
+    np.testing.assert_array_equal(lttb(x, y, 2), np.arange(50))
+
+
+def test_lttb_of_dates():
+    dates = pandas.date_range('2011-01-01', periods=1000, freq='D').to_numpy()
+    _, y = series(1000)
+    np.testing.assert_array_equal(lttb(dates, y, 100), lttb(np.arange(1000), y, 100))
+
+
+def test_minmax_keeps_extremes_of_every_bucket():
+    _, y = series()
+    kept = minmax(y, 100)
+    assert len(kept) <= 200
+    assert (np.diff(kept) > 0).all()
+    starts = bucket_starts(len(y), 100)
+    for start, end in zip(starts, np.r_[starts[1:], len(y)]):
+        assert start + np.argmin(y[start:end]) in kept
+        assert start + np.argmax(y[start:end]) in kept
+
+
+def test_minmax_short_series_unchanged():
+    np.testing.assert_array_equal(minmax(np.arange(10.0), 5), np.arange(10))
+
+
+def test_errorbar_envelope():
+    x, y = series(1000)
+    err = np.full(1000, 0.1)
+    centers, lower, upper = errorbar_envelope(x, y, err, 10)
+    assert len(centers) == len(lower) == len(upper) == 10
+    assert centers[0] == x[:100].mean()
+    assert lower[3] == (y[300:400] - 0.1).min()
+    assert upper[9] == (y[900:] + 0.1).max()
+
+
+def test_downsample_frame():
+    x, y = series()
+    dataframe = pandas.DataFrame({'x': x, 'y': y, 'y_sig': 0.01})
+    small = dataframe.iloc[:100]
+    assert downsample_frame(small, 'x', 'y', limit=500) is small
+    kept = downsample_frame(dataframe, 'x', 'y', limit=500)
+    assert len(kept) == 500
+    # unsorted frames are sorted by x first
+    shuffled = dataframe.sample(frac=1, random_state=0)
+    pandas.testing.assert_frame_equal(downsample_frame(shuffled, 'x', 'y', limit=500), kept)
+    # error bar series keep the extremes too
+    with_errors = downsample_frame(dataframe, 'x', 'y', limit=500, errors=True)
+    assert len(with_errors) <= 500
+    assert dataframe['y'].idxmax() in with_errors.index
+    assert dataframe['y'].idxmin() in with_errors.index
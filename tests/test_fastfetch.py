@@ -0,0 +1,45 @@
+"""
+database.fastfetch: raw rows to DataFrames
+"""
+
+import numpy as np
+import pandas
+from mysql.connector import FieldType
+from database.fastfetch import raw_to_dataframe
+
+DESCRIPTION = [('sample_nr', FieldType.LONG), ('fm', FieldType.NEWDECIMAL), ('dc13', FieldType.DOUBLE),
+               ('graphitized', FieldType.DATE), ('magazine', FieldType.VAR_STRING)]
+ROWS = [(b'1', b'1.0135', b'-17.8', b'2021-03-04', b'MA210304'),
+        (b'2', None, b'-18.25', b'0000-00-00', None),
+        (b'3', b'0.0021', None, None, b'MA210311')]
+
+
+def test_types_and_nulls():
+    dataframe = raw_to_dataframe(ROWS, DESCRIPTION)
+    assert list(dataframe.columns) == ['sample_nr', 'fm', 'dc13', 'graphitized', 'magazine']
+    assert dataframe['sample_nr'].dtype == np.int64
+    assert dataframe['sample_nr'].tolist() == [1, 2, 3]
+    np.testing.assert_array_equal(dataframe['fm'].to_numpy(), [1.0135, np.nan, 0.0021])
+    np.testing.assert_array_equal(dataframe['dc13'].to_numpy(), [-17.8, -18.25, np.nan])
+    assert dataframe['graphitized'].iloc[0] == pandas.Timestamp('2021-03-04')
+    # invalid dates and NULL
+    assert dataframe['graphitized'].iloc[1:].isna().all()
+    assert dataframe['magazine'].isna().tolist() == [False, True, False]
+    assert dataframe['magazine'].iloc[2] == 'MA210311'
+
+
+def test_integers_with_null_become_floats():
+    dataframe = raw_to_dataframe([(b'5',), (None,)], [('n', FieldType.LONGLONG)])
+    assert dataframe['n'].dtype == np.float64
+    assert np.isnan(dataframe['n'].iloc[1])
+
+
+def test_bytearrays_of_the_pure_connector():
+    rows = [tuple(None if value is None else bytearray(value) for value in row) for row in ROWS]
+    pandas.testing.assert_frame_equal(raw_to_dataframe(rows, DESCRIPTION), raw_to_dataframe(ROWS, DESCRIPTION))
+
+
+def test_no_rows():
+    dataframe = raw_to_dataframe([], DESCRIPTION)
+    assert dataframe.shape == (0, 5)
+    assert dataframe['fm'].dtype == np.float64
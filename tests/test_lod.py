@@ -0,0 +1,65 @@
+"""
+plots.utils.lod: rows of the visible window
+"""
+
+import datetime
+import numpy as np
+import pandas
+import pytest
+
+pytest.importorskip('matplotlib')
+import matplotlib.dates as dates  # noqa: E402
+from plots.utils.lod import Series  # noqa: E402
+
+
+def overview() -> pandas.DataFrame:
+    days = pandas.date_range('2015-01-01', periods=100, freq='D')
+    return pandas.DataFrame({'graphitized': days, 'fm': np.linspace(1, 2, 100)})
+
+
+class Loader:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        # ten targets per day
+        graphitized = pandas.date_range(start, end, freq='144min')
+        return pandas.DataFrame({'graphitized': graphitized, 'fm': np.arange(len(graphitized), dtype=float)})
+
+
+def test_whole_range_is_the_overview():
+    loader = Loader()
+    series = Series(None, overview(), 'graphitized', 'fm', loader=loader)
+    assert series.window(series.x[0] - 1, series.x[-1] + 1) is None
+    assert loader.calls == []
+
+
+def test_zoom_loads_the_window():
+    loader = Loader()
+    series = Series(None, overview(), 'graphitized', 'fm', limit=1000, loader=loader)
+    x0, x1 = dates.date2num(datetime.datetime(2015, 2, 1)), dates.date2num(datetime.datetime(2015, 2, 11))
+    xraw, x, y = series.window(x0, x1)
+    assert loader.calls == [(datetime.datetime(2015, 2, 1), datetime.datetime(2015, 2, 11))]
+    assert loader.calls[0][0].tzinfo is None
+    # all targets of the window, more than the 11 days of the overview
+    assert len(x) == 101
+    assert x[0] == x0 and x[-1] == x1
+
+
+def test_series_share_the_window_query():
+    loader = Loader()
+    first = Series(None, overview(), 'graphitized', 'fm', loader=loader)
+    second = Series(None, overview(), 'graphitized', 'fm', loader=loader)
+    loaded = {}
+    x0, x1 = first.x[10], first.x[20]
+    first.window(x0, x1, loaded)
+    second.window(x0, x1, loaded)
+    assert len(loader.calls) == 1
+
+
+def test_without_loader_the_rows_are_sliced():
+    series = Series(None, overview(), 'graphitized', 'fm')
+    xraw, x, y = series.window(series.x[10], series.x[20])
+    # one row beyond both edges
+    np.testing.assert_array_equal(y, series.y[9:22])
@@ -0,0 +1,32 @@
+"""
+database.mirror: LIKE filter and the age of the local copy
+"""
+
+import time
+import pandas
+import database.mirror as mirror
+
+
+def test_like():
+    labels = pandas.Series(['IAEA-C1', 'iaea c2', 'Pferd_3', None], dtype=object)
+    assert mirror.like(labels, '%IAEA%C1%').tolist() == [True, False, False, False]
+    assert mirror.like(labels, 'Pferd_3').tolist() == [False, False, True, False]
+    assert mirror.like(labels, 'Pferd%').tolist() == [False, False, True, False]
+
+
+def test_use_mirror_only_with_a_recent_copy(tmp_path, monkeypatch):
+    local = mirror.MyMirror(path=str(tmp_path))
+    pandas.DataFrame({'target_nr': [1]}).to_pickle(local._file('target_v'))
+    monkeypatch.setattr(mirror, 'mymirror', local)
+    monkeypatch.setattr(mirror, 'enabled', lambda: True)
+    # never synced
+    assert not mirror.use_mirror('target_v')
+    local.state['target_v'] = {'key': 1, 'synced': time.time() - 60}
+    assert mirror.use_mirror('target_v')
+    local.state['target_v']['synced'] = time.time() - 10 * 86400
+    assert not mirror.use_mirror('target_v')
+    # no copy at all
+    assert not mirror.use_mirror('target_t')
+    monkeypatch.setattr(mirror, 'enabled', lambda: False)
+    local.state['target_v']['synced'] = time.time()
+    assert not mirror.use_mirror('target_v')
@@ -0,0 +1,67 @@
+"""
+plots.utils.plotutils: magazine index and counts per year
+"""
+
+import numpy as np
+import pandas
+import plots.utils.plotutils as plotutils
+
+MAGAZINES = ['MA210304', 'MA200115', 'bad', 'MA211231', 'MA200115', 'MA220101', None]
+
+
+def test_parse_magazine_dates():
+    dates = plotutils.parse_magazine_dates(MAGAZINES)
+    assert dates.iloc[0] == pandas.Timestamp('2021-03-04')
+    assert dates.isna().tolist() == [False, False, True, False, False, False, True]
+
+
+def test_positions_between():
+    index = plotutils.MagazineIndex(pandas.DataFrame({'magazine': MAGAZINES}))
+    assert len(index) == 7
+    # sorted by date, rows of the same magazine keep their order
+    assert index.positions_between('2020-01-01').tolist() == [1, 4, 0, 3, 5]
+    assert index.positions_between('2021-01-01', '2022-01-01').tolist() == [0, 3]
+    assert index.first_position('2021-01-01', '2022-01-01') == 0
+    assert index.first_position('2023-01-01') is None
+
+
+def test_years_and_boundaries():
+    index = plotutils.MagazineIndex(pandas.Series(MAGAZINES))
+    assert index.years().tolist() == [2021, 2020, 0, 2021, 2020, 2022, 0]
+    assert index.year_boundaries() == {2020: 1, 2021: 0, 2022: 5}
+    assert index.year_boundaries([2019, 2021]) == {2021: 0}
+
+
+def test_revision_boundaries():
+    index = plotutils.MagazineIndex(pandas.Series(MAGAZINES))
+    # no magazines between the first revision and the second one,
+    # the first row of a revision is the first in the order of the dataframe
+    assert index.revision_boundaries(['MA190101', 'MA200101', 'MA211201']) == {'MA200101': 0, 'MA211201': 3}
+
+
+def test_counts_per_year():
+    dataframe = pandas.DataFrame({'magazine': ['MA210304', 'MA21_test', 'MA220101', 'test', None, 'MA090101'],
+                                  'y_data': [1, 2, 4, 8, 16, 32]})
+    counts = plotutils.counts_per_year(dataframe)
+    # MA21_test is counted by its year digits, names without a year and years before 2011 are left out
+    assert counts['x_data'].tolist() == [21, 22]
+    assert counts['y_data'].tolist() == [3, 4]
+    assert np.issubdtype(counts['y_data'].dtype, np.integer)
+
+
+def test_segment_stats():
+    dataframe = pandas.DataFrame({'magazine': ['MA200101', 'MA200201', 'MA200301', 'MA200401', 'bad', 'MA200501'],
+                                  'fm': [1.0, 2.0, 4.0, 6.0, 9.0, np.nan],
+                                  'fm_sig': [1.0, 1.0, 2.0, 2.0, 1.0, 1.0],
+                                  'standard': ['c2', 'c2', 'c2', 'c6', 'c2', 'c2']})
+    stats = plotutils.segment_stats(dataframe, revisions=['MA200301', 'no revision'])
+    assert stats['revision'].tolist() == ['start', 'MA200301']
+    assert stats['count'].tolist() == [2, 2]
+    assert stats['mean'].tolist() == [1.5, 5.0]
+    np.testing.assert_allclose(stats['stdev'], [np.sqrt(0.5), np.sqrt(2)])
+    np.testing.assert_allclose(stats['chi2_reduced'], [0.5, 0.5])
+    assert stats['first'].tolist() == [0, 2] and stats['last'].tolist() == [1, 3]
+    # a segment of one value has no stdev
+    grouped = plotutils.segment_stats(dataframe, group='standard', revisions=['MA200301'])
+    assert grouped[['standard', 'segment', 'count']].values.tolist() == [['c2', 0, 2], ['c2', 1, 1], ['c6', 1, 1]]
+    assert np.isnan(grouped['stdev'].iloc[1])
@@ -0,0 +1,74 @@
+"""
+plots.qc.qcstats: statistics tables of the standards from the sums per magazine
+"""
+
+import numpy as np
+import pandas
+import pytest
+import plots.qc.qcstats as qcstats
+
+
+def measurements() -> pandas.DataFrame:
+    rng = np.random.default_rng(3)
+    magazines = np.repeat(['MA2101%02d' % day for day in range(1, 13)], 5)
+    n = len(magazines)
+    dc13 = rng.normal(-2.4, 0.1, n)
+    dc13[7] = np.nan
+    return pandas.DataFrame({'measdate': pandas.to_datetime(['2021-01-%s' % m[-2:] for m in magazines]),
+                             'fm': rng.normal(0.4114, 0.002, n), 'fm_sig': rng.uniform(0.001, 0.003, n),
+                             'dc13': dc13, 'magazine': magazines, 'user_label': 'IAEA-C2'})
+
+
+def expected(x: np.ndarray, sig: np.ndarray) -> dict:
+    ok = ~np.isnan(x)
+    x, w = x[ok], 1 / sig[ok] ** 2
+    weighted = (w * x).sum() / w.sum()
+    return {'count': len(x), 'mean': x.mean(), 'stdev': x.std(ddof=1), 'weighted_mean': weighted,
+            'weighted_error': 1 / np.sqrt(w.sum()),
+            'mswd': (w * (x - weighted) ** 2).sum() / (len(x) - 1),
+            'chi2_reduced': (w * (x - x.mean()) ** 2).sum() / (len(x) - 1)}
+
+
+def test_overall():
+    dataframe = measurements()
+    overall = qcstats.compute(dataframe).overall
+    row = overall[(overall['standard'] == 'c2') & (overall['value'] == 'fm')].iloc[0]
+    for name, value in expected(dataframe['fm'].to_numpy(), dataframe['fm_sig'].to_numpy()).items():
+        assert row[name] == pytest.approx(value), name
+    assert row['offset'] == pytest.approx(row['weighted_mean'] - 0.4114)
+    # dc13 gets the same error for every value and has no offset
+    row = overall[(overall['standard'] == 'c2') & (overall['value'] == 'dc13')].iloc[0]
+    dc13 = dataframe['dc13'].to_numpy()
+    for name, value in expected(dc13, np.full(len(dc13), qcstats.dc13_sig())).items():
+        assert row[name] == pytest.approx(value), name
+    assert np.isnan(row['offset'])
+    # standards without measurements have no rows
+    assert set(overall['standard']) == {'c2'}
+
+
+def test_magazines_and_rolling():
+    dataframe = measurements()
+    result = qcstats.compute(dataframe, magazines=3)
+    fm = result.magazines[result.magazines['value'] == 'fm']
+    assert fm['magazine'].tolist() == sorted(set(dataframe['magazine']))
+    first = dataframe[dataframe['magazine'] == 'MA210102']
+    assert fm.iloc[1]['mean'] == pytest.approx(first['fm'].mean())
+    assert fm.iloc[1]['count'] == 5
+    dc13 = result.magazines[result.magazines['value'] == 'dc13']
+    assert dc13.iloc[1]['count'] == 4
+    rolling = result.rolling[result.rolling['value'] == 'fm']
+    assert rolling['magazines'].tolist()[:4] == [1, 2, 3, 3]
+    window = dataframe[dataframe['magazine'].isin(['MA210104', 'MA210105', 'MA210106'])]
+    row = rolling[rolling['magazine'] == 'MA210106'].iloc[0]
+    for name, value in expected(window['fm'].to_numpy(), window['fm_sig'].to_numpy()).items():
+        assert row[name] == pytest.approx(value), name
+
+
+def test_standard_stats_and_cache():
+    dataframe = measurements()
+    c2 = dataframe.drop(columns='user_label')
+    stats = qcstats.standard_stats(c2, 'c2')
+    assert stats.loc['fm', 'mean'] == pytest.approx(dataframe['fm'].mean())
+    assert stats.loc['dc13', 'count'] == len(dataframe) - 1
+    # the same data gives the cached table
+    assert qcstats.tables(dataframe) is qcstats.tables(dataframe.copy())
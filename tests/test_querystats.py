@@ -0,0 +1,34 @@
+"""
+database.querystats: memory of the recorded DataFrames
+"""
+
+import pandas
+from database.querystats import MyQueryStats
+
+
+def strings(n: int) -> pandas.DataFrame:
+    # the rows of mysql give object columns
+    labels = pandas.Series(['IAEA-C1 sample ' + str(i) for i in range(n)], dtype=object)
+    return pandas.DataFrame({'sample_nr': range(n), 'label': labels})
+
+
+def test_memory_is_shallow_by_default():
+    stats = MyQueryStats(deep_rows=0)
+    frame = strings(100)
+    stats.record('select', dataframe=frame)
+    assert stats.records()[-1].memory == frame.memory_usage(deep=False).sum()
+    assert stats.records()[-1].rows == 100
+
+
+def test_memory_is_deep_if_asked_for():
+    frame = strings(100)
+    deep = frame.memory_usage(deep=True).sum()
+    assert deep > frame.memory_usage(deep=False).sum()
+    stats = MyQueryStats(deep_memory=True, deep_rows=0)
+    stats.record('select', dataframe=frame)
+    assert stats.records()[-1].memory == deep
+    # large results are measured deep without the flag
+    stats = MyQueryStats(deep_rows=100)
+    stats.record('select', dataframe=frame)
+    stats.record('select', dataframe=frame.head(99))
+    assert [record.memory for record in stats.records()] == [deep, frame.head(99).memory_usage(deep=False).sum()]
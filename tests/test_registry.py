@@ -0,0 +1,50 @@
+"""
+plots.registry: the functions of all plots exist, the exports get all rows
+"""
+
+import datetime
+import os
+import pytest
+
+pytest.importorskip('matplotlib')
+os.environ.setdefault('MPLBACKEND', 'Agg')
+import plots.registry as registry  # noqa: E402
+
+
+@pytest.mark.parametrize('entry', registry.PLOTS, ids=lambda entry: entry.name)
+def test_functions_exist(entry):
+    assert callable(entry.query_function())
+    assert callable(entry.plot_function())
+    assert callable(entry.export_function())
+    if entry.full is None:
+        assert entry.export_function() is entry.query_function()
+
+
+def test_overview_and_full_queries(monkeypatch):
+    import plots.stat.statplots as statplots
+    queries = []
+    ttls = []
+
+    class Database:
+        history_ttl = 3600
+
+        def querydb(self, query, params=(), ttl=None, **kwargs):
+            # every placeholder has a parameter, LIKE patterns are parameters too
+            assert query.count('%s') == len(params)
+            assert '%oxa2%' not in query
+            queries.append(query)
+            ttls.append(ttl)
+    monkeypatch.setattr(statplots, 'mydb', Database())
+    day = datetime.datetime(2021, 3, 4)
+    for name in ('age_precision_time', 'MAG_params', 'AGE_params'):
+        entry = registry.get_plot(name)
+        entry.query_function()()
+        assert 'GROUP BY DATE' in queries[-1]
+        entry.export_function()()
+        assert 'GROUP BY' not in queries[-1]
+    # the history is cached, the zoomed windows are not
+    assert ttls == [3600] * 6
+    statplots.query_age_precision_time_window(day, day, 1000, 5000)
+    statplots.query_MAG_params_window(day, day)
+    statplots.query_AGE_params_window(day, day)
+    assert ttls[6:] == [None] * 3
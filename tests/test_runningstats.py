@@ -0,0 +1,75 @@
+"""
+plots.utils.runningstats: statistics of chunks and merged states
+"""
+
+import numpy as np
+import pandas
+import pytest
+from plots.utils.runningstats import RunningStats, describe
+
+
+def frame(n: int = 1000, seed: int = 1) -> pandas.DataFrame:
+    rng = np.random.default_rng(seed)
+    fm = rng.normal(1.0, 0.01, n)
+    fm[::17] = np.nan
+    return pandas.DataFrame({'fm': fm, 'fm_sig': rng.uniform(0.002, 0.005, n),
+                             'dc13': rng.normal(-25, 2, n), 'label': ['x'] * n})
+
+
+def test_plain_statistics():
+    dataframe = frame()
+    result = describe(dataframe)
+    assert list(result.index) == ['fm', 'fm_sig', 'dc13']
+    fm = dataframe['fm'].dropna()
+    assert result.loc['fm', 'count'] == len(fm)
+    assert result.loc['fm', 'mean'] == pytest.approx(fm.mean())
+    assert result.loc['fm', 'stdev'] == pytest.approx(fm.std())
+    assert result.loc['fm', 'min'] == fm.min()
+    assert result.loc['fm', 'max'] == fm.max()
+    assert result.loc['fm', '50%'] == pytest.approx(fm.median())
+    # only fm has an error column
+    assert result['weighted_mean'].notna().tolist() == [True, False, False]
+
+
+def test_weighted_mean_and_chi2():
+    dataframe = frame()
+    result = describe(dataframe)
+    ok = dataframe['fm'].notna()
+    x, sig = dataframe.loc[ok, 'fm'].to_numpy(), dataframe.loc[ok, 'fm_sig'].to_numpy()
+    w = 1 / sig ** 2
+    weighted = (w * x).sum() / w.sum()
+    assert result.loc['fm', 'weighted_mean'] == pytest.approx(weighted)
+    assert result.loc['fm', 'weighted_error'] == pytest.approx(1 / np.sqrt(w.sum()))
+    assert result.loc['fm', 'mswd'] == pytest.approx((w * (x - weighted) ** 2).sum() / (len(x) - 1))
+    assert result.loc['fm', 'chi2_reduced'] == pytest.approx((w * (x - x.mean()) ** 2).sum() / (len(x) - 1))
+
+
+def test_chunks_equal_whole():
+    dataframe = frame()
+    stats = RunningStats()
+    for start in range(0, len(dataframe), 128):
+        stats.update(dataframe.iloc[start:start + 128])
+    pandas.testing.assert_frame_equal(stats.result(), describe(dataframe))
+
+
+def test_merge_equals_update():
+    dataframe = frame()
+    merged = RunningStats().update(dataframe.iloc[:300]).merge(RunningStats().update(dataframe.iloc[300:]))
+    pandas.testing.assert_frame_equal(merged.result(), describe(dataframe))
+    # an empty state on either side changes nothing
+    pandas.testing.assert_frame_equal(RunningStats().merge(merged).result(), merged.result())
+    pandas.testing.assert_frame_equal(merged.merge(RunningStats()).result(), describe(dataframe))
+
+
+def test_merge_of_other_columns_fails():
+    with pytest.raises(ValueError):
+        RunningStats().update(frame()).merge(RunningStats().update(frame()[['dc13']]))
+
+
+def test_sampled_quantiles():
+    dataframe = frame(20000)
+    result = RunningStats(max_sample=2000, seed=0).update(dataframe.iloc[:5000]).update(dataframe.iloc[5000:]).result()
+    # the quantiles come from a sample, count, mean and stdev stay exact
+    assert result.loc['dc13', 'count'] == 20000
+    assert result.loc['dc13', 'mean'] == pytest.approx(dataframe['dc13'].mean())
+    assert result.loc['dc13', '50%'] == pytest.approx(dataframe['dc13'].median(), abs=0.2)
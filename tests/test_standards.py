@@ -0,0 +1,70 @@
+"""
+plots.qc.standards: splitting the standards and sharing one fetch per run
+"""
+
+import numpy as np
+import pandas
+import pytest
+import plots.qc.standards as standards
+
+ALL = pandas.DataFrame({
+    'measdate': pandas.to_datetime(['2021-01-01'] * 7),
+    'fm': [0.002, 0.41, 0.45, 1.25, 1.50, 0.97, 0.5],
+    'fm_sig': [0.001] * 7,
+    'dc13': [-20.0] * 7,
+    'magazine': ['MA210101'] * 7,
+    'user_label': ['IAEA-C1', 'iaea c2', 'IAEA-C2', 'IAEA-C3', 'IAEA C6', 'Pferd 3', None],
+})
+
+
+def test_partition_standards():
+    partitions = standards.partition_standards(ALL)
+    assert set(partitions) == {standard.name for standard in standards.STANDARDS}
+    assert partitions['c1']['fm'].tolist() == [0.002]
+    # the LIKE patterns are case insensitive, fm 0.45 is above fm_max of C2
+    assert partitions['c2']['fm'].tolist() == [0.41]
+    # fm 1.25 is not above fm_min of C3
+    assert partitions['c3'].empty
+    assert partitions['c6']['fm'].tolist() == [1.50]
+    assert partitions['horses']['fm'].tolist() == [0.97]
+    assert list(partitions['c6'].columns) == ['measdate', 'fm', 'fm_sig', 'dc13', 'magazine']
+    assert partitions['c6'].index.tolist() == [0]
+
+
+def test_label_members_without_labels():
+    members = standards.label_members(pandas.Series([None, None], dtype=object))
+    assert members.shape == (2, len(standards.STANDARDS))
+    assert not members.any()
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return ALL.copy()
+    monkeypatch.setattr(standards, 'fetch_all_standards', fetch)
+    yield calls
+    standards.end_run()
+
+
+def test_run_fetches_once(fetches):
+    standards.start_run()
+    c1 = standards.query_standard('c1')
+    c2 = standards.query_standard('c2')
+    standards.query_all_standards()
+    assert len(fetches) == 1
+    assert c1['fm'].tolist() == [0.002]
+    # every plot gets its own copy
+    c2.loc[0, 'fm'] = np.nan
+    assert standards.query_standard('c2')['fm'].tolist() == [0.41]
+    standards.end_run()
+    standards.query_standard('c1')
+    assert len(fetches) == 2
+
+
+def test_unknown_standard(fetches):
+    with pytest.raises(KeyError):
+        standards.query_standard('c9')
+    assert not fetches
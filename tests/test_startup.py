@@ -0,0 +1,50 @@
+"""
+import time of the main window (see config.config.LazyInstance)
+"""
+
+import os
+import subprocess
+import sys
+import pytest
+from conftest import CODE_DIR
+
+# modules of the plotting stack, they are loaded when the first plot is opened
+PLOTTING = ('matplotlib', 'seaborn', 'scipy', 'mpldatacursor', 'pandas')
+# cumulative import time of main in seconds
+BUDGET = 2.0
+
+CHECK = '''
+import os, sys
+import main
+from config.config import myconfig
+from database.pysamsdb import mydb
+print(sorted({name.split('.')[0] for name in sys.modules} & set(sys.argv[1:])))
+print(myconfig._instance is None, mydb._instance is None, os.path.exists('config.ini'))
+'''
+
+
+def import_main(tmp_path):
+    pytest.importorskip('PyQt5')
+    pytest.importorskip('fbs_runtime')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([CODE_DIR] + sys.path))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHECK] + list(PLOTTING), cwd=str(tmp_path),
+                            env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+    return result
+
+
+def test_main_does_not_load_plotting_stack(tmp_path):
+    result = import_main(tmp_path)
+    loaded, lazy = result.stdout.splitlines()[-2:]
+    assert loaded == '[]'
+    # neither the config file nor the database are touched by importing
+    assert lazy == 'True True False'
+
+
+def test_main_import_time(tmp_path):
+    result = import_main(tmp_path)
+    # lines of -X importtime: "import time: self [us] | cumulative | module"
+    times = [line.split('|') for line in result.stderr.splitlines() if line.startswith('import time:')]
+    cumulative = [int(fields[1]) for fields in times if fields[2].strip() == 'main']
+    assert cumulative, 'main not found in the import times'
+    assert cumulative[0] / 1e6 < BUDGET